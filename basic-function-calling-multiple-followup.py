@@ -1,7 +1,11 @@
 from openai import OpenAI
-import json
 from dotenv import load_dotenv
-import requests
+from typing import Annotated, TypedDict
+import http_pool
+from tool_registry import ToolRegistry
+from tool_cache import stats as cache_stats, format_stats
+from parallel_tools import ParallelToolRunner
+from tool_loop import ToolLoop, OpenAIToolAdapter, format_totals
 
 load_dotenv()
 
@@ -14,134 +18,75 @@ input_messages = [{
     "content": "What's the weather in Paris and Bogotá? Also send an email to bob@email.com with the results."
 }]
 
-# Definir múltiples herramientas
-tools = [
-    {
-        "type": "function",
-        "name": "get_weather",
-        "description": "Get current temperature for provided coordinates in celsius.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "latitude": {
-                    "type": "number",
-                    "description": "Latitude coordinate (e.g. 48.8566 for Paris)"
-                },
-                "longitude": {
-                    "type": "number",
-                    "description": "Longitude coordinate (e.g. 2.3522 for Paris)"
-                }
-            },
-            "required": ["latitude", "longitude"],
-            "additionalProperties": False
-        }
-    },
-    {
-        "type": "function",
-        "name": "send_email",
-        "description": "Send an email to a recipient with weather information",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "to": {
-                    "type": "string",
-                    "description": "Email address of the recipient"
-                },
-                "subject": {
-                    "type": "string",
-                    "description": "Subject of the email"
-                },
-                "body": {
-                    "type": "string",
-                    "description": "Body of the email with weather information"
-                }
-            },
-            "required": ["to", "subject", "body"],
-            "additionalProperties": False
-        }
-    }
-]
-
-# Paso 1: Llamar al modelo con las funciones definidas
-response = client.responses.create(
-    model="gpt-4o-mini",
-    input=input_messages,
-    tools=tools
-)
-
-# Imprimir la salida inicial
-print("Respuesta inicial del modelo:")
-print(response.output)
+# Registro de herramientas: cada función se declara una vez y su esquema sale de las anotaciones
+registry = ToolRegistry()
 
 # Función real para obtener el clima usando la API de Open-Meteo
 
 
-def get_weather(latitude, longitude):
+class Coordinates(TypedDict):
+    latitude: Annotated[float, "Latitude coordinate (e.g. 48.8566 for Paris)"]
+    longitude: Annotated[float, "Longitude coordinate (e.g. 2.3522 for Paris)"]
+
+
+# Todas las coordenadas van en una sola petición a Open-Meteo (sesión compartida con
+# tiempos máximos y reintentos); los puntos ya consultados salen de la caché 15 minutos
+@registry.tool("Get current temperature for one or more coordinates in celsius. "
+               "Pass every location you need in a single call.")
+def get_weather(locations: Annotated[list[Coordinates], "Locations to look up, e.g. one per city"]):
     """Obtiene la temperatura actual usando la API de Open-Meteo"""
     try:
-        response = requests.get(
-            f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current=temperature_2m,wind_speed_10m&hourly=temperature_2m,relative_humidity_2m,wind_speed_10m"
-        )
-        data = response.json()
-        temp_c = data['current']['temperature_2m']
-        temp_f = (temp_c * 9/5) + 32
-        return f"Temperature: {temp_c}°C ({temp_f:.1f}°F)"
+        if isinstance(locations, dict):
+            locations = [locations]
+        points = http_pool.current_weather([(loc["latitude"], loc["longitude"]) for loc in locations])
+        lines = []
+        for point in points:
+            temp_c = point["temperature"]
+            temp_f = (temp_c * 9/5) + 32
+            lines.append(f"({point['latitude']}, {point['longitude']}) Temperature: {temp_c}°C ({temp_f:.1f}°F), "
+                         f"wind {point['wind_speed']} km/h")
+        return "\n".join(lines)
     except Exception as e:
         return f"Error getting weather: {str(e)}"
 
 # Función simulada para enviar email
 
 
-def send_email(to, subject, body):
+@registry.tool("Send an email to a recipient with weather information", concurrency=1)
+def send_email(to: Annotated[str, "Email address of the recipient"],
+               subject: Annotated[str, "Subject of the email"],
+               body: Annotated[str, "Body of the email with weather information"]):
     """Simula el envío de un email"""
     # En una aplicación real, aquí se implementaría el envío real del email
     print(f"Email sent to {to}\nSubject: {subject}\nBody: {body}")
     return f"Email sent to {to}\nSubject: {subject}\nBody: {body}"
 
-# Función para manejar las llamadas a funciones
-
-
-def call_function(name, args):
-    """Procesa una llamada a función y retorna su resultado"""
-    if name == "get_weather":
-        return get_weather(**args)
-    elif name == "send_email":
-        return send_email(**args)
-    else:
-        return f"Error: Function {name} not implemented"
-
-
-# Paso 2: Procesar las llamadas a funciones y obtener respuesta final
-while True:
-    # Procesar las llamadas a funciones en la respuesta actual
-    for tool_call in response.output:
-        if tool_call.type != "function_call":
-            continue
+# Esquemas en formato de la Responses API, generados a partir del registro
+tools = registry.openai_tools()
 
-        name = tool_call.name
-        args = json.loads(tool_call.arguments)
+# Las llamadas de una misma respuesta se ejecutan en paralelo; send_email de una en una
+runner = ParallelToolRunner(registry.execute, limits=registry.limits())
 
-        # Ejecutar la función y obtener el resultado
-        result = call_function(name, args)
 
-        # Agregar la llamada a función y su resultado a los mensajes
-        input_messages.append(tool_call)
-        input_messages.append({
-            "type": "function_call_output",
-            "call_id": tool_call.call_id,
-            "output": str(result)
-        })
+def show_round(stats, calls, results):
+    """Muestra las llamadas y los tiempos de cada ronda del bucle"""
+    print(f"\nRonda {stats['round']}: modelo {stats['latency_ms']} ms, "
+          f"{stats['input_tokens']}+{stats['output_tokens']} tokens")
+    for call, result in zip(calls, results):
+        print(f"  {call['name']}({call['input']}) -> {result}")
+    if len(calls) > 1:
+        print(f"  herramientas en paralelo: {stats['tools_ms']} ms (ahorro: {stats['tools_saved_ms']} ms)")
 
-    # Obtener nueva respuesta del modelo
-    response = client.responses.create(
-        model="gpt-4o-mini",
-        input=input_messages,
-        tools=tools
-    )
 
-    # Si no hay más llamadas a funciones, salir del bucle
-    if not response.output or all(call.type != "function_call" for call in response.output):
-        break
+# Paso 1: Bucle modelo -> funciones -> modelo hasta que deja de pedir funciones
+# (como mucho 5 rondas y 60 segundos; las funciones están disponibles en todas)
+loop = ToolLoop(OpenAIToolAdapter(client, "gpt-4o-mini", tools), runner,
+                max_rounds=5, max_seconds=60, on_round=show_round)
+result = loop.run(input_messages)
+input_messages = result.messages
+response = result.response
+print("\n" + format_totals(result.totals()))
+print(format_stats(cache_stats()))
 
 # La última respuesta contiene el texto final del modelo
 print("\nRespuesta final del modelo:")
@@ -150,7 +95,7 @@ print(response.output_text)
 # Guardar el ID de la respuesta para mantener el contexto
 previous_response_id = response.id
 
-# Paso 5: Pregunta de seguimiento para probar la memoria del modelo
+# Paso 2: Pregunta de seguimiento para probar la memoria del modelo
 follow_up_message = [{
     "role": "user",
     "content": "Do you remember what was the current temperature in Paris?"
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Ejecutor de prompts por lotes (no interactivo)
+Lee prompts desde JSONL/CSV y los ejecuta con el mismo system prompt, ya sea
+con las APIs de lotes (Message Batches / OpenAI Batch) o con un pool asíncrono
+de concurrencia limitada. Los resultados se escriben en JSONL a medida que
+llegan y el archivo de salida sirve de checkpoint para reanudar.
+
+Uso:
+    python batch_runner.py prompts.jsonl -o resultados.jsonl --mode async --concurrency 8
+    python batch_runner.py prompts.csv -o resultados.jsonl --mode batch --provider openai
+"""
+
+import os
+import csv
+import json
+import time
+import asyncio
+import argparse
+import dotenv
+from datetime import datetime
+from rich.console import Console
+
+dotenv.load_dotenv()
+
+console = Console(stderr=True)
+
+DEFAULT_MODELS = {
+    "anthropic": "claude-sonnet-4-20250514",
+    "openai": "gpt-4o-mini",
+}
+DEFAULT_SYSTEM = "You are a helpful assistant."
+BATCH_POLL_SECONDS = 30
+
+
+def load_prompts(input_path):
+    """Carga los prompts desde un archivo JSONL o CSV.
+
+    Cada elemento necesita un campo 'prompt' (o 'content'/'input'); el campo
+    'id' es opcional y por defecto se usa el número de línea.
+    """
+    items = []
+    if input_path.lower().endswith(".csv"):
+        with open(input_path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        rows = []
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    rows.append(json.loads(line))
+
+    for index, row in enumerate(rows, 1):
+        prompt = row.get("prompt") or row.get("content") or row.get("input")
+        if not prompt:
+            console.print(f"[yellow]⚠️ Elemento {index} sin prompt, se omite[/yellow]")
+            continue
+        items.append({
+            "id": str(row.get("id") or index),
+            "custom_id": f"item-{index}",
+            "prompt": prompt,
+        })
+    return items
+
+
+def load_completed_ids(output_path):
+    """Devuelve los ids ya resueltos correctamente en el archivo de salida"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Línea truncada por una interrupción: se reintenta ese elemento
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["id"])
+    return completed
+
+
+class ResultWriter:
+    """Escribe resultados en JSONL de forma incremental (una línea por elemento)"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.file = open(output_path, 'a', encoding='utf-8')
+        self.written = 0
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.written += 1
+
+    def close(self):
+        self.file.close()
+
+
+def make_record(item, status, text=None, error=None, usage=None, started=None, latency=None, batch_wait=None):
+    """Construye el registro JSONL de un elemento.
+
+    latency es la duración de la petición del elemento (modo async); en modo
+    batch no existe y se guarda en su lugar la espera total del lote.
+    """
+    record = {
+        "id": item["id"],
+        "status": status,
+        "prompt": item["prompt"],
+        "response": text,
+        "error": error,
+        "usage": usage,
+        "started_at": started,
+        "latency_s": round(latency, 3) if latency is not None else None,
+    }
+    if batch_wait is not None:
+        record["batch_wait_s"] = round(batch_wait, 3)
+    return record
+
+
+# ---------------------------------------------------------------------------
+# Modo asíncrono: pool de workers con concurrencia limitada
+# ---------------------------------------------------------------------------
+
+async def _call_anthropic(client, model, system, prompt, max_tokens):
+    response = await client.messages.create(
+        model=model,
+        max_tokens=max_tokens,
+        system=system,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    text = "".join(block.text for block in response.content if block.type == "text")
+    usage = {"input_tokens": response.usage.input_tokens, "output_tokens": response.usage.output_tokens}
+    return text, usage
+
+
+async def _call_openai(client, model, system, prompt, max_tokens):
+    response = await client.responses.create(
+        model=model,
+        instructions=system,
+        input=prompt,
+        max_output_tokens=max_tokens
+    )
+    usage = None
+    if response.usage:
+        usage = {"input_tokens": response.usage.input_tokens, "output_tokens": response.usage.output_tokens}
+    return response.output_text, usage
+
+
+async def run_async(items, writer, provider, model, system, concurrency, max_tokens, retries=2):
+    """Ejecuta los prompts con N workers que comparten un único cliente asíncrono"""
+    if provider == "anthropic":
+        from anthropic import AsyncAnthropic
+        client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), max_retries=retries)
+        call = _call_anthropic
+    else:
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=retries)
+        call = _call_openai
+
+    queue = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+
+    counters = {"ok": 0, "error": 0}
+
+    async def worker():
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = datetime.now().isoformat()
+            t0 = time.perf_counter()
+            try:
+                text, usage = await call(client, model, system, item["prompt"], max_tokens)
+                record = make_record(item, "ok", text=text, usage=usage,
+                                     started=started, latency=time.perf_counter() - t0)
+                counters["ok"] += 1
+            except Exception as e:
+                record = make_record(item, "error", error=str(e),
+                                     started=started, latency=time.perf_counter() - t0)
+                counters["error"] += 1
+            # La escritura es síncrona y no cede el control, así que las líneas no se mezclan
+            writer.write(record)
+            done = counters["ok"] + counters["error"]
+            console.print(f"[dim]✅ {done}/{len(items)} · {item['id']} ({record['latency_s']}s)[/dim]")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(items)))))
+    finally:
+        await client.close()
+    return counters
+
+
+# ---------------------------------------------------------------------------
+# Modo lotes: Message Batches API (Anthropic) / Batch API (OpenAI)
+# ---------------------------------------------------------------------------
+
+def checkpoint_path_for(output_path):
+    return output_path + ".checkpoint.json"
+
+
+def load_checkpoint(output_path):
+    path = checkpoint_path_for(output_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_checkpoint(output_path, data):
+    with open(checkpoint_path_for(output_path), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _submit_anthropic_batch(client, items, model, system, max_tokens):
+    batch = client.messages.batches.create(requests=[
+        {
+            "custom_id": item["custom_id"],
+            "params": {
+                "model": model,
+                "max_tokens": max_tokens,
+                "system": system,
+                "messages": [{"role": "user", "content": item["prompt"]}],
+            },
+        }
+        for item in items
+    ])
+    return batch.id
+
+
+def _wait_anthropic_batch(client, batch_id):
+    while True:
+        batch = client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        console.print(f"[dim]⏳ Lote {batch_id}: {batch.processing_status} "
+                      f"(ok={counts.succeeded}, en curso={counts.processing}, error={counts.errored})[/dim]")
+        if batch.processing_status == "ended":
+            return
+        time.sleep(BATCH_POLL_SECONDS)
+
+
+def _iter_anthropic_results(client, batch_id):
+    for entry in client.messages.batches.results(batch_id):
+        result = entry.result
+        if result.type == "succeeded":
+            message = result.message
+            text = "".join(block.text for block in message.content if block.type == "text")
+            usage = {"input_tokens": message.usage.input_tokens, "output_tokens": message.usage.output_tokens}
+            yield entry.custom_id, "ok", text, None, usage
+        else:
+            error = getattr(result, "error", None)
+            yield entry.custom_id, "error", None, str(error or result.type), None
+
+
+def _submit_openai_batch(client, items, model, system, max_tokens, output_path):
+    requests_path = output_path + ".requests.jsonl"
+    with open(requests_path, 'w', encoding='utf-8') as f:
+        for item in items:
+            f.write(json.dumps({
+                "custom_id": item["custom_id"],
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": {
+                    "model": model,
+                    "instructions": system,
+                    "input": item["prompt"],
+                    "max_output_tokens": max_tokens,
+                },
+            }, ensure_ascii=False) + "\n")
+    with open(requests_path, 'rb') as f:
+        batch_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def _wait_openai_batch(client, batch_id):
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        console.print(f"[dim]⏳ Lote {batch_id}: {batch.status} "
+                      f"(completados={counts.completed if counts else 0}, fallidos={counts.failed if counts else 0})[/dim]")
+        if batch.status in {"completed", "failed", "expired", "cancelled"}:
+            return batch
+        time.sleep(BATCH_POLL_SECONDS)
+
+
+def _iter_openai_results(client, batch):
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            response = entry.get("response") or {}
+            body = response.get("body") or {}
+            if entry.get("error") or response.get("status_code") != 200:
+                yield entry["custom_id"], "error", None, str(entry.get("error") or body.get("error")), None
+                continue
+            text = "".join(
+                part.get("text", "")
+                for output in body.get("output", []) if output.get("type") == "message"
+                for part in output.get("content", []) if part.get("type") == "output_text"
+            )
+            usage = body.get("usage")
+            if usage:
+                usage = {"input_tokens": usage.get("input_tokens"), "output_tokens": usage.get("output_tokens")}
+            yield entry["custom_id"], "ok", text, None, usage
+
+
+def run_batch(items, writer, provider, model, system, max_tokens, output_path):
+    """Envía (o retoma) un lote en la API del proveedor y vuelca sus resultados"""
+    checkpoint = load_checkpoint(output_path)
+    by_custom_id = {item["custom_id"]: item for item in items}
+
+    if provider == "anthropic":
+        from anthropic import Anthropic
+        client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    else:
+        from openai import OpenAI
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    if checkpoint and checkpoint.get("provider") == provider and checkpoint.get("batch_id"):
+        batch_id = checkpoint["batch_id"]
+        console.print(f"[yellow]🔁 Retomando lote existente: {batch_id}[/yellow]")
+    else:
+        if provider == "anthropic":
+            batch_id = _submit_anthropic_batch(client, items, model, system, max_tokens)
+        else:
+            batch_id = _submit_openai_batch(client, items, model, system, max_tokens, output_path)
+        checkpoint = {
+            "provider": provider,
+            "batch_id": batch_id,
+            "submitted_at": datetime.now().isoformat(),
+            "custom_ids": {item["custom_id"]: item["id"] for item in items},
+        }
+        save_checkpoint(output_path, checkpoint)
+        console.print(f"[green]📦 Lote enviado: {batch_id} ({len(items)} prompts)[/green]")
+
+    t0 = time.perf_counter()
+    if provider == "anthropic":
+        _wait_anthropic_batch(client, batch_id)
+        results = _iter_anthropic_results(client, batch_id)
+    else:
+        batch = _wait_openai_batch(client, batch_id)
+        results = _iter_openai_results(client, batch)
+    elapsed = time.perf_counter() - t0
+
+    counters = {"ok": 0, "error": 0}
+    custom_ids = checkpoint.get("custom_ids", {})
+    # Se relee la salida: un volcado interrumpido puede haber escrito ya parte del lote
+    completed = load_completed_ids(output_path)
+    for custom_id, status, text, error, usage in results:
+        item = by_custom_id.get(custom_id)
+        if item is None:
+            # Elemento de otro archivo de entrada o ya escrito en una ejecución anterior
+            if custom_id not in custom_ids or custom_ids[custom_id] in completed:
+                continue
+            item = {"id": custom_ids[custom_id], "prompt": None}
+        elif item["id"] in completed:
+            continue
+        record = make_record(item, status, text=text, error=error, usage=usage,
+                             started=checkpoint["submitted_at"], batch_wait=elapsed)
+        writer.write(record)
+        counters[status] += 1
+
+    # El lote ya se ha volcado: un nuevo lanzamiento debe enviar solo lo pendiente
+    checkpoint["batch_id"] = None
+    checkpoint["completed_at"] = datetime.now().isoformat()
+    save_checkpoint(output_path, checkpoint)
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ejecuta prompts por lotes desde JSONL/CSV")
+    parser.add_argument("input", help="Archivo de prompts (.jsonl o .csv)")
+    parser.add_argument("-o", "--output", help="Archivo JSONL de resultados (por defecto <input>.results.jsonl)")
+    parser.add_argument("--provider", choices=["anthropic", "openai"], default="anthropic")
+    parser.add_argument("--mode", choices=["async", "batch"], default="async",
+                        help="async: baja latencia con pool de workers; batch: API de lotes (más barata)")
+    parser.add_argument("--model", help="Modelo a usar (por defecto según el proveedor)")
+    parser.add_argument("--system", default=DEFAULT_SYSTEM, help="System prompt común a todos los elementos")
+    parser.add_argument("--system-file", help="Leer el system prompt desde un archivo")
+    parser.add_argument("--concurrency", type=int, default=8, help="Peticiones simultáneas en modo async")
+    parser.add_argument("--max-tokens", type=int, default=1000)
+    args = parser.parse_args()
+
+    api_key_name = "ANTHROPIC_API_KEY" if args.provider == "anthropic" else "OPENAI_API_KEY"
+    if not os.getenv(api_key_name):
+        console.print(f"[red]❌ Error: {api_key_name} no encontrada en el archivo .env[/red]")
+        return
+
+    system = args.system
+    if args.system_file:
+        with open(args.system_file, 'r', encoding='utf-8') as f:
+            system = f.read()
+    model = args.model or DEFAULT_MODELS[args.provider]
+    output_path = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+
+    items = load_prompts(args.input)
+    completed = load_completed_ids(output_path)
+    pending = [item for item in items if item["id"] not in completed]
+    console.print(f"[bold blue]📋 {len(items)} prompts · {len(completed)} ya completados · {len(pending)} pendientes[/bold blue]")
+
+    checkpoint = load_checkpoint(output_path)
+    resuming_batch = args.mode == "batch" and checkpoint and checkpoint.get("batch_id")
+    if not pending and not resuming_batch:
+        console.print("[green]✅ Nada que hacer[/green]")
+        return
+
+    writer = ResultWriter(output_path)
+    t0 = time.perf_counter()
+    try:
+        if args.mode == "async":
+            counters = asyncio.run(run_async(pending, writer, args.provider, model, system,
+                                             args.concurrency, args.max_tokens))
+        else:
+            counters = run_batch(pending, writer, args.provider, model, system,
+                                 args.max_tokens, output_path)
+    except KeyboardInterrupt:
+        console.print(f"\n[yellow]⚠️ Interrumpido. Vuelve a lanzar el mismo comando para reanudar ({output_path})[/yellow]")
+        return
+    finally:
+        writer.close()
+
+    console.print(f"[green]✅ Terminado en {time.perf_counter() - t0:.1f}s: "
+                  f"{counters['ok']} ok, {counters['error']} con error → {output_path}[/green]")
+
+
+if __name__ == "__main__":
+    main()
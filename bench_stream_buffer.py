@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark del renderizado de respuestas largas en streaming
+Compara el coste por fotograma de repintar el panel completo (texto entero en
+un Panel nuevo) con el StreamingPanel de stream_renderer.py, que solo ajusta
+la última línea y pinta las líneas visibles.
+
+Uso:
+    python bench_stream_buffer.py
+"""
+
+import io
+import time
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+from stream_renderer import StreamingPanel
+
+SAMPLE = (
+    "El streaming permite recibir la respuesta token a token. Cada delta añade "
+    "unas pocas letras al final del texto, pero la interfaz tiene que volver a "
+    "mostrar el resultado varias veces por segundo.\n\n"
+)
+DELTA_SIZE = 4
+CHECKPOINTS = [1_000, 4_000, 16_000, 64_000]
+FRAMES_PER_CHECKPOINT = 20
+
+
+def naive_frame(text):
+    """Lo que hacía el código original en cada delta"""
+    return Panel(text + "[dim]▊[/dim]", title="Claude", border_style="green")
+
+
+def measure(render_console, renderable):
+    start = time.perf_counter()
+    render_console.print(renderable)
+    return time.perf_counter() - start
+
+
+def run():
+    render_console = Console(file=io.StringIO(), width=100, height=40, force_terminal=True)
+    text = (SAMPLE * (CHECKPOINTS[-1] // len(SAMPLE) + 1))[:CHECKPOINTS[-1]]
+    deltas = [text[i:i + DELTA_SIZE] for i in range(0, len(text), DELTA_SIZE)]
+
+    panel = StreamingPanel("Claude")
+    accumulated = ""
+    results = []
+    checkpoints = iter(CHECKPOINTS)
+    target = next(checkpoints)
+    for delta in deltas:
+        panel.append(delta)
+        accumulated += delta
+        if len(accumulated) < target:
+            continue
+        naive = sum(measure(render_console, naive_frame(accumulated)) for _ in range(FRAMES_PER_CHECKPOINT))
+        tail = sum(measure(render_console, panel) for _ in range(FRAMES_PER_CHECKPOINT))
+        results.append((target, naive / FRAMES_PER_CHECKPOINT, tail / FRAMES_PER_CHECKPOINT))
+        target = next(checkpoints, None)
+        if target is None:
+            break
+    return results
+
+
+def main():
+    console = Console()
+    table = Table(title="[bold blue]⏱️ Coste por fotograma (ms)[/bold blue]")
+    table.add_column("Caracteres", style="bold", justify="right")
+    table.add_column("Panel completo", style="red", justify="right")
+    table.add_column("StreamingPanel", style="green", justify="right")
+    for size, naive, tail in run():
+        table.add_row(f"{size:,}", f"{naive * 1000:.2f}", f"{tail * 1000:.2f}")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
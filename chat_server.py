@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Servidor de chat multi-sesión (HTTP + SSE + WebSocket)
+Un único proceso atiende muchas sesiones con un solo cliente asíncrono de
+Anthropic (pool de conexiones compartido). Los mensajes de una misma sesión se
+procesan en orden; sesiones distintas avanzan en paralelo.
+
+Endpoints:
+    POST   /sessions                      -> crea una sesión {"session_id"}
+    PUT    /sessions/{id}                 -> crea una sesión con un id concreto
+    GET    /sessions/{id}                 -> historial de la sesión
+    DELETE /sessions/{id}                 -> expulsa la sesión de memoria (queda en disco)
+    POST   /sessions/{id}/messages        -> {"content"}; respuesta JSON, o SSE
+                                             con ?stream=1 / Accept: text/event-stream
+    GET    /sessions/{id}/ws              -> WebSocket: envía {"content"}, recibe deltas
+    GET    /health                        -> estado del proceso
+    GET    /metrics                       -> sesiones residentes, expulsiones y rehidratación
+
+Uso:
+    python chat_server.py --port 8080
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import dotenv
+from aiohttp import web
+from anthropic import AsyncAnthropic
+from rich.console import Console
+from session_store import is_valid_session_id, save_session
+from session_manager import SessionManager, SessionUnavailable
+
+dotenv.load_dotenv()
+
+console = Console()
+
+MODEL = "claude-sonnet-4-20250514"
+MAX_TOKENS = 1000
+MAX_UPSTREAM_CONNECTIONS = int(os.getenv("CHAT_SERVER_MAX_CONNECTIONS", "32"))
+MAX_RESIDENT_SESSIONS = int(os.getenv("CHAT_SERVER_MAX_RESIDENT", "1000"))
+SESSION_IDLE_SECONDS = float(os.getenv("CHAT_SERVER_IDLE_SECONDS", "900"))
+
+
+async def get_session(app, session_id, create=False):
+    """Devuelve la sesión residente, rehidratándola del disco si hace falta"""
+    if not is_valid_session_id(session_id):
+        raise web.HTTPBadRequest(text="session_id inválido")
+    try:
+        session = await app["sessions"].get(session_id, create=create)
+    except SessionUnavailable as e:
+        raise web.HTTPServiceUnavailable(text=str(e))
+    if session is None:
+        raise web.HTTPNotFound(text=f"Sesión no encontrada: {session_id}")
+    return session
+
+
+async def run_turn(app, session_id, content):
+    """Ejecuta un turno completo de la sesión y va devolviendo los deltas de texto.
+
+    La sesión se resuelve de nuevo en cada turno (la que tenga el handler puede
+    haberse expulsado) y su cerrojo se mantiene durante todo el turno, de modo
+    que dos mensajes simultáneos de la misma sesión nunca se intercalan.
+    """
+    session = await app["sessions"].acquire(session_id, create=True)
+    try:
+        session.conversation.append({"role": "user", "content": content})
+        session.last_active = time.monotonic()
+        session.dirty = True
+        assistant_content = []
+        completed = False
+        try:
+            async with app["upstream_slots"]:
+                async with app["client"].messages.stream(
+                    model=MODEL,
+                    max_tokens=MAX_TOKENS,
+                    messages=session.conversation
+                ) as stream:
+                    async for text in stream.text_stream:
+                        assistant_content.append(text)
+                        yield text
+            completed = True
+        finally:
+            if completed:
+                session.conversation.append({"role": "assistant", "content": "".join(assistant_content)})
+                await asyncio.to_thread(save_session, session.session_id, list(session.conversation))
+            else:
+                # Turno cancelado o fallido: no dejar un mensaje de usuario sin respuesta
+                session.conversation.pop()
+            session.dirty = False
+            session.last_active = time.monotonic()
+    finally:
+        session.lock.release()
+
+
+def message_content(body):
+    """Texto del mensaje de un cuerpo JSON ya decodificado; ValueError si no es válido"""
+    if not isinstance(body, dict):
+        raise ValueError("El cuerpo JSON debe ser un objeto con 'content'")
+    content = body.get("content") or ""
+    if not isinstance(content, str):
+        raise ValueError("'content' debe ser texto")
+    content = content.strip()
+    if not content:
+        raise ValueError("Falta 'content'")
+    return content
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def create_session(request):
+    session_id = uuid.uuid4().hex
+    await get_session(request.app, session_id, create=True)
+    return web.json_response({"session_id": session_id}, status=201)
+
+
+async def put_session(request):
+    """Crea (o reutiliza) una sesión con un id elegido por el cliente o el proxy"""
+    session = await get_session(request.app, request.match_info["session_id"], create=True)
+    return web.json_response({"session_id": session.session_id}, status=201)
+
+
+async def get_history(request):
+    session = await get_session(request.app, request.match_info["session_id"])
+    return web.json_response({
+        "session_id": session.session_id,
+        "conversation": session.conversation,
+    })
+
+
+async def delete_session(request):
+    session_id = request.match_info["session_id"]
+    released = await request.app["sessions"].release(session_id)
+    return web.json_response({"session_id": session_id, "released": released})
+
+
+async def post_message(request):
+    session = await get_session(request.app, request.match_info["session_id"], create=True)
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="Cuerpo JSON inválido")
+    try:
+        content = message_content(body)
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+
+    wants_stream = request.query.get("stream") in {"1", "true"} or \
+        "text/event-stream" in request.headers.get("Accept", "")
+
+    if not wants_stream:
+        turn = run_turn(request.app, session.session_id, content)
+        try:
+            text = "".join([delta async for delta in turn])
+        except SessionUnavailable as e:
+            raise web.HTTPServiceUnavailable(text=str(e))
+        except Exception as e:
+            raise web.HTTPBadGateway(text=f"Error del modelo: {e}")
+        finally:
+            await turn.aclose()
+        return web.json_response({"session_id": session.session_id, "content": text})
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+    })
+    await response.prepare(request)
+    turn = run_turn(request.app, session.session_id, content)
+    try:
+        async for delta in turn:
+            await response.write(sse_event("delta", {"text": delta}))
+        await response.write(sse_event("done", {"session_id": session.session_id}))
+    except ConnectionResetError:
+        # El cliente se ha ido; al cerrar el turno se deshace el mensaje pendiente
+        pass
+    except Exception as e:
+        await response.write(sse_event("error", {"message": str(e)}))
+    finally:
+        # Cerrar el generador libera el cerrojo de la sesión de inmediato
+        await turn.aclose()
+    return response
+
+
+async def websocket_handler(request):
+    session = await get_session(request.app, request.match_info["session_id"], create=True)
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+
+    async for msg in ws:
+        if msg.type != web.WSMsgType.TEXT:
+            continue
+        try:
+            content = message_content(json.loads(msg.data))
+        except json.JSONDecodeError:
+            # Texto plano: el propio mensaje
+            content = msg.data.strip()
+        except ValueError as e:
+            await ws.send_json({"type": "error", "message": str(e)})
+            continue
+        if not content:
+            await ws.send_json({"type": "error", "message": "Falta 'content'"})
+            continue
+        turn = run_turn(request.app, session.session_id, content)
+        try:
+            async for delta in turn:
+                await ws.send_json({"type": "delta", "text": delta})
+            await ws.send_json({"type": "done"})
+        except Exception as e:
+            if ws.closed:
+                break
+            await ws.send_json({"type": "error", "message": str(e)})
+        finally:
+            await turn.aclose()
+    return ws
+
+
+async def health(request):
+    return web.json_response({"status": "ok", "pid": os.getpid(), "sessions": len(request.app["sessions"])})
+
+
+async def metrics(request):
+    return web.json_response(request.app["sessions"].stats())
+
+
+async def on_startup(app):
+    # Un único cliente para todas las sesiones: comparte el pool de conexiones
+    app["client"] = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    app["sweeper"] = asyncio.create_task(app["sessions"].run_sweeper())
+
+
+async def on_cleanup(app):
+    app["sweeper"].cancel()
+    await app["client"].close()
+
+
+def create_app():
+    """Construye la aplicación aiohttp con el estado compartido del servidor"""
+    app = web.Application()
+    app["sessions"] = SessionManager(max_resident=MAX_RESIDENT_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS)
+    app["upstream_slots"] = asyncio.Semaphore(MAX_UPSTREAM_CONNECTIONS)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_post("/sessions", create_session)
+    app.router.add_put("/sessions/{session_id}", put_session)
+    app.router.add_get("/sessions/{session_id}", get_history)
+    app.router.add_delete("/sessions/{session_id}", delete_session)
+    app.router.add_post("/sessions/{session_id}/messages", post_message)
+    app.router.add_get("/sessions/{session_id}/ws", websocket_handler)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de chat multi-sesión con Claude")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    if not os.getenv("ANTHROPIC_API_KEY"):
+        console.print("[red]❌ Error: ANTHROPIC_API_KEY no encontrada en el archivo .env[/red]")
+        return
+
+    console.print(f"[bold blue]🌐 Servidor de chat escuchando en http://{args.host}:{args.port}[/bold blue]")
+    web.run_app(create_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
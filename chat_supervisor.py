@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Supervisor multi-proceso para chat_server.py
+Arranca N procesos worker y un proxy frontal que envía cada sesión siempre al
+mismo worker mediante hashing consistente, para que su historial en memoria
+siga caliente. Si un worker muere, sus sesiones pasan a los demás (que las
+recargan desde el log persistido) y el worker se vuelve a lanzar.
+
+Uso:
+    python chat_supervisor.py --workers 4 --port 8080
+"""
+
+import os
+import time
+import uuid
+import bisect
+import asyncio
+import hashlib
+import argparse
+import multiprocessing
+from collections import OrderedDict
+import dotenv
+import aiohttp
+from aiohttp import web
+from rich.console import Console
+from session_store import is_valid_session_id
+
+dotenv.load_dotenv()
+
+console = Console()
+
+VIRTUAL_NODES = 64
+HEALTH_INTERVAL_SECONDS = 1.0
+# Pasado el tiempo de inactividad de los workers su copia ya se ha expulsado: no hace falta recordar el dueño
+OWNER_IDLE_SECONDS = float(os.getenv("CHAT_SERVER_IDLE_SECONDS", "900"))
+MAX_TRACKED_SESSIONS = 100_000
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "transfer-encoding", "content-length",
+    "upgrade", "proxy-connection", "te", "trailer", "host",
+}
+
+
+class HashRing:
+    """Anillo de hashing consistente con nodos virtuales.
+
+    Al quitar un nodo solo se reasignan las claves que tenía ese nodo; el resto
+    de sesiones siguen en el mismo worker.
+    """
+
+    def __init__(self, virtual_nodes=VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self._hashes = []
+        self._nodes = {}
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def add_node(self, node):
+        for i in range(self.virtual_nodes):
+            h = self._hash(f"{node}#{i}")
+            if h not in self._nodes:
+                bisect.insort(self._hashes, h)
+            self._nodes[h] = node
+
+    def remove_node(self, node):
+        for i in range(self.virtual_nodes):
+            h = self._hash(f"{node}#{i}")
+            if self._nodes.get(h) == node:
+                del self._nodes[h]
+                self._hashes.pop(bisect.bisect_left(self._hashes, h))
+
+    def get_node(self, key):
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._nodes[self._hashes[index]]
+
+    def nodes(self):
+        return set(self._nodes.values())
+
+
+def run_worker(host, port):
+    """Punto de entrada de cada proceso worker"""
+    from chat_server import create_app
+    web.run_app(create_app(), host=host, port=port, print=None)
+
+
+class Supervisor:
+    """Lanza y vigila los workers y mantiene el anillo de rutas"""
+
+    def __init__(self, workers, host, base_port):
+        self.host = host
+        self.ports = {f"worker-{i}": base_port + i for i in range(workers)}
+        self.processes = {}
+        self.ring = HashRing()
+        # Último worker al que se envió cada sesión, para liberar copias obsoletas:
+        # session_id -> (worker, último uso), de la menos a la más usada recientemente
+        self.owners = OrderedDict()
+
+    def worker_url(self, node):
+        return f"http://{self.host}:{self.ports[node]}"
+
+    def spawn(self, node):
+        process = multiprocessing.Process(
+            target=run_worker, args=(self.host, self.ports[node]), name=node, daemon=True
+        )
+        process.start()
+        self.processes[node] = process
+        console.print(f"[dim]🚀 {node} (pid {process.pid}) en el puerto {self.ports[node]}[/dim]")
+
+    async def wait_healthy(self, http, node, timeout=15.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while asyncio.get_running_loop().time() < deadline:
+            try:
+                async with http.get(self.worker_url(node) + "/health") as response:
+                    if response.status == 200:
+                        return True
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+        return False
+
+    async def start(self, http):
+        for node in self.ports:
+            self.spawn(node)
+        for node in self.ports:
+            if await self.wait_healthy(http, node):
+                self.ring.add_node(node)
+            else:
+                console.print(f"[red]❌ {node} no responde[/red]")
+
+    async def monitor(self, http):
+        """Detecta workers caídos, los saca del anillo y los relanza"""
+        while True:
+            await asyncio.sleep(HEALTH_INTERVAL_SECONDS)
+            for node, process in list(self.processes.items()):
+                if not process.is_alive():
+                    console.print(f"[yellow]⚠️ {node} ha terminado (código {process.exitcode}); "
+                                  f"sus sesiones pasan a otros workers[/yellow]")
+                    self.mark_down(node)
+                    self.spawn(node)
+                if node not in self.ring.nodes() and await self.wait_healthy(http, node):
+                    self.ring.add_node(node)
+                    console.print(f"[green]✅ {node} vuelve al anillo[/green]")
+
+    def mark_down(self, node):
+        """Saca un worker del anillo; sus sesiones se recargarán del log en otro worker"""
+        self.ring.remove_node(node)
+        self.owners = OrderedDict((sid, owner) for sid, owner in self.owners.items() if owner[0] != node)
+
+    def forget(self, session_id):
+        """La sesión se ha borrado: ya no hay copia que liberar"""
+        self.owners.pop(session_id, None)
+
+    def prune_owners(self, now):
+        """Olvida las sesiones inactivas (ya expulsadas en su worker) y limita el total"""
+        while self.owners:
+            _, (_, last_used) = next(iter(self.owners.items()))
+            if now - last_used <= OWNER_IDLE_SECONDS and len(self.owners) <= MAX_TRACKED_SESSIONS:
+                return
+            self.owners.popitem(last=False)
+
+    async def route(self, http, session_id):
+        """Devuelve el worker de la sesión, liberando la copia del anterior si ha cambiado"""
+        node = self.ring.get_node(session_id)
+        if node is None:
+            raise web.HTTPServiceUnavailable(text="No hay workers disponibles")
+        now = time.monotonic()
+        self.prune_owners(now)
+        previous, _ = self.owners.get(session_id, (None, None))
+        if previous and previous != node and previous in self.ring.nodes():
+            # El worker anterior sigue vivo con un historial que ya no es la fuente de verdad
+            try:
+                async with http.delete(f"{self.worker_url(previous)}/sessions/{session_id}"):
+                    pass
+            except aiohttp.ClientError:
+                pass
+        self.owners[session_id] = (node, now)
+        self.owners.move_to_end(session_id)
+        return node
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=5)
+
+
+def forward_headers(headers):
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+
+async def proxy_http(request, node_url, path, body):
+    http = request.app["http"]
+    async with http.request(
+        request.method, node_url + path, params=request.query,
+        headers=forward_headers(request.headers), data=body or None
+    ) as upstream:
+        response = web.StreamResponse(status=upstream.status, headers=forward_headers(upstream.headers))
+        await response.prepare(request)
+        # Reenvío por trozos para no romper el streaming SSE
+        async for chunk in upstream.content.iter_any():
+            await response.write(chunk)
+        await response.write_eof()
+        return response
+
+
+async def proxy_websocket(request, node_url, path):
+    http = request.app["http"]
+    # Primero el worker: si no acepta la conexión, el cliente aún no se ha aceptado y se puede reintentar
+    async with http.ws_connect(node_url + path) as ws_worker:
+        ws_client = web.WebSocketResponse(heartbeat=30)
+        await ws_client.prepare(request)
+
+        async def pump(source, target):
+            async for msg in source:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    await target.send_str(msg.data)
+                elif msg.type == aiohttp.WSMsgType.BINARY:
+                    await target.send_bytes(msg.data)
+                else:
+                    break
+            await target.close()
+
+        await asyncio.gather(pump(ws_client, ws_worker), pump(ws_worker, ws_client),
+                             return_exceptions=True)
+    return ws_client
+
+
+async def create_session(request):
+    session_id = uuid.uuid4().hex
+    supervisor = request.app["supervisor"]
+    node = await supervisor.route(request.app["http"], session_id)
+    async with request.app["http"].put(f"{supervisor.worker_url(node)}/sessions/{session_id}") as upstream:
+        return web.json_response(await upstream.json(), status=upstream.status)
+
+
+async def session_handler(request):
+    session_id = request.match_info["session_id"]
+    if not is_valid_session_id(session_id):
+        raise web.HTTPBadRequest(text="session_id inválido")
+    supervisor = request.app["supervisor"]
+    body = await request.read()
+    for attempt in range(2):
+        node = await supervisor.route(request.app["http"], session_id)
+        node_url = supervisor.worker_url(node)
+        try:
+            if request.headers.get("Upgrade", "").lower() == "websocket":
+                return await proxy_websocket(request, node_url, request.path)
+            response = await proxy_http(request, node_url, request.path, body)
+            if request.method == "DELETE" and response.status < 400:
+                supervisor.forget(session_id)
+            return response
+        except aiohttp.ClientConnectorError:
+            # Worker caído antes de que lo detecte el monitor: reintentar en el siguiente
+            console.print(f"[yellow]⚠️ {node} no acepta conexiones; reenviando la sesión[/yellow]")
+            supervisor.mark_down(node)
+    raise web.HTTPServiceUnavailable(text="No hay workers disponibles")
+
+
+async def status(request):
+    supervisor = request.app["supervisor"]
+    return web.json_response({
+        "workers": {
+            node: {"pid": p.pid, "alive": p.is_alive(), "in_ring": node in supervisor.ring.nodes()}
+            for node, p in supervisor.processes.items()
+        },
+        "tracked_sessions": len(supervisor.owners),
+    })
+
+
+def create_proxy_app(supervisor):
+    app = web.Application()
+    app["supervisor"] = supervisor
+
+    async def on_startup(app):
+        app["http"] = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_connect=5))
+        await supervisor.start(app["http"])
+        app["monitor"] = asyncio.create_task(supervisor.monitor(app["http"]))
+
+    async def on_cleanup(app):
+        app["monitor"].cancel()
+        await app["http"].close()
+        supervisor.stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get("/health", status)
+    app.router.add_post("/sessions", create_session)
+    app.router.add_route("*", "/sessions/{session_id}", session_handler)
+    app.router.add_route("*", "/sessions/{session_id}/{tail:.*}", session_handler)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supervisor multi-proceso del servidor de chat")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="Puerto del proxy frontal")
+    parser.add_argument("--worker-base-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    if not os.getenv("ANTHROPIC_API_KEY"):
+        console.print("[red]❌ Error: ANTHROPIC_API_KEY no encontrada en el archivo .env[/red]")
+        return
+
+    supervisor = Supervisor(args.workers, "127.0.0.1", args.worker_base_port)
+    console.print(f"[bold blue]🌐 Proxy en http://{args.host}:{args.port} con {args.workers} workers[/bold blue]")
+    web.run_app(create_proxy_app(supervisor), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Salida sin interfaz para tuberías, scripts y recolectores de logs
+Cuando stdout no es un terminal (o con CHATBOT_OUTPUT), los chatbots no usan
+rich: los deltas se escriben tal cual con os.write, sin búfer, y los eventos
+del turno salen como líneas JSON.
+
+Modos (variable de entorno CHATBOT_OUTPUT):
+    rich   -> interfaz normal con paneles (por defecto en un terminal)
+    text   -> texto de la respuesta en stdout, eventos JSON en stderr
+              (por defecto cuando stdout es una tubería o un fichero)
+    jsonl  -> todo, incluidos los deltas, como líneas JSON en stdout
+
+Eventos: turn_start, delta (solo en jsonl), tool_call, tool_progress,
+tool_result, tool_round, tool_loop, tool_selection, usage, turn_end y error. Cada línea lleva "type" y "ts" (segundos epoch).
+
+Uso:
+    python streaming_chatbot.py < preguntas.txt > respuestas.txt 2> eventos.jsonl
+    echo "Hola" | CHATBOT_OUTPUT=jsonl python statefulchat.py | jq .
+"""
+
+import os
+import sys
+import json
+import time
+from stream_metrics import TurnMetrics
+
+OUTPUT_MODES = ("rich", "text", "jsonl")
+
+
+def output_mode():
+    """Modo de salida: CHATBOT_OUTPUT o, si no está, según stdout sea un terminal"""
+    mode = os.getenv("CHATBOT_OUTPUT", "").strip().lower()
+    if mode in OUTPUT_MODES:
+        return mode
+    return "rich" if sys.stdout.isatty() else "text"
+
+
+def read_inputs(stream=None):
+    """Una pregunta por línea de stdin; termina en EOF o con exit/quit"""
+    for line in stream or sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        if line.lower() in {"exit", "quit"}:
+            return
+        yield line
+
+
+class HeadlessWriter:
+    """Escribe deltas y eventos directamente en los descriptores de salida"""
+
+    def __init__(self, mode="text", out_fd=1, events_fd=2):
+        self.mode = mode
+        self.out_fd = out_fd
+        self.events_fd = out_fd if mode == "jsonl" else events_fd
+        # El lector cerró la tubería (p. ej. "| head"): se deja de escribir
+        self.closed = False
+
+    def _write(self, fd, data):
+        if self.closed:
+            return
+        view = memoryview(data.encode("utf-8"))
+        try:
+            while view:
+                view = view[os.write(fd, view):]
+        except BrokenPipeError:
+            self.closed = True
+
+    def emit(self, type, **fields):
+        record = {"type": type, "ts": round(time.time(), 3), **fields}
+        self._write(self.events_fd, json.dumps(record, ensure_ascii=False) + "\n")
+
+    def delta(self, text):
+        if self.mode == "jsonl":
+            self.emit("delta", text=text)
+        else:
+            self._write(self.out_fd, text)
+
+    def end_text(self):
+        """Cierra la respuesta en stdout con un salto de línea (modo text)"""
+        if self.mode != "jsonl":
+            self._write(self.out_fd, "\n")
+
+    def turn_start(self, user_input, model=None):
+        self.emit("turn_start", input=user_input, model=model)
+
+    def tool_call(self, name, tool_input, tool_id=None):
+        self.emit("tool_call", id=tool_id, name=name, input=tool_input)
+
+    def tool_result(self, name, result, tool_id=None):
+        self.emit("tool_result", id=tool_id, name=name, result=result)
+
+    def usage(self, input_tokens, output_tokens):
+        self.emit("usage", input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def turn_end(self, metrics):
+        self.emit("turn_end", **metrics)
+
+
+class PlainRenderer:
+    """Sustituto de StreamRenderer que escribe cada delta en cuanto llega"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self._chunks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def append(self, delta):
+        self._chunks.append(delta)
+        self.writer.delta(delta)
+
+    @property
+    def text(self):
+        return "".join(self._chunks)
+
+
+def stream_turn(writer, user_input, events, model=None):
+    """Consume los StreamEvent de un turno y emite sus eventos.
+
+    Devuelve (texto, métricas del turno, response_id); texto es None si el
+    stream falló. Ctrl+C se emite como turno cancelado y se propaga.
+    """
+    metrics = TurnMetrics(model=model)
+    renderer = PlainRenderer(writer)
+    response_id = None
+    writer.turn_start(user_input, model)
+    try:
+        for event in events:
+            metrics.on_event(event)
+            if event.type == "text":
+                renderer.append(event.text)
+            elif event.type == "done":
+                response_id = event.response_id
+    except KeyboardInterrupt:
+        writer.end_text()
+        writer.turn_end(metrics.finish("cancelled").to_dict())
+        raise
+    except Exception as e:
+        writer.end_text()
+        writer.emit("error", message=str(e))
+        result = metrics.finish("error").to_dict()
+        writer.turn_end(result)
+        return None, result, None
+
+    writer.end_text()
+    result = metrics.finish().to_dict()
+    writer.usage(result["input_tokens"], result["output_tokens"])
+    writer.turn_end(result)
+    return renderer.text, result, response_id
@@ -0,0 +1,124 @@
+"""
+HTTP compartido para las herramientas que llaman a servicios externos
+Todas las peticiones salen de una única requests.Session con un pool de
+conexiones (las llamadas en paralelo reutilizan las conexiones abiertas en vez
+de repetir DNS + TCP + TLS), tiempos máximos de conexión y de lectura, y
+reintentos con espera exponencial para errores de red y respuestas 429/5xx.
+Así un servicio lento corta la herramienta con un error en segundos en lugar
+de bloquear el bucle de herramientas.
+
+current_weather() consulta Open-Meteo para varias coordenadas en una sola
+petición (latitude y longitude separadas por comas) y guarda cada punto en la
+caché de tool_cache, de modo que solo se piden los que faltan.
+
+Variables de entorno:
+    OPEN_METEO_URL        -> endpoint de previsión (por defecto el público; para
+                             pruebas, el de weather_stub.py)
+    HTTP_CONNECT_TIMEOUT  -> segundos para conectar (3 por defecto)
+    HTTP_READ_TIMEOUT     -> segundos para recibir la respuesta (10 por defecto)
+    HTTP_RETRIES          -> reintentos por petición (2 por defecto)
+
+Uso:
+    http_pool.get_json(url, params={...})
+    http_pool.current_weather([(48.86, 2.35), (4.71, -74.07)])
+"""
+
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from tool_cache import default_cache
+
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+POOL_SIZE = 16
+
+# Open-Meteo actualiza los datos actuales cada 15 minutos
+WEATHER_TTL = 900
+MAX_LOCATIONS = 50
+
+_session = None
+_lock = threading.Lock()
+
+
+def session():
+    """Sesión compartida, creada la primera vez que se usa"""
+    global _session
+    with _lock:
+        if _session is None:
+            retry = Retry(
+                total=RETRIES,
+                backoff_factor=0.3,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET"}),
+                respect_retry_after_header=True,
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retry)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def close():
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get_json(url, params=None, timeout=None):
+    """GET con la sesión compartida; lanza requests.RequestException si falla"""
+    response = session().get(url, params=params, timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT))
+    response.raise_for_status()
+    return response.json()
+
+
+def _location_key(latitude, longitude):
+    # 2 decimales son ~1 km: coordenadas casi iguales comparten entrada
+    return round(float(latitude), 2), round(float(longitude), 2)
+
+
+def current_weather(locations, ttl=WEATHER_TTL):
+    """Temperatura y viento actuales de una lista de (latitud, longitud).
+
+    Devuelve una lista de dicts en el mismo orden. Las coordenadas que no están
+    en la caché se piden juntas en una sola petición.
+    """
+    keys = [_location_key(latitude, longitude) for latitude, longitude in locations]
+    if len(keys) > MAX_LOCATIONS:
+        raise ValueError(f"como mucho {MAX_LOCATIONS} ubicaciones por consulta")
+
+    results = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        cached = default_cache.get("open_meteo", key)
+        if isinstance(cached, dict):
+            results[key] = cached
+        else:
+            missing.append(key)
+
+    if missing:
+        data = get_json(OPEN_METEO_URL, params={
+            "latitude": ",".join(str(latitude) for latitude, _ in missing),
+            "longitude": ",".join(str(longitude) for _, longitude in missing),
+            "current": "temperature_2m,wind_speed_10m",
+        })
+        # Con una sola coordenada Open-Meteo devuelve un objeto; con varias, una lista
+        points = data if isinstance(data, list) else [data]
+        for key, point in zip(missing, points):
+            current = point["current"]
+            weather = {
+                "latitude": key[0],
+                "longitude": key[1],
+                "temperature": current["temperature_2m"],
+                "wind_speed": current.get("wind_speed_10m"),
+            }
+            default_cache.put("open_meteo", key, weather, ttl)
+            results[key] = weather
+
+    return [results[key] for key in keys]
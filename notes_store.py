@@ -0,0 +1,187 @@
+"""
+Almacén de notas indexado con SQLite FTS5
+create_note guarda cada nota en una tabla SQLite con un índice de texto
+completo (FTS5), además de en su .txt de siempre. search() responde "¿qué anoté
+sobre X?" con una consulta al índice ordenada por relevancia (bm25) y devuelve
+fragmentos con los términos marcados, recortados a un presupuesto de tokens;
+get() devuelve una nota completa por id.
+
+Las notas .txt que ya existían en notes/ se importan la primera vez que se abre
+el almacén (y las nuevas que aparezcan, en las siguientes aperturas). Si la
+versión de SQLite no trae FTS5, la búsqueda recurre a LIKE sobre la tabla.
+
+Uso:
+    store = NotesStore()
+    note_id = store.create("Ideas", "Comprar leche y pan")
+    for hit in store.search("leche", max_tokens=300): ...
+    store.get(note_id)
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from stream_cancel import CHARS_PER_TOKEN
+
+NOTES_DIR = "notes"
+NOTES_DB = os.getenv("NOTES_DB", os.path.join(NOTES_DIR, "notes.db"))
+SEARCH_LIMIT = 8
+SEARCH_MAX_TOKENS = 600
+SNIPPET_WORDS = 24
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created TEXT NOT NULL,
+    source TEXT UNIQUE
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    title, content, content='notes', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS notes_ai AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_ad AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts(notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+END;
+"""
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text):
+    return max(1, round(len(text) / CHARS_PER_TOKEN))
+
+
+def parse_note_file(path):
+    """(título, fecha, contenido) de un .txt con el formato de create_note"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    header, separator, content = text.partition("=" * 50 + "\n")
+    if not separator:
+        modified = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+        return os.path.splitext(os.path.basename(path))[0], modified, text
+    fields = dict(line.split(": ", 1) for line in header.splitlines() if ": " in line)
+    return fields.get("Título", os.path.basename(path)), fields.get("Fecha", ""), content
+
+
+class NotesStore:
+    """Notas en SQLite; una conexión compartida protegida con un lock (las herramientas van en hilos)"""
+
+    def __init__(self, path=NOTES_DB, notes_dir=NOTES_DIR):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.notes_dir = notes_dir
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            try:
+                self._db.executescript(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False
+        self.imported = self.import_directory(notes_dir)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def import_directory(self, notes_dir=NOTES_DIR):
+        """Indexa los .txt de notes_dir que aún no están en el almacén; devuelve cuántos"""
+        if not os.path.isdir(notes_dir):
+            return 0
+        with self._lock:
+            known = {row[0] for row in self._db.execute("SELECT source FROM notes WHERE source IS NOT NULL")}
+        new_files = [entry.path for entry in os.scandir(notes_dir)
+                     if entry.name.endswith(".txt") and entry.is_file() and entry.path not in known]
+        rows = [(*parse_note_file(path), path) for path in sorted(new_files)]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR IGNORE INTO notes(title, created, content, source) VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def create(self, title, content, source=None):
+        created = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self._db:
+            cursor = self._db.execute("INSERT INTO notes(title, content, created, source) VALUES (?, ?, ?, ?)",
+                                      (title, content, created, source))
+        return cursor.lastrowid
+
+    def get(self, note_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM notes WHERE id = ?", (note_id,)).fetchone()
+        return dict(row) if row else None
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM notes").fetchone()[0]
+
+    def _query_fts(self, terms, limit):
+        # Cada término entre comillas (sin sintaxis FTS del usuario) y con prefijo: "lech"*
+        match = " OR ".join(f'"{term}"*' for term in terms)
+        return self._db.execute(
+            "SELECT notes.id, notes.title, notes.created, "
+            f"snippet(notes_fts, 1, '[', ']', '…', {SNIPPET_WORDS}) AS snippet, bm25(notes_fts, 5.0, 1.0) AS score "
+            "FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid "
+            "WHERE notes_fts MATCH ? ORDER BY score LIMIT ?",
+            (match, limit),
+        ).fetchall()
+
+    def _query_like(self, terms, limit):
+        where = " OR ".join("(title LIKE ? OR content LIKE ?)" for _ in terms)
+        params = [value for term in terms for value in (f"%{term}%", f"%{term}%")]
+        rows = self._db.execute(
+            f"SELECT id, title, created, substr(content, 1, 160) AS snippet, 0 AS score FROM notes "
+            f"WHERE {where} ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+        return rows
+
+    def search(self, query, max_tokens=SEARCH_MAX_TOKENS, limit=SEARCH_LIMIT):
+        """Notas más relevantes como dicts (id, title, created, snippet), dentro de max_tokens"""
+        terms = WORD_PATTERN.findall(query)
+        if not terms:
+            return []
+        with self._lock:
+            rows = self._query_fts(terms, limit) if self.fts else self._query_like(terms, limit)
+
+        hits = []
+        used = 0
+        for row in rows:
+            hit = {"id": row["id"], "title": row["title"], "created": row["created"],
+                   "snippet": " ".join(row["snippet"].split())}
+            cost = estimate_tokens(f"{hit['id']} {hit['title']} {hit['created']} {hit['snippet']}")
+            # Siempre al menos un resultado; el resto solo si cabe en el presupuesto
+            if hits and used + cost > max_tokens:
+                break
+            hits.append(hit)
+            used += cost
+        return hits
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def default_store():
+    """Almacén compartido, abierto (e importado) la primera vez que se usa"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = NotesStore()
+        return _store
+
+
+def format_hits(query, hits):
+    if not hits:
+        return f"No hay notas sobre: {query}"
+    lines = [f"Notas sobre '{query}' (de más a menos relevante; usa get_note con el id para leer una entera):"]
+    lines.extend(f"- [{hit['id']}] {hit['title']} ({hit['created']}): {hit['snippet']}" for hit in hits)
+    return "\n".join(lines)
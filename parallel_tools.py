@@ -0,0 +1,97 @@
+"""
+Ejecución en paralelo de las llamadas a herramientas de un turno
+Cuando el modelo pide varias herramientas en la misma respuesta (el clima de
+tres ciudades y una nota, por ejemplo) son independientes entre sí: se lanzan
+a la vez en un pool de hilos, con un límite de llamadas simultáneas por
+herramienta, y los resultados se devuelven en el orden original.
+
+Uso:
+    runner = ParallelToolRunner(execute_tool, limits={"create_note": 1})
+    results, report = runner.run_all([("get_weather", {"city": "Madrid"}), ...])
+    print(format_report(report))
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_TOOL_LIMIT = 4
+
+
+class ToolCall:
+    """Una llamada lanzada en el pool, con su duración real"""
+
+    __slots__ = ("name", "args", "future", "submitted", "elapsed")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.future = None
+        self.submitted = time.perf_counter()
+        self.elapsed = None
+
+    def result(self):
+        return self.future.result()
+
+
+class ParallelToolRunner:
+    """Pool de hilos con un semáforo por herramienta"""
+
+    def __init__(self, call, limits=None, default_limit=DEFAULT_TOOL_LIMIT, max_workers=8):
+        self.call = call
+        self.limits = limits or {}
+        self.default_limit = default_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, name):
+        with self._lock:
+            if name not in self._semaphores:
+                self._semaphores[name] = threading.BoundedSemaphore(self.limits.get(name, self.default_limit))
+            return self._semaphores[name]
+
+    def _run(self, tool_call):
+        with self._semaphore(tool_call.name):
+            started = time.perf_counter()
+            try:
+                return self.call(tool_call.name, tool_call.args)
+            finally:
+                tool_call.elapsed = time.perf_counter() - started
+
+    def submit(self, name, args):
+        """Lanza una llamada sin esperar a su resultado"""
+        tool_call = ToolCall(name, args)
+        tool_call.future = self._executor.submit(self._run, tool_call)
+        return tool_call
+
+    def gather(self, tool_calls, started=None):
+        """Espera a las llamadas y devuelve (resultados en orden, informe de tiempos).
+
+        Sin started se mide desde que se lanzó la primera llamada.
+        """
+        if started is None:
+            started = min((tool_call.submitted for tool_call in tool_calls), default=time.perf_counter())
+        results = [tool_call.result() for tool_call in tool_calls]
+        wall = time.perf_counter() - started
+        sequential = sum(tool_call.elapsed or 0 for tool_call in tool_calls)
+        report = {
+            "calls": len(tool_calls),
+            "wall_ms": round(wall * 1000, 1),
+            "sequential_ms": round(sequential * 1000, 1),
+            "saved_ms": round(max(sequential - wall, 0) * 1000, 1),
+        }
+        return results, report
+
+    def run_all(self, calls):
+        """Ejecuta una lista de (nombre, argumentos) en paralelo"""
+        started = time.perf_counter()
+        return self.gather([self.submit(name, args) for name, args in calls], started)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def format_report(report):
+    return (f"⚡ {report['calls']} herramientas en {report['wall_ms']} ms "
+            f"(en serie: {report['sequential_ms']} ms, ahorro: {report['saved_ms']} ms)")
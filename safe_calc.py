@@ -0,0 +1,303 @@
+"""
+Calculadora segura basada en el AST
+La expresión se analiza con ast.parse y solo se aceptan números, operadores
+aritméticos, constantes (pi, e, tau) y una lista blanca de funciones
+matemáticas. Cada expresión se compila una vez a un árbol de funciones de
+Python que se guarda en una caché LRU por el texto de la expresión, así que
+repetirla no vuelve a analizarla.
+
+Límites para que una llamada no deje un núcleo al 100 %:
+    - longitud de la expresión y número de nodos
+    - tamaño de los enteros resultantes de ** y * (en bits) y de factorial()
+    - tiempo de evaluación (se comprueba en potencias y llamadas a funciones)
+
+evaluate_batch() evalúa la misma expresión sobre rangos o listas de valores
+de una pasada vectorizada con NumPy (si está instalado; si no, punto a punto
+con la expresión ya compilada) y summarize_batch() la resume en estadísticas y
+una tabla reducida.
+
+Uso:
+    evaluate("sqrt(16) + sin(pi/2)")          -> 5.0
+    evaluate("x**2 + 1", {"x": 3})             -> 10
+    evaluate_batch("sin(x)", {"x": {"start": 0, "stop": "2*pi", "steps": 1000}})
+"""
+
+import ast
+import math
+import time
+import operator
+import statistics
+from functools import lru_cache, reduce
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_EXPRESSION_LENGTH = 500
+MAX_NODES = 200
+MAX_INT_BITS = 4096
+MAX_FACTORIAL = 1000
+DEFAULT_TIMEOUT = 0.5
+CACHE_SIZE = 256
+MAX_BATCH_POINTS = 100_000
+BATCH_TIMEOUT = 2.0
+
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+
+class CalcError(ValueError):
+    """Expresión no permitida o fuera de los límites"""
+
+
+def _check_bits(value):
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise CalcError(f"el resultado supera {MAX_INT_BITS} bits")
+    return value
+
+
+def _safe_pow(base, exponent):
+    # Se estima el tamaño antes de calcular: 10**10**10 no llega a evaluarse
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if exponent * base.bit_length() > MAX_INT_BITS * 2:
+            raise CalcError(f"el resultado supera {MAX_INT_BITS} bits")
+    return _check_bits(operator.pow(base, exponent))
+
+
+def _safe_mul(left, right):
+    if isinstance(left, int) and isinstance(right, int) and \
+            left.bit_length() + right.bit_length() > MAX_INT_BITS + 1:
+        raise CalcError(f"el resultado supera {MAX_INT_BITS} bits")
+    return operator.mul(left, right)
+
+
+def _safe_factorial(n):
+    if n > MAX_FACTORIAL:
+        raise CalcError(f"factorial() admite como máximo {MAX_FACTORIAL}")
+    return math.factorial(n)
+
+
+MATH_FUNCTIONS = {
+    "sqrt": math.sqrt, "exp": math.exp, "log": math.log, "log10": math.log10, "log2": math.log2,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan,
+    "asin": math.asin, "acos": math.acos, "atan": math.atan, "atan2": math.atan2,
+    "sinh": math.sinh, "cosh": math.cosh, "tanh": math.tanh,
+    "degrees": math.degrees, "radians": math.radians, "hypot": math.hypot,
+    "floor": math.floor, "ceil": math.ceil, "abs": abs, "round": round,
+    "min": min, "max": max, "factorial": _safe_factorial,
+}
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: _safe_mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: _safe_pow,
+}
+UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+def _check_deadline(namespace):
+    if time.perf_counter() > namespace["__deadline__"]:
+        raise CalcError("tiempo de evaluación agotado")
+
+
+def _compile_node(node, names):
+    """Convierte un nodo del AST en una función namespace -> valor"""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = node.value
+        return lambda namespace: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name not in names:
+            raise CalcError(f"nombre no permitido: {name}")
+        return lambda namespace: namespace[name]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        op = BINARY_OPERATORS[type(node.op)]
+        left = _compile_node(node.left, names)
+        right = _compile_node(node.right, names)
+        if isinstance(node.op, ast.Pow):
+            def power(namespace):
+                _check_deadline(namespace)
+                return namespace["__pow__"](left(namespace), right(namespace))
+            return power
+        if isinstance(node.op, ast.Mult):
+            return lambda namespace: namespace["__mul__"](left(namespace), right(namespace))
+        return lambda namespace: op(left(namespace), right(namespace))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        op = UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand, names)
+        return lambda namespace: op(operand(namespace))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        function = node.func.id
+        if function not in MATH_FUNCTIONS:
+            raise CalcError(f"función no permitida: {function}")
+        args = [_compile_node(arg, names) for arg in node.args]
+
+        def call(namespace):
+            _check_deadline(namespace)
+            return namespace[function](*[arg(namespace) for arg in args])
+        return call
+
+    raise CalcError(f"operación no permitida: {type(node).__name__}")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(expression, variables=()):
+    """Compila la expresión una sola vez; variables son los nombres libres admitidos"""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalcError(f"la expresión supera {MAX_EXPRESSION_LENGTH} caracteres")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise CalcError(f"sintaxis no válida: {e.msg}") from None
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise CalcError(f"la expresión supera {MAX_NODES} nodos")
+    return _compile_node(tree.body, set(CONSTANTS) | set(variables))
+
+
+SCALAR_NAMESPACE = {**CONSTANTS, **MATH_FUNCTIONS, "__pow__": _safe_pow, "__mul__": _safe_mul}
+
+
+def evaluate(expression, variables=None, timeout=DEFAULT_TIMEOUT, namespace=SCALAR_NAMESPACE):
+    """Evalúa una expresión con la caché de compilación y los límites de la calculadora"""
+    variables = variables or {}
+    compiled = compile_expression(expression, tuple(sorted(variables)))
+    return compiled({**namespace, **variables, "__deadline__": time.perf_counter() + timeout})
+
+
+def cache_info():
+    return compile_expression.cache_info()
+
+
+def _numpy_namespace():
+    """Las mismas funciones que MATH_FUNCTIONS, en versión vectorizada"""
+    def log(x, base=None):
+        return np.log(x) if base is None else np.log(x) / np.log(base)
+
+    def factorial(n):
+        return np.vectorize(_safe_factorial, otypes=[float])(n)
+
+    functions = {
+        "sqrt": np.sqrt, "exp": np.exp, "log": log, "log10": np.log10, "log2": np.log2,
+        "sin": np.sin, "cos": np.cos, "tan": np.tan,
+        "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan, "atan2": np.arctan2,
+        "sinh": np.sinh, "cosh": np.cosh, "tanh": np.tanh,
+        "degrees": np.degrees, "radians": np.radians, "hypot": np.hypot,
+        "floor": np.floor, "ceil": np.ceil, "abs": np.abs, "round": np.round,
+        "min": lambda *args: reduce(np.minimum, args), "max": lambda *args: reduce(np.maximum, args),
+        "factorial": factorial,
+    }
+    # Con arrays de float no hay enteros gigantes: basta con los operadores de NumPy
+    return {**CONSTANTS, **functions, "__pow__": np.power, "__mul__": np.multiply}
+
+
+NUMPY_NAMESPACE = _numpy_namespace() if np is not None else None
+
+
+def _expand_variable(name, spec):
+    """Lista de valores de una variable: lista/número o {"start", "stop", "steps"}"""
+    if isinstance(spec, dict):
+        try:
+            start = evaluate(str(spec["start"]))
+            stop = evaluate(str(spec["stop"]))
+            steps = int(spec.get("steps", 100))
+        except KeyError as e:
+            raise CalcError(f"al rango de {name} le falta {e}") from None
+        except (TypeError, ValueError) as e:
+            if isinstance(e, CalcError):
+                raise
+            raise CalcError(f"steps de {name} debe ser un número entero") from None
+        if steps < 1 or steps > MAX_BATCH_POINTS:
+            raise CalcError(f"steps de {name} debe estar entre 1 y {MAX_BATCH_POINTS}")
+        if steps == 1:
+            return [start]
+        step = (stop - start) / (steps - 1)
+        return [start + i * step for i in range(steps)]
+    if isinstance(spec, (int, float)) and not isinstance(spec, bool):
+        return [spec]
+    if not isinstance(spec, list):
+        raise CalcError(f"{name} debe ser un número, una lista de números o un rango {{start, stop, steps}}")
+    if not spec:
+        raise CalcError(f"{name} no tiene valores")
+    if len(spec) > MAX_BATCH_POINTS:
+        raise CalcError(f"{name} supera {MAX_BATCH_POINTS} valores")
+    values = []
+    for value in spec:
+        if isinstance(value, str):
+            values.append(evaluate(value))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values.append(value)
+        else:
+            raise CalcError(f"los valores de {name} deben ser números")
+    return values
+
+
+def evaluate_batch(expression, variables, timeout=BATCH_TIMEOUT):
+    """Evalúa expression para todos los valores de variables en una sola pasada.
+
+    Las variables con un solo valor se repiten; las demás deben tener la misma
+    longitud. Devuelve {"variables": {nombre: valores}, "values": resultados,
+    "vectorized": bool}; los puntos donde la función no está definida son nan.
+    """
+    if not isinstance(variables, dict) or not variables:
+        raise CalcError("variables debe ser un objeto {nombre: valores} con al menos una variable")
+    columns = {name: _expand_variable(name, spec) for name, spec in variables.items()}
+    points = max((len(values) for values in columns.values()), default=1)
+    for name, values in columns.items():
+        if len(values) == 1:
+            columns[name] = values * points
+        elif len(values) != points:
+            raise CalcError(f"{name} tiene {len(values)} valores y se esperaban {points}")
+
+    compiled = compile_expression(expression, tuple(sorted(columns)))
+    deadline = time.perf_counter() + timeout
+
+    if NUMPY_NAMESPACE is not None:
+        arrays = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+        with np.errstate(all="ignore"):
+            result = compiled({**NUMPY_NAMESPACE, **arrays, "__deadline__": deadline})
+        values = np.broadcast_to(np.asarray(result, dtype=float), (points,)).tolist()
+        return {"variables": columns, "values": values, "vectorized": True}
+
+    values = []
+    namespace = {**SCALAR_NAMESPACE, "__deadline__": deadline}
+    for index in range(points):
+        for name, column in columns.items():
+            namespace[name] = column[index]
+        try:
+            values.append(float(compiled(namespace)))
+        except (ArithmeticError, ValueError, TypeError) as e:
+            if isinstance(e, CalcError) and time.perf_counter() > deadline:
+                raise
+            values.append(math.nan)
+    return {"variables": columns, "values": values, "vectorized": False}
+
+
+def summarize_batch(expression, batch, rows=11):
+    """Texto con estadísticas y una tabla de como mucho rows filas equiespaciadas"""
+    values = batch["values"]
+    names = list(batch["variables"])
+    finite = [(index, value) for index, value in enumerate(values) if math.isfinite(value)]
+
+    def point(index):
+        return ", ".join(f"{name}={batch['variables'][name][index]:.6g}" for name in names)
+
+    lines = [f"{expression} evaluada en {len(values)} puntos"]
+    if finite:
+        only = [value for _, value in finite]
+        low = min(finite, key=lambda item: item[1])
+        high = max(finite, key=lambda item: item[1])
+        lines.append(f"mín {low[1]:.6g} ({point(low[0])}) · máx {high[1]:.6g} ({point(high[0])}) · "
+                     f"media {statistics.fmean(only):.6g} · desv. {statistics.pstdev(only):.6g}")
+    if len(finite) < len(values):
+        lines.append(f"{len(values) - len(finite)} puntos sin valor finito (fuera del dominio o desbordados)")
+
+    rows = max(2, min(rows, len(values)))
+    step = (len(values) - 1) / (rows - 1) if len(values) > 1 else 0
+    indices = sorted({round(i * step) for i in range(rows)})
+    lines.append(" | ".join(names + [expression]))
+    for index in indices:
+        lines.append(" | ".join([f"{batch['variables'][name][index]:.6g}" for name in names] + [f"{values[index]:.6g}"]))
+    return "\n".join(lines)
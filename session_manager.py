@@ -0,0 +1,174 @@
+"""
+Gestor de sesiones en memoria con expulsión a disco
+Mantiene residentes solo las sesiones activas (LRU + tiempo de inactividad).
+Las sesiones frías se vuelcan a la capa de persistencia y en memoria queda un
+descriptor pequeño; se rehidratan de forma perezosa con el siguiente mensaje.
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from session_store import save_session, load_session, session_exists
+
+
+class ChatSession:
+    """Estado en memoria de una sesión: historial y cerrojo de orden"""
+
+    def __init__(self, session_id, conversation):
+        self.session_id = session_id
+        self.conversation = conversation
+        # asyncio.Lock es FIFO: los turnos se atienden en orden de llegada
+        self.lock = asyncio.Lock()
+        self.last_active = time.monotonic()
+        # True mientras hay cambios que aún no están en el log persistido
+        self.dirty = False
+
+
+class SessionDescriptor:
+    """Lo único que queda en memoria de una sesión expulsada"""
+
+    __slots__ = ("session_id", "message_count", "evicted_at")
+
+    def __init__(self, session_id, message_count):
+        self.session_id = session_id
+        self.message_count = message_count
+        self.evicted_at = time.monotonic()
+
+
+class SessionUnavailable(Exception):
+    """La sesión no se pudo rehidratar dentro del tiempo límite"""
+
+
+class SessionManager:
+    """Sesiones residentes en LRU con expulsión por tamaño e inactividad"""
+
+    def __init__(self, max_resident=1000, idle_seconds=900, rehydrate_timeout=5.0):
+        self.max_resident = max_resident
+        self.idle_seconds = idle_seconds
+        self.rehydrate_timeout = rehydrate_timeout
+        self.resident = OrderedDict()
+        self.descriptors = {}
+        self._loading = {}
+        self.evictions = 0
+        self.rehydrations = 0
+        self.rehydration_times = []
+
+    def __len__(self):
+        return len(self.resident)
+
+    async def get(self, session_id, create=False):
+        """Devuelve la sesión, rehidratándola del disco si no está residente.
+
+        Devuelve None si no existe y no se pide crearla.
+        """
+        session = self.resident.get(session_id)
+        if session is not None:
+            self.resident.move_to_end(session_id)
+            return session
+
+        # Varias peticiones a la vez sobre la misma sesión fría comparten una sola carga
+        loading = self._loading.get(session_id)
+        if loading is None:
+            loading = asyncio.ensure_future(self._rehydrate(session_id, create))
+            self._loading[session_id] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(session_id, None))
+        return await asyncio.shield(loading)
+
+    async def acquire(self, session_id, create=False):
+        """Devuelve la sesión residente con su cerrojo tomado (None si no existe).
+
+        Un handler puede conservar un ChatSession mientras espera (un WebSocket
+        abierto, un turno en cola) y entretanto la sesión se puede expulsar y
+        rehidratar en otro objeto. Tras tomar el cerrojo se comprueba que sigue
+        siendo la residente; si no, se vuelve a resolver.
+        """
+        while True:
+            session = await self.get(session_id, create=create)
+            if session is None:
+                return None
+            await session.lock.acquire()
+            if self.resident.get(session_id) is session:
+                return session
+            session.lock.release()
+
+    async def _rehydrate(self, session_id, create):
+        known = session_id in self.descriptors or await asyncio.to_thread(session_exists, session_id)
+        if not known and not create:
+            return None
+
+        conversation = []
+        if known:
+            started = time.perf_counter()
+            try:
+                conversation = await asyncio.wait_for(
+                    asyncio.to_thread(load_session, session_id), self.rehydrate_timeout
+                )
+            except asyncio.TimeoutError:
+                raise SessionUnavailable(f"Rehidratación de {session_id} superó {self.rehydrate_timeout}s")
+            self.rehydration_times.append(time.perf_counter() - started)
+            del self.rehydration_times[:-1000]
+            self.rehydrations += 1
+
+        session = ChatSession(session_id, conversation)
+        self.descriptors.pop(session_id, None)
+        self.resident[session_id] = session
+        await self._enforce_capacity()
+        return session
+
+    async def _evict(self, session):
+        """Vuelca y expulsa la sesión; False si tiene un turno en curso o ya no es la residente"""
+        if session.lock.locked() or self.resident.get(session.session_id) is not session:
+            return False
+        # Con el cerrojo tomado nadie empieza un turno sobre la sesión mientras se guarda
+        async with session.lock:
+            if session.dirty:
+                await asyncio.to_thread(save_session, session.session_id, list(session.conversation))
+                session.dirty = False
+            self.resident.pop(session.session_id, None)
+        if session.conversation:
+            self.descriptors[session.session_id] = SessionDescriptor(session.session_id, len(session.conversation))
+        self.evictions += 1
+        return True
+
+    async def _enforce_capacity(self):
+        # Se expulsan las menos usadas recientemente, saltando las que tienen un turno en curso
+        for session in list(self.resident.values()):
+            if len(self.resident) <= self.max_resident:
+                break
+            if not session.lock.locked():
+                await self._evict(session)
+
+    async def evict_idle(self):
+        """Expulsa las sesiones sin actividad durante más de idle_seconds"""
+        now = time.monotonic()
+        for session in list(self.resident.values()):
+            if now - session.last_active > self.idle_seconds and not session.lock.locked():
+                await self._evict(session)
+
+    async def release(self, session_id):
+        """Saca una sesión de memoria (p. ej. cuando otro proceso pasa a ser su dueño).
+
+        Devuelve False si no estaba residente o tiene un turno en curso.
+        """
+        session = self.resident.get(session_id)
+        if session is None:
+            return False
+        return await self._evict(session)
+
+    async def run_sweeper(self, interval=30.0):
+        """Tarea de fondo que aplica la política de inactividad periódicamente"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.evict_idle()
+
+    def stats(self):
+        times = sorted(self.rehydration_times)
+        return {
+            "resident_sessions": len(self.resident),
+            "evicted_descriptors": len(self.descriptors),
+            "evictions": self.evictions,
+            "rehydrations": self.rehydrations,
+            "rehydration_ms_avg": round(1000 * sum(times) / len(times), 2) if times else None,
+            "rehydration_ms_p95": round(1000 * times[int(0.95 * (len(times) - 1))], 2) if times else None,
+            "rehydration_ms_max": round(1000 * times[-1], 2) if times else None,
+        }
@@ -0,0 +1,52 @@
+"""
+Persistencia de sesiones por identificador
+Reutiliza el formato de log TXT + JSON de anthropic_chatbot.py para que las
+sesiones del servidor se puedan abrir también desde el chatbot de consola.
+"""
+
+import os
+import re
+import json
+from anthropic_chatbot import save_conversation_to_log, save_conversation_to_json
+
+LOGS_DIR = "logs"
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def is_valid_session_id(session_id):
+    """Comprueba que el id de sesión es seguro para usarlo como nombre de archivo"""
+    return bool(SESSION_ID_PATTERN.match(session_id or ""))
+
+
+def session_paths(session_id):
+    """Devuelve las rutas (txt, json) del log de una sesión"""
+    base = os.path.join(LOGS_DIR, f"log_anthropic_session_{session_id}")
+    return base + ".txt", base + ".json"
+
+
+def session_exists(session_id):
+    return os.path.exists(session_paths(session_id)[1])
+
+
+def save_session(session_id, conversation):
+    """Guarda la conversación de una sesión en TXT y JSON"""
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    log_path, json_path = session_paths(session_id)
+    save_conversation_to_log(conversation, log_path)
+    save_conversation_to_json(conversation, json_path)
+
+
+def load_session(session_id):
+    """Carga la conversación de una sesión; lista vacía si no existe.
+
+    Lee el JSON directamente, sin los mensajes de consola del chatbot: en el
+    servidor se rehidratan sesiones continuamente.
+    """
+    _, json_path = session_paths(session_id)
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    conversation = data.get("conversation") if isinstance(data, dict) else None
+    return conversation if isinstance(conversation, list) else []
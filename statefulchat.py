@@ -1,34 +1,125 @@
 import os
 from openai import OpenAI
+from rich.console import Console
+from rich.panel import Panel
 import dotenv
+from stream_renderer import StreamRenderer
+from stream_metrics import TurnMetrics, summarize
+from stream_cancel import CancellableStream
+from stream_events import openai_events
+from headless_output import output_mode, read_inputs, HeadlessWriter, stream_turn as headless_turn
 
 dotenv.load_dotenv()
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+console = Console()
+
+INSTRUCTIONS = "You are a helpful assistant. Remember facts the user tells you and reference them in future responses."
+
+
+def stream_turn(params, model, turn_metrics):
+    """Streams one turn; returns (text, response_id) or (None, None) if cancelled"""
+    metrics = TurnMetrics(model=model)
+    response_id = None
+    stream = CancellableStream(client.responses.stream(**params))
+    try:
+        with StreamRenderer(console, "[green]Bot (streaming)[/green]", placeholder="Bot is typing...") as renderer:
+            with stream:
+                for event in openai_events(stream):
+                    metrics.on_event(event)
+                    if event.type == "text":
+                        renderer.append(event.text)
+                    elif event.type == "done":
+                        response_id = event.response_id
+    except KeyboardInterrupt:
+        usage = stream.stats()
+        metrics.extra.update(usage)
+        turn_metrics.append(metrics.finish("cancelled").to_dict())
+        console.print(f"[yellow]Response cancelled in {usage['cancel_latency_ms']} ms[/yellow]")
+        return None, None
+
+    last = metrics.finish().to_dict()
+    turn_metrics.append(last)
+    console.print(Panel(
+        renderer.text,
+        title="[green]Bot[/green]",
+        subtitle=f"[dim]TTFT {last['ttft_ms']} ms · {last['tokens_per_s']} tok/s · {last['total_ms']} ms[/dim]",
+        border_style="green"
+    ))
+    return renderer.text, response_id
+
+
+def show_stats(turn_metrics):
+    latency = summarize(turn_metrics)
+    if not latency["turns"]:
+        console.print("[yellow]No streamed turns yet.[/yellow]")
+        return
+    console.print(f"Turns: {latency['turns']} · TTFT avg/p95: {latency['ttft_ms_avg']}/{latency['ttft_ms_p95']} ms · "
+                  f"{latency['tokens_per_s_avg']} tok/s · gap p50/p95: {latency['gap_p50_ms']}/{latency['gap_p95_ms']} ms")
+
+
+def run_headless(mode, model):
+    """Plain output for pipes: one prompt per stdin line, raw text on stdout, JSON events"""
+    writer = HeadlessWriter(mode)
+    previous_response_id = None
+    for user_input in read_inputs():
+        params = {"model": model, "input": user_input, "instructions": INSTRUCTIONS}
+        if previous_response_id:
+            params["previous_response_id"] = previous_response_id
+        with CancellableStream(client.responses.stream(**params)) as stream:
+            _, _, response_id = headless_turn(writer, user_input, openai_events(stream), model=model)
+        if response_id:
+            previous_response_id = response_id
+        if writer.closed:
+            break
+
 
 def main():
-    print("Stateful Chatbot - Responses API - (type 'exit' to quit)")
+    mode = output_mode()
+    if mode != "rich":
+        try:
+            run_headless(mode, "gpt-4o-mini")
+        except KeyboardInterrupt:
+            pass
+        return
+
+    console.print("Stateful Chatbot - Responses API - (type 'exit' to quit, 'stream' to toggle streaming, 'stats' for latency)")
     previous_response_id = None
     model = "gpt-4o-mini"
+    streaming = True
+    turn_metrics = []
     while True:
-        user_input = input("You: ")
+        user_input = console.input("[bold cyan]You:[/bold cyan] ")
         if user_input.lower() in {"exit", "quit"}:
-            print("Goodbye!")
+            console.print("Goodbye!")
             break
+        if user_input.lower() == "stream":
+            streaming = not streaming
+            console.print(f"Streaming {'on' if streaming else 'off'}")
+            continue
+        if user_input.lower() == "stats":
+            show_stats(turn_metrics)
+            continue
         params = {
             "model": model,
             "input": user_input,
-            "instructions": "You are a helpful assistant. Remember facts the user tells you and reference them in future responses."
+            "instructions": INSTRUCTIONS
         }
         if previous_response_id:
             params["previous_response_id"] = previous_response_id
         try:
-            response = client.responses.create(**params)
-            text = response.output[0].content[0].text
-            print(f"Bot: {text}")
-            previous_response_id = response.id
+            if streaming:
+                text, response_id = stream_turn(params, model, turn_metrics)
+                # A cancelled turn is not chained: the next one continues from the last complete response
+                if response_id:
+                    previous_response_id = response_id
+            else:
+                response = client.responses.create(**params)
+                text = response.output[0].content[0].text
+                console.print(f"Bot: {text}", markup=False)
+                previous_response_id = response.id
         except Exception as e:
-            print(f"Error: {e}")
+            console.print(f"Error: {e}", markup=False)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,240 @@
+"""
+Difusión de un stream a varios espectadores
+Una sola llamada a messages.stream publica sus eventos en un búfer circular y
+cualquier número de suscriptores los lee desde allí, cada uno con su propio
+cursor. Publicar nunca espera a nadie: el lector del stream solo añade al
+búfer, así que un espectador lento no frena al modelo.
+
+- Quien se conecta tarde empieza por el evento más antiguo del búfer (y recibe
+  el texto del último turno si su comienzo ya salió del búfer).
+- Un suscriptor lento recibe los deltas pendientes agrupados en uno solo.
+- Si se queda tan atrás que el búfer ya sobrescribió sus eventos, según su
+  política se le reenvía el texto del último turno ("resync") o se le
+  desconecta ("drop").
+
+serve_broadcast() expone el búfer como Server-Sent Events con http.server:
+    GET /events  -> stream SSE (admite Last-Event-ID para reconectar)
+    GET /        -> visor HTML mínimo
+"""
+
+import json
+import threading
+from collections import deque
+from itertools import islice
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_CAPACITY = 4096
+HEARTBEAT_SECONDS = 15
+MAX_BATCH = 256
+
+
+class StreamBroadcaster:
+    """Búfer circular de eventos con un cursor por suscriptor"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._buffer = deque(maxlen=capacity)
+        self._next_seq = 0
+        self._cond = threading.Condition()
+        # Último turno (en curso o terminado), para poner al día a quien perdió su comienzo
+        self._turn = None
+        self._turn_text = []
+        self._turn_status = None
+        self.closed = False
+        self.subscribers = 0
+        self.dropped = 0
+        self.resyncs = 0
+
+    def publish(self, type, **data):
+        """Añade un evento; nunca bloquea esperando a los suscriptores"""
+        with self._cond:
+            event = {"seq": self._next_seq, "type": type, **data}
+            self._buffer.append(event)
+            self._next_seq += 1
+            if type == "turn_start":
+                self._turn = event
+                self._turn_text = []
+                self._turn_status = None
+            elif type == "delta" and self._turn is not None:
+                self._turn_text.append(data.get("text", ""))
+            elif type == "turn_end":
+                self._turn_status = data.get("status", "completed")
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    @property
+    def _oldest_seq(self):
+        return self._next_seq - len(self._buffer)
+
+    def subscribe(self, last_seq=None, policy="resync"):
+        """Nuevo suscriptor; last_seq continúa tras el último evento recibido"""
+        with self._cond:
+            cursor = self._oldest_seq if last_seq is None else last_seq + 1
+            self.subscribers += 1
+            return Subscription(self, cursor, policy)
+
+    def _snapshot(self):
+        turn = self._turn
+        return {"seq": self._next_seq - 1, "type": "resync",
+                "turn": {k: v for k, v in turn.items() if k not in ("seq", "type")} if turn else None,
+                "text": "".join(self._turn_text), "status": self._turn_status}
+
+    def _read(self, cursor, timeout):
+        """Eventos desde cursor; ("overrun", snapshot) si ya se sobrescribieron"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._next_seq > cursor or self.closed, timeout)
+            oldest = self._oldest_seq
+            if cursor < oldest:
+                return "overrun", self._snapshot(), self._next_seq
+            events = list(islice(self._buffer, cursor - oldest, cursor - oldest + MAX_BATCH))
+            return "ok", events, cursor + len(events)
+
+    def stats(self):
+        with self._cond:
+            return {"published": self._next_seq, "buffered": len(self._buffer),
+                    "subscribers": self.subscribers, "dropped": self.dropped, "resyncs": self.resyncs}
+
+
+class Subscription:
+    """Cursor de un suscriptor sobre el búfer compartido"""
+
+    def __init__(self, broadcaster, cursor, policy):
+        self.broadcaster = broadcaster
+        self.cursor = cursor
+        self.policy = policy
+        self.active = True
+        # Si el último turno empezó antes del búfer, primero su texto acumulado
+        turn = broadcaster._turn
+        self._pending_resync = turn is not None and turn["seq"] < broadcaster._oldest_seq <= cursor
+
+    def read(self, timeout=HEARTBEAT_SECONDS):
+        """Siguiente lote de eventos (vacío si vence el timeout) con los deltas agrupados"""
+        if not self.active:
+            return []
+        if self._pending_resync:
+            self._pending_resync = False
+            with self.broadcaster._cond:
+                # El texto acumulado ya incluye los deltas publicados hasta ahora
+                self.cursor = self.broadcaster._next_seq
+                return [self.broadcaster._snapshot()]
+
+        status, payload, self.cursor = self.broadcaster._read(self.cursor, timeout)
+        if status == "overrun":
+            with self.broadcaster._cond:
+                if self.policy == "drop":
+                    self.broadcaster.dropped += 1
+                    self.close()
+                    return [{"seq": payload["seq"], "type": "dropped"}]
+                self.broadcaster.resyncs += 1
+            return [payload]
+        return coalesce(payload)
+
+    def close(self):
+        with self.broadcaster._cond:
+            if self.active:
+                self.active = False
+                self.broadcaster.subscribers -= 1
+
+    @property
+    def finished(self):
+        return self.broadcaster.closed and self.cursor >= self.broadcaster._next_seq
+
+
+def coalesce(events):
+    """Une los deltas consecutivos de un lote en un único evento"""
+    merged = []
+    for event in events:
+        if event["type"] == "delta" and merged and merged[-1]["type"] == "delta":
+            last = merged[-1]
+            merged[-1] = {**last, "seq": event["seq"], "text": last["text"] + event["text"]}
+        else:
+            merged.append(event)
+    return merged
+
+
+VIEWER_HTML = """<!doctype html>
+<meta charset="utf-8">
+<title>Conversación en directo</title>
+<body style="font-family: sans-serif; max-width: 50em; margin: 2em auto">
+<div id="log"></div>
+<script>
+const log = document.getElementById("log");
+let current = null;
+function block(cls, text) {
+  const div = document.createElement("pre");
+  div.className = cls;
+  div.style.whiteSpace = "pre-wrap";
+  div.textContent = text;
+  log.appendChild(div);
+  return div;
+}
+const source = new EventSource("/events");
+source.addEventListener("turn_start", e => {
+  block("user", "👤 " + JSON.parse(e.data).user_input);
+  current = block("assistant", "");
+});
+source.addEventListener("delta", e => { if (current) current.textContent += JSON.parse(e.data).text; });
+source.addEventListener("resync", e => {
+  const data = JSON.parse(e.data);
+  if (current) current.textContent = data.text;
+  else if (data.turn) { block("user", "👤 " + data.turn.user_input); current = block("assistant", data.text); }
+  if (data.status) current = null;
+});
+source.addEventListener("turn_end", () => { current = null; });
+source.addEventListener("dropped", () => source.close());
+</script>
+"""
+
+
+def _make_handler(broadcaster):
+    class BroadcastHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == "/":
+                body = VIEWER_HTML.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if self.path.split("?")[0] != "/events":
+                self.send_error(404)
+                return
+
+            last_id = self.headers.get("Last-Event-ID")
+            policy = "drop" if "policy=drop" in self.path else "resync"
+            subscription = broadcaster.subscribe(int(last_id) if last_id and last_id.isdigit() else None, policy)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            try:
+                while subscription.active and not subscription.finished:
+                    events = subscription.read()
+                    if not events:
+                        self.wfile.write(b": ping\n\n")
+                    for event in events:
+                        data = json.dumps({k: v for k, v in event.items() if k not in ("seq", "type")},
+                                          ensure_ascii=False)
+                        self.wfile.write(f"id: {event['seq']}\nevent: {event['type']}\ndata: {data}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                subscription.close()
+
+    return BroadcastHandler
+
+
+def serve_broadcast(broadcaster, host="127.0.0.1", port=8765):
+    """Arranca el servidor SSE en un hilo y lo devuelve (server.shutdown() para pararlo)"""
+    server = ThreadingHTTPServer((host, port), _make_handler(broadcaster))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
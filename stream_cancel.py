@@ -0,0 +1,148 @@
+"""
+Cancelación inmediata de streams de Claude
+La petición y la lectura del stream se hacen en un hilo aparte. El hilo
+principal solo consume eventos de una cola, así que Ctrl+C llega al instante;
+al cancelar se cierra la respuesta HTTP (la conexión sale del pool) y se
+registra cuántos tokens se recibieron frente a cuántos se facturan.
+
+Uso:
+    with CancellableStream(client.messages.stream(...)) as stream:
+        for event in stream:
+            ...
+    stream.stats()
+"""
+
+import time
+import queue
+import threading
+
+POLL_SECONDS = 0.05
+CHARS_PER_TOKEN = 4
+
+_DONE = object()
+
+
+class _StreamError:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class CancellableStream:
+    """Envuelve un MessageStreamManager (o ResponseStreamManager de OpenAI) para abortarlo en menos de 100 ms"""
+
+    def __init__(self, stream_manager):
+        self._manager = stream_manager
+        self._stream = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._finished = False
+        self._thread = threading.Thread(target=self._reader, daemon=True)
+        self.cancel_latency = None
+        self.chunks = 0
+        self.chars = 0
+        self.input_tokens = None
+        self.output_tokens = None
+
+    def _reader(self):
+        try:
+            stream = self._manager.__enter__()
+            with self._lock:
+                self._stream = stream
+                if self._cancelled.is_set():
+                    # Se canceló mientras se abría la conexión
+                    stream.close()
+                    return
+            for event in stream:
+                if self._cancelled.is_set():
+                    break
+                self._queue.put(event)
+        except Exception as e:
+            if not self._cancelled.is_set():
+                self._queue.put(_StreamError(e))
+        finally:
+            try:
+                self._manager.__exit__(None, None, None)
+            except Exception:
+                pass
+            self._queue.put(_DONE)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __iter__(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                self._finished = True
+                return
+            if isinstance(item, _StreamError):
+                self._finished = True
+                raise item.exc
+            self._observe(item)
+            yield item
+
+    def _observe(self, event):
+        if event.type == "message_start":
+            self.input_tokens = event.message.usage.input_tokens
+        elif event.type == "content_block_delta" and getattr(event.delta, "type", None) == "text_delta":
+            self.chunks += 1
+            self.chars += len(event.delta.text)
+        elif event.type == "message_delta" and event.usage is not None:
+            self.output_tokens = event.usage.output_tokens
+        # Eventos de la Responses API de OpenAI (responses.stream)
+        elif event.type == "response.output_text.delta":
+            self.chunks += 1
+            self.chars += len(event.delta)
+        elif event.type == "response.completed" and event.response.usage is not None:
+            self.input_tokens = event.response.usage.input_tokens
+            self.output_tokens = event.response.usage.output_tokens
+
+    def cancel(self):
+        """Aborta el stream: cierra la respuesta HTTP sin esperar al modelo"""
+        if self._finished or self._cancelled.is_set():
+            return
+        started = time.perf_counter()
+        self._cancelled.set()
+        with self._lock:
+            stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        # El hilo lector termina en cuanto falla su lectura; no se le espera más de 100 ms
+        self._thread.join(timeout=0.1)
+        self.cancel_latency = time.perf_counter() - started
+
+    def __exit__(self, exc_type, exc, tb):
+        # Salir del bloque sin agotar el stream (Ctrl+C, error o break) lo cancela
+        self.cancel()
+        return False
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def stats(self):
+        """Tokens recibidos frente a facturados.
+
+        Si el stream se corta, la API no llega a enviar el usage final: se da
+        como facturado el mínimo (lo recibido, estimado por caracteres), aunque
+        el modelo puede haber generado algo más antes de notar el corte.
+        """
+        received_est = self.output_tokens if self.output_tokens is not None else \
+            max(self.chunks, round(self.chars / CHARS_PER_TOKEN))
+        return {
+            "cancelled": self.cancelled,
+            "cancel_latency_ms": round(self.cancel_latency * 1000, 1) if self.cancel_latency is not None else None,
+            "chunks_received": self.chunks,
+            "input_tokens_billed": self.input_tokens,
+            "output_tokens_received": received_est,
+            "output_tokens_billed": self.output_tokens if self.output_tokens is not None else received_est,
+            "output_tokens_billed_is_estimate": self.output_tokens is None,
+        }
@@ -0,0 +1,72 @@
+"""
+Eventos de streaming normalizados para Anthropic y OpenAI
+Cada proveedor emite sus propios tipos de evento (content_block_delta en
+messages.stream, response.output_text.delta en la Responses API). Los
+adaptadores de este módulo los traducen a un único StreamEvent, de modo que el
+renderizador, las métricas y el diario no dependen del proveedor.
+
+Tipos de StreamEvent:
+    "text"  -> delta de texto (event.text)
+    "usage" -> tokens de entrada y/o salida conocidos hasta el momento
+    "done"  -> fin de la respuesta (event.response_id en OpenAI)
+
+Uso:
+    for event in openai_events(stream):
+        if event.type == "text":
+            renderer.append(event.text)
+"""
+
+TEXT = "text"
+USAGE = "usage"
+DONE = "done"
+
+
+class StreamEvent:
+    """Delta normalizado de un stream de cualquier proveedor"""
+
+    __slots__ = ("type", "text", "input_tokens", "output_tokens", "response_id")
+
+    def __init__(self, type, text="", input_tokens=None, output_tokens=None, response_id=None):
+        self.type = type
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.response_id = response_id
+
+    def __repr__(self):
+        return f"StreamEvent({self.type!r}, text={self.text!r})"
+
+
+class StreamFailed(Exception):
+    """La API informó de un error dentro del propio stream"""
+
+
+def anthropic_events(stream):
+    """Traduce los eventos de messages.stream de Anthropic"""
+    for event in stream:
+        if event.type == "content_block_delta":
+            if getattr(event.delta, "type", None) == "text_delta":
+                yield StreamEvent(TEXT, event.delta.text)
+        elif event.type == "message_start":
+            yield StreamEvent(USAGE, input_tokens=event.message.usage.input_tokens)
+        elif event.type == "message_delta" and event.usage is not None:
+            yield StreamEvent(USAGE, output_tokens=event.usage.output_tokens)
+        elif event.type == "message_stop":
+            yield StreamEvent(DONE)
+
+
+def openai_events(stream):
+    """Traduce los eventos de responses.create(stream=True) / responses.stream de OpenAI"""
+    for event in stream:
+        if event.type == "response.output_text.delta":
+            yield StreamEvent(TEXT, event.delta)
+        elif event.type == "response.completed":
+            usage = event.response.usage
+            if usage is not None:
+                yield StreamEvent(USAGE, input_tokens=usage.input_tokens, output_tokens=usage.output_tokens)
+            yield StreamEvent(DONE, response_id=event.response.id)
+        elif event.type in ("response.failed", "response.incomplete"):
+            error = getattr(event.response, "error", None)
+            raise StreamFailed(getattr(error, "message", None) or event.type)
+        elif event.type == "error":
+            raise StreamFailed(getattr(event, "message", "error en el stream"))
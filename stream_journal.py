@@ -0,0 +1,112 @@
+"""
+Diario de respuestas en curso para recuperar streams cancelados o caídos
+Mientras llega la respuesta, los deltas se añaden a <sesión>.journal.jsonl como
+mucho cada JOURNAL_INTERVAL_SECONDS. Si el turno termina bien el diario se
+borra; si se cancela o el proceso muere, queda en disco con el texto parcial
+para poder conservarlo, descartarlo o regenerarlo al reanudar.
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+JOURNAL_INTERVAL_SECONDS = 0.5
+
+
+def journal_path_for(json_path):
+    return os.path.splitext(json_path)[0] + ".journal.jsonl"
+
+
+class ResponseJournal:
+    """Escribe de forma incremental la respuesta en curso de un turno"""
+
+    def __init__(self, json_path, interval=JOURNAL_INTERVAL_SECONDS):
+        self.path = journal_path_for(json_path)
+        self.interval = interval
+        self._pending = []
+        self._last_flush = 0.0
+        self._file = None
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def start(self, user_input):
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({"type": "turn_start", "user_input": user_input, "started_at": datetime.now().isoformat()})
+        self._last_flush = time.monotonic()
+
+    def append(self, delta):
+        """Acumula un delta y lo vuelca si ha pasado el intervalo"""
+        self._pending.append(delta)
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self._pending and self._file:
+            self._write({"type": "delta", "text": "".join(self._pending)})
+            self._pending = []
+        self._last_flush = time.monotonic()
+
+    def mark(self, status):
+        """Cierra el diario dejando constancia de que la respuesta es parcial"""
+        if not self._file:
+            return
+        self.flush()
+        self._write({"type": "turn_end", "status": status, "partial": True,
+                     "ended_at": datetime.now().isoformat()})
+        self._file.close()
+        self._file = None
+
+    def clear(self):
+        """El turno se guardó completo: el diario ya no hace falta"""
+        if self._file:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def load_pending_turn(json_path):
+    """Lee el turno interrumpido de una sesión, o None si no hay ninguno.
+
+    Devuelve {"user_input", "text", "status", "started_at"}. Un diario sin
+    registro final corresponde a un proceso que murió a mitad del stream.
+    """
+    path = journal_path_for(json_path)
+    if not os.path.exists(path):
+        return None
+    pending = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Última línea a medio escribir cuando el proceso cayó
+                break
+            if record["type"] == "turn_start":
+                pending = {"user_input": record["user_input"], "text": "",
+                           "status": "crashed", "started_at": record.get("started_at")}
+            elif pending and record["type"] == "delta":
+                pending["text"] += record["text"]
+            elif pending and record["type"] == "turn_end":
+                pending["status"] = record["status"]
+    return pending
+
+
+def clear_pending_turn(json_path):
+    path = journal_path_for(json_path)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def find_interrupted_sessions(logs_dir="logs", prefix="log_streaming_"):
+    """Lista las sesiones (ruta JSON) que tienen un turno interrumpido"""
+    if not os.path.isdir(logs_dir):
+        return []
+    sessions = []
+    for filename in sorted(os.listdir(logs_dir), reverse=True):
+        if filename.startswith(prefix) and filename.endswith(".journal.jsonl"):
+            sessions.append(os.path.join(logs_dir, filename[:-len(".journal.jsonl")] + ".json"))
+    return sessions
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Métricas de latencia de los turnos en streaming
+Registra por turno el tiempo hasta el primer token (TTFT), los huecos entre
+chunks (p50/p95), tokens por segundo y tiempo total. Las métricas se guardan
+en los metadatos del JSON de la sesión y este script las agrega.
+
+Uso:
+    python stream_metrics.py            # informe de todas las sesiones en ./logs
+    python stream_metrics.py otra/ruta
+"""
+
+import os
+import sys
+import json
+import time
+from datetime import datetime
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano; None si no hay valores"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class TurnMetrics:
+    """Cronometra un turno a partir de los eventos normalizados del stream"""
+
+    def __init__(self, model=None):
+        self.model = model
+        self.started_at = datetime.now().isoformat()
+        self.started = time.perf_counter()
+        self.first_event = None
+        self.first_token = None
+        self.last_token = None
+        self.ended = None
+        self.gaps = []
+        self.chunks = 0
+        self.chars = 0
+        self.input_tokens = None
+        self.output_tokens = None
+        self.status = "in_progress"
+        # Datos adicionales del turno (p. ej. estadísticas de cancelación)
+        self.extra = {}
+
+    def on_event(self, event):
+        """Registra un StreamEvent normalizado (ver stream_events.py)"""
+        now = time.perf_counter()
+        if self.first_event is None:
+            self.first_event = now
+        if event.type == "text":
+            self.on_delta(event.text, now)
+        elif event.type == "usage":
+            self.on_usage(event.input_tokens, event.output_tokens)
+
+    def on_delta(self, text, now=None):
+        now = now if now is not None else time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now
+        else:
+            self.gaps.append(now - self.last_token)
+        self.last_token = now
+        self.chunks += 1
+        self.chars += len(text)
+
+    def on_usage(self, input_tokens=None, output_tokens=None):
+        if input_tokens is not None:
+            self.input_tokens = input_tokens
+        if output_tokens is not None:
+            self.output_tokens = output_tokens
+
+    def finish(self, status="completed"):
+        self.ended = time.perf_counter()
+        self.status = status
+        return self
+
+    @property
+    def ttft(self):
+        return self.first_token - self.started if self.first_token is not None else None
+
+    @property
+    def tokens_per_second(self):
+        if self.first_token is None or self.last_token is None or self.last_token <= self.first_token:
+            return None
+        # Sin usage (p. ej. turno cancelado) se cuenta un token por chunk
+        tokens = self.output_tokens if self.output_tokens is not None else self.chunks
+        return tokens / (self.last_token - self.first_token)
+
+    def to_dict(self):
+        ended = self.ended if self.ended is not None else time.perf_counter()
+        tps = self.tokens_per_second
+        return {
+            "started_at": self.started_at,
+            "model": self.model,
+            "status": self.status,
+            "ttft_ms": _ms(self.ttft),
+            "total_ms": _ms(ended - self.started),
+            "chunks": self.chunks,
+            "chars": self.chars,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "tokens_per_s": round(tps, 1) if tps is not None else None,
+            "gap_p50_ms": _ms(percentile(self.gaps, 50)),
+            "gap_p95_ms": _ms(percentile(self.gaps, 95)),
+            "gap_max_ms": _ms(max(self.gaps)) if self.gaps else None,
+            **self.extra,
+        }
+
+
+def summarize(turns):
+    """Agrega una lista de métricas de turno (dicts de TurnMetrics.to_dict)"""
+    def values(key):
+        return [t[key] for t in turns if t.get(key) is not None]
+
+    def avg(key):
+        vals = values(key)
+        return round(sum(vals) / len(vals), 1) if vals else None
+
+    return {
+        "turns": len(turns),
+        "ttft_ms_avg": avg("ttft_ms"),
+        "ttft_ms_p50": percentile(values("ttft_ms"), 50),
+        "ttft_ms_p95": percentile(values("ttft_ms"), 95),
+        "tokens_per_s_avg": avg("tokens_per_s"),
+        "gap_p50_ms": percentile(values("gap_p50_ms"), 50),
+        "gap_p95_ms": percentile(values("gap_p95_ms"), 95),
+        "total_ms_avg": avg("total_ms"),
+        "output_tokens": sum(values("output_tokens")),
+    }
+
+
+def load_turn_metrics(logs_dir="logs"):
+    """Lee las métricas guardadas en los metadatos de todos los JSON de sesión"""
+    sessions = []
+    if not os.path.isdir(logs_dir):
+        return sessions
+    for filename in sorted(os.listdir(logs_dir)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(logs_dir, filename), 'r', encoding='utf-8') as f:
+                metadata = json.load(f).get("metadata", {})
+        except (OSError, json.JSONDecodeError):
+            continue
+        turns = metadata.get("turn_metrics")
+        if turns:
+            sessions.append((filename, turns))
+    return sessions
+
+
+def _fmt(value, suffix=""):
+    return f"{value}{suffix}" if value is not None else "-"
+
+
+def show_report(logs_dir="logs"):
+    """Muestra una tabla por sesión y el agregado global"""
+    sessions = load_turn_metrics(logs_dir)
+    if not sessions:
+        console.print(f"[yellow]⚠️ No hay métricas de streaming en {logs_dir}[/yellow]")
+        return
+
+    table = Table(title="[bold blue]⏱️ Latencia de streaming por sesión[/bold blue]")
+    table.add_column("Sesión", style="dim")
+    table.add_column("Turnos", justify="right")
+    table.add_column("TTFT medio", justify="right", style="green")
+    table.add_column("TTFT p95", justify="right")
+    table.add_column("Tokens/s", justify="right", style="cyan")
+    table.add_column("Hueco p50", justify="right")
+    table.add_column("Hueco p95", justify="right")
+    table.add_column("Turno medio", justify="right")
+
+    all_turns = []
+    for filename, turns in sessions:
+        all_turns.extend(turns)
+        s = summarize(turns)
+        table.add_row(
+            filename, str(s["turns"]), _fmt(s["ttft_ms_avg"], " ms"), _fmt(s["ttft_ms_p95"], " ms"),
+            _fmt(s["tokens_per_s_avg"]), _fmt(s["gap_p50_ms"], " ms"), _fmt(s["gap_p95_ms"], " ms"),
+            _fmt(s["total_ms_avg"], " ms"),
+        )
+
+    total = summarize(all_turns)
+    table.add_row(
+        "[bold]TOTAL[/bold]", str(total["turns"]), _fmt(total["ttft_ms_avg"], " ms"),
+        _fmt(total["ttft_ms_p95"], " ms"), _fmt(total["tokens_per_s_avg"]),
+        _fmt(total["gap_p50_ms"], " ms"), _fmt(total["gap_p95_ms"], " ms"),
+        _fmt(total["total_ms_avg"], " ms"),
+    )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    show_report(sys.argv[1] if len(sys.argv) > 1 else "logs")
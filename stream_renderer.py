@@ -0,0 +1,196 @@
+"""
+Renderizador de streaming con repintado a frecuencia fija
+Los deltas solo se acumulan; el hilo de refresco de rich.Live repinta el panel
+a refresh_per_second fotogramas por segundo. Así la lectura del stream nunca
+espera a la interfaz y la velocidad la marca el modelo, no el terminal.
+
+El texto se guarda en un StreamingTextBuffer: las líneas ya ajustadas al ancho
+quedan en caché y en cada delta solo se vuelve a ajustar la última línea, que
+es la única que puede cambiar. El panel en vivo muestra solo las últimas
+líneas que caben en pantalla, así que el coste por fotograma no crece con la
+longitud de la respuesta.
+"""
+
+import re
+import threading
+from rich.cells import cell_len
+from rich.live import Live
+from rich.panel import Panel
+from rich.text import Text
+
+CURSOR = "▊"
+WORD_PATTERN = re.compile(r"\S+")
+# Bordes y relleno horizontal de un Panel por defecto
+PANEL_CHROME_WIDTH = 4
+PANEL_CHROME_HEIGHT = 2
+
+
+def _split_long_word(word, width):
+    """Corta una palabra más ancha que la línea en trozos de como mucho width celdas"""
+    pieces, current = [], ""
+    for char in word:
+        if current and cell_len(current + char) > width:
+            pieces.append(current)
+            current = ""
+        current += char
+    return pieces, current
+
+
+def wrap_prefix(text, width):
+    """Ajuste voraz de text a width celdas.
+
+    Devuelve (líneas cerradas, resto). Las líneas cerradas ya no pueden cambiar
+    aunque se añada más texto al final; el resto es el texto en bruto de la
+    última línea, que sí puede seguir creciendo.
+    """
+    lines = []
+    line_start = 0
+    line_end = 0
+    for match in WORD_PATTERN.finditer(text):
+        candidate = text[line_start:match.end()]
+        if cell_len(candidate) <= width:
+            line_end = match.end()
+            continue
+        if line_end > line_start:
+            lines.append(text[line_start:line_end])
+            line_start = match.start()
+        word = text[match.start():match.end()]
+        if cell_len(word) > width:
+            pieces, _ = _split_long_word(word, width)
+            lines.extend(pieces)
+            line_start = match.start() + sum(len(piece) for piece in pieces)
+        line_end = match.end()
+    return lines, text[line_start:]
+
+
+class StreamingTextBuffer:
+    """Acumula deltas en tiempo lineal y mantiene las líneas ajustadas en caché"""
+
+    def __init__(self, width=80):
+        self.width = max(width, 1)
+        self._chunks = []
+        self._joined = ""
+        self._joined_count = 0
+        self._lines = []
+        self._tail = ""
+        # append() llega desde el hilo del stream y tail_lines() desde el de Live
+        self._lock = threading.Lock()
+
+    def append(self, delta):
+        with self._lock:
+            self._chunks.append(delta)
+            self._feed(delta)
+
+    @property
+    def is_empty(self):
+        return not self._chunks
+
+    def _feed(self, delta):
+        paragraphs = (self._tail + delta).split("\n")
+        # Cada salto de línea cierra el párrafo anterior por completo
+        for paragraph in paragraphs[:-1]:
+            closed, rest = wrap_prefix(paragraph, self.width)
+            self._lines.extend(closed)
+            self._lines.append(rest.rstrip())
+        closed, self._tail = wrap_prefix(paragraphs[-1], self.width)
+        self._lines.extend(closed)
+
+    def set_width(self, width):
+        """Reajusta todo el texto si cambia el ancho (solo ocurre al redimensionar)"""
+        width = max(width, 1)
+        if width == self.width:
+            return
+        with self._lock:
+            self.width = width
+            self._lines, self._tail = [], ""
+            self._feed("".join(self._chunks))
+
+    @property
+    def text(self):
+        # Se une una sola vez por cada nuevo lote de deltas, no en cada append
+        if self._joined_count != len(self._chunks):
+            self._joined = "".join(self._chunks)
+            self._joined_count = len(self._chunks)
+        return self._joined
+
+    @property
+    def line_count(self):
+        return len(self._lines) + 1
+
+    def tail_lines(self, max_lines):
+        """Últimas max_lines líneas ajustadas, incluida la línea en curso"""
+        with self._lock:
+            visible = self._lines[-(max_lines - 1):] if max_lines > 1 else []
+            return visible + [self._tail.rstrip()]
+
+
+class StreamingPanel:
+    """Renderable que construye el panel a partir del texto acumulado al pintarse"""
+
+    def __init__(self, title, border_style="green", placeholder="Claude está escribiendo..."):
+        self.title = title
+        self.border_style = border_style
+        self.placeholder = placeholder
+        self.buffer = StreamingTextBuffer()
+
+    def append(self, delta):
+        self.buffer.append(delta)
+
+    @property
+    def text(self):
+        return self.buffer.text
+
+    def __rich_console__(self, console, options):
+        if self.buffer.is_empty:
+            yield Panel(Text(self.placeholder, style="dim"), title=self.title, border_style=self.border_style)
+            return
+
+        self.buffer.set_width(options.max_width - PANEL_CHROME_WIDTH)
+        max_lines = max((options.height or console.height) - PANEL_CHROME_HEIGHT, 1)
+        lines = self.buffer.tail_lines(max_lines)
+        hidden = self.buffer.line_count - len(lines)
+
+        body = Text("\n".join(lines), no_wrap=True, overflow="crop")
+        body.append(CURSOR, style="dim")
+        subtitle = f"[dim]… {hidden} líneas anteriores[/dim]" if hidden > 0 else None
+        yield Panel(body, title=self.title, subtitle=subtitle, border_style=self.border_style)
+
+
+class StreamRenderer:
+    """Contexto que muestra un StreamingPanel en vivo mientras llegan los deltas.
+
+    Uso:
+        with StreamRenderer(console, "[green]🤖 Claude (Streaming)[/green]") as renderer:
+            for chunk in stream:
+                renderer.append(chunk.delta.text)
+        texto = renderer.text
+    """
+
+    def __init__(self, console, title, border_style="green", refresh_per_second=10,
+                 placeholder="Claude está escribiendo..."):
+        self.panel = StreamingPanel(title, border_style, placeholder)
+        self.live = Live(
+            self.panel,
+            console=console,
+            refresh_per_second=refresh_per_second,
+            auto_refresh=True,
+            # El panel en vivo se borra al terminar; el llamador imprime el panel final
+            transient=True,
+            vertical_overflow="crop",
+        )
+
+    def __enter__(self):
+        self.live.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.live.stop()
+        return False
+
+    def append(self, delta):
+        """Añade un delta sin repintar; el siguiente fotograma lo mostrará"""
+        self.panel.append(delta)
+
+    @property
+    def text(self):
+        return self.panel.text
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import dotenv
 from datetime import datetime
@@ -7,16 +8,25 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt
 from rich.table import Table
-from rich.live import Live
-from rich.text import Text
 from rich import print as rprint
-import time
+from stream_renderer import StreamRenderer
+from stream_metrics import TurnMetrics, summarize, show_report
+from stream_cancel import CancellableStream
+from stream_events import anthropic_events
+from stream_broadcast import StreamBroadcaster, serve_broadcast
+from headless_output import output_mode, read_inputs, HeadlessWriter, stream_turn
+from stream_journal import ResponseJournal, load_pending_turn, clear_pending_turn, find_interrupted_sessions
 
 dotenv.load_dotenv()
 
 client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 console = Console()
 
+# Los espectadores de "compartir" leen de este búfer; publicar no espera a nadie
+broadcaster = StreamBroadcaster()
+BROADCAST_HOST = os.getenv("STREAMING_BROADCAST_HOST", "127.0.0.1")
+BROADCAST_PORT = int(os.getenv("STREAMING_BROADCAST_PORT", "8765"))
+
 def save_conversation_to_log(conversation, log_file_path):
     """Guarda la conversación completa en un archivo de log"""
     try:
@@ -42,7 +52,7 @@ def save_conversation_to_log(conversation, log_file_path):
     except Exception as e:
         console.print(f"[red]Error al guardar el log: {e}[/red]")
 
-def save_conversation_to_json(conversation, json_file_path):
+def save_conversation_to_json(conversation, json_file_path, turn_metrics=None):
     """Guarda la conversación completa en un archivo JSON"""
     try:
         conversation_data = {
@@ -52,7 +62,8 @@ def save_conversation_to_json(conversation, json_file_path):
                 "model_used": "claude-sonnet-4-20250514",
                 "api_provider": "anthropic",
                 "features": "streaming",
-                "version": "1.0"
+                "version": "1.0",
+                "turn_metrics": turn_metrics or []
             },
             "conversation": conversation
         }
@@ -63,6 +74,18 @@ def save_conversation_to_json(conversation, json_file_path):
     except Exception as e:
         console.print(f"[red]Error al guardar el JSON: {e}[/red]")
 
+def load_conversation_from_json(json_file_path):
+    """Carga la conversación y las métricas de turno de un JSON de streaming"""
+    if not os.path.exists(json_file_path):
+        return [], []
+    try:
+        with open(json_file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get("conversation", []), data.get("metadata", {}).get("turn_metrics", [])
+    except Exception as e:
+        console.print(f"[red]❌ Error al cargar la conversación: {e}[/red]")
+        return [], []
+
 def get_log_filename():
     """Genera el nombre del archivo de log"""
     now = datetime.now()
@@ -95,8 +118,11 @@ def show_streaming_demo():
     console.print("[dim]• El streaming es especialmente útil para respuestas largas[/dim]")
     console.print("[dim]• Usa Ctrl+C para cancelar una respuesta en progreso[/dim]")
 
-def stream_response(user_input, conversation, log_path, json_path):
+def stream_response(user_input, conversation, log_path, json_path, turn_metrics):
     """Streams a response from Claude in real-time"""
+    metrics = TurnMetrics(model="claude-sonnet-4-20250514")
+    journal = ResponseJournal(json_path)
+    stream = None
     try:
         # Añadir mensaje del usuario
         conversation.append({"role": "user", "content": user_input})
@@ -109,48 +135,44 @@ def stream_response(user_input, conversation, log_path, json_path):
         )
         console.print(user_panel)
 
-        # Crear panel para la respuesta del asistente
-        assistant_content = ""
-        assistant_panel = Panel(
-            "[dim]Claude está escribiendo...[/dim]",
-            title="[green]🤖 Claude (Streaming)[/green]",
-            border_style="green"
-        )
+        # La respuesta en curso se va guardando en el diario por si se corta
+        journal.start(user_input)
+        broadcaster.publish("turn_start", user_input=user_input)
 
-        # Usar Live para actualizar en tiempo real
-        with Live(assistant_panel, console=console, refresh_per_second=10) as live:
-            # Llamar a la API con streaming
-            with client.messages.stream(
+        # El panel en vivo se repinta a frecuencia fija; aquí solo se acumulan deltas
+        with StreamRenderer(console, "[green]🤖 Claude (Streaming)[/green]", refresh_per_second=10) as renderer:
+            # Llamar a la API con streaming; Ctrl+C cierra la conexión al instante
+            stream = CancellableStream(client.messages.stream(
                 model="claude-sonnet-4-20250514",
                 max_tokens=1000,
                 messages=conversation
-            ) as stream:
-                for chunk in stream:
-                    if chunk.type == "content_block_delta":
-                        # Añadir texto al contenido
-                        assistant_content += chunk.delta.text
-
-                        # Actualizar el panel en tiempo real
-                        live.update(Panel(
-                            assistant_content + "[dim]▊[/dim]",  # Cursor parpadeante
-                            title="[green]🤖 Claude (Streaming)[/green]",
-                            border_style="green"
-                        ))
-
-                        # Pequeña pausa para efecto visual
-                        time.sleep(0.01)
+            ))
+            with stream:
+                for event in anthropic_events(stream):
+                    metrics.on_event(event)
+                    if event.type == "text":
+                        renderer.append(event.text)
+                        journal.append(event.text)
+                        broadcaster.publish("delta", text=event.text)
+
+        assistant_content = renderer.text
+        turn_metrics.append(metrics.finish().to_dict())
 
         # Añadir respuesta completa a la conversación
         conversation.append({"role": "assistant", "content": assistant_content})
 
         # Guardar conversación actualizada
         save_conversation_to_log(conversation, log_path)
-        save_conversation_to_json(conversation, json_path)
+        save_conversation_to_json(conversation, json_path, turn_metrics)
+        journal.clear()
+        broadcaster.publish("turn_end", status="completed")
 
         # Mostrar panel final sin cursor
+        last = turn_metrics[-1]
         final_panel = Panel(
             assistant_content,
             title="[green]🤖 Claude (Completado)[/green]",
+            subtitle=f"[dim]TTFT {last['ttft_ms']} ms · {last['tokens_per_s']} tok/s · {last['total_ms']} ms[/dim]",
             border_style="green"
         )
         console.print(final_panel)
@@ -158,8 +180,18 @@ def stream_response(user_input, conversation, log_path, json_path):
         return True
 
     except KeyboardInterrupt:
-        console.print("\n[yellow]⚠️ Respuesta cancelada por el usuario[/yellow]")
-        return False
+        status = "cancelled"
+        if stream is not None:
+            stream.cancel()
+            usage = stream.stats()
+            metrics.extra.update(usage)
+            estimate = " (estimado)" if usage["output_tokens_billed_is_estimate"] else ""
+            console.print(f"\n[yellow]⚠️ Respuesta cancelada por el usuario en {usage['cancel_latency_ms']} ms · "
+                          f"tokens recibidos: {usage['output_tokens_received']} · "
+                          f"facturados: {usage['input_tokens_billed']} de entrada + "
+                          f"{usage['output_tokens_billed']}{estimate} de salida[/yellow]")
+        else:
+            console.print("\n[yellow]⚠️ Respuesta cancelada por el usuario[/yellow]")
     except Exception as e:
         error_panel = Panel(
             f"[bold red]Error:[/bold red] {e}",
@@ -167,8 +199,93 @@ def stream_response(user_input, conversation, log_path, json_path):
             border_style="red"
         )
         console.print(error_panel)
+        status = "error"
+
+    journal.mark(status)
+    broadcaster.publish("turn_end", status=status)
+    turn_metrics.append(metrics.finish(status).to_dict())
+    # El turno pendiente sale del historial hasta que el usuario decida qué hacer con él
+    if conversation and conversation[-1]["role"] == "user":
+        conversation.pop()
+    return resolve_interrupted_turn(conversation, log_path, json_path, turn_metrics)
+
+def resolve_interrupted_turn(conversation, log_path, json_path, turn_metrics):
+    """Ofrece conservar, descartar o regenerar una respuesta parcial del diario"""
+    pending = load_pending_turn(json_path)
+    if pending is None:
+        return False
+
+    preview = pending["text"][-500:] if pending["text"] else "[dim](sin texto recibido)[/dim]"
+    console.print(Panel(
+        preview,
+        title=f"[yellow]⏸️ Respuesta parcial ({pending['status']}) a: {pending['user_input'][:60]}[/yellow]",
+        border_style="yellow"
+    ))
+
+    try:
+        choice = Prompt.ask(
+            "[bold]¿(c)onservar la respuesta parcial, (d)escartarla o (r)egenerarla?[/bold]",
+            choices=["c", "d", "r"],
+            default="d"
+        )
+    except KeyboardInterrupt:
+        # Se deja el diario en disco para decidir al reanudar
         return False
 
+    if choice == "c" and pending["text"].strip():
+        conversation.append({"role": "user", "content": pending["user_input"]})
+        conversation.append({"role": "assistant", "content": pending["text"]})
+        if turn_metrics:
+            turn_metrics[-1]["kept_partial"] = True
+        save_conversation_to_log(conversation, log_path)
+        save_conversation_to_json(conversation, json_path, turn_metrics)
+        clear_pending_turn(json_path)
+        console.print("[green]✅ Respuesta parcial conservada en el historial[/green]")
+        return True
+
+    clear_pending_turn(json_path)
+    if choice == "r":
+        return stream_response(pending["user_input"], conversation, log_path, json_path, turn_metrics)
+
+    console.print("[dim]🗑️ Respuesta parcial descartada[/dim]")
+    return False
+
+def resume_interrupted_session():
+    """Busca sesiones con una respuesta cortada (Ctrl+C o caída) y ofrece reanudarlas"""
+    interrupted = find_interrupted_sessions("logs")
+    if not interrupted:
+        return None
+
+    json_path = interrupted[0]
+    pending = load_pending_turn(json_path)
+    if pending is None:
+        return None
+    console.print(f"[yellow]⚠️ La sesión {os.path.basename(json_path)} tiene una respuesta interrumpida "
+                  f"({pending['status']}, {len(pending['text'])} caracteres)[/yellow]")
+    try:
+        if Prompt.ask("[bold]¿Reanudar esa sesión?[/bold]", choices=["s", "n"], default="s") != "s":
+            return None
+    except KeyboardInterrupt:
+        return None
+
+    conversation, turn_metrics = load_conversation_from_json(json_path)
+    log_path = os.path.splitext(json_path)[0] + ".txt"
+    resolve_interrupted_turn(conversation, log_path, json_path, turn_metrics)
+    return conversation, turn_metrics, log_path, json_path
+
+def start_broadcast(server):
+    """Arranca (una sola vez) el servidor SSE para que otros sigan la conversación"""
+    if server is None:
+        try:
+            server = serve_broadcast(broadcaster, BROADCAST_HOST, BROADCAST_PORT)
+        except OSError as e:
+            console.print(f"[red]❌ No se pudo abrir el puerto {BROADCAST_PORT}: {e}[/red]")
+            return None
+    stats = broadcaster.stats()
+    console.print(f"[green]📡 Conversación compartida en http://{BROADCAST_HOST}:{BROADCAST_PORT}/ "
+                  f"(SSE en /events) · espectadores: {stats['subscribers']}[/green]")
+    return server
+
 def show_context(conversation):
     """Muestra el contexto de la conversación"""
     if not conversation:
@@ -189,7 +306,7 @@ def show_context(conversation):
 
     console.print(context_table)
 
-def show_streaming_stats(conversation):
+def show_streaming_stats(conversation, turn_metrics, session_started):
     """Muestra estadísticas de la conversación"""
     if not conversation:
         console.print("[yellow]⚠️ No hay conversación para analizar.[/yellow]")
@@ -209,11 +326,57 @@ def show_streaming_stats(conversation):
     stats_table.add_row("Respuestas del asistente", str(len(assistant_messages)))
     stats_table.add_row("Total de caracteres", str(total_chars))
     stats_table.add_row("Promedio de respuesta", f"{avg_response_length:.1f} caracteres")
-    stats_table.add_row("Tiempo de sesión", f"{datetime.now().strftime('%H:%M:%S')}")
+    elapsed = int((datetime.now() - session_started).total_seconds())
+    stats_table.add_row("Tiempo de sesión", f"{elapsed // 3600:02d}:{elapsed % 3600 // 60:02d}:{elapsed % 60:02d}")
+
+    latency = summarize(turn_metrics)
+    if latency["turns"]:
+        stats_table.add_row("TTFT medio / p95", f"{latency['ttft_ms_avg']} ms / {latency['ttft_ms_p95']} ms")
+        stats_table.add_row("Tokens por segundo", f"{latency['tokens_per_s_avg']}")
+        stats_table.add_row("Hueco entre chunks p50 / p95", f"{latency['gap_p50_ms']} ms / {latency['gap_p95_ms']} ms")
+        stats_table.add_row("Duración media del turno", f"{latency['total_ms_avg']} ms")
 
     console.print(stats_table)
 
+def run_headless(mode):
+    """Modo sin interfaz: una pregunta por línea de stdin, respuesta en bruto en stdout"""
+    writer = HeadlessWriter(mode)
+    os.makedirs("logs", exist_ok=True)
+    log_path = os.path.join("logs", get_log_filename())
+    json_path = os.path.join("logs", get_json_filename())
+    conversation = []
+    turn_metrics = []
+
+    for user_input in read_inputs():
+        conversation.append({"role": "user", "content": user_input})
+        with CancellableStream(client.messages.stream(
+            model="claude-sonnet-4-20250514",
+            max_tokens=1000,
+            messages=conversation
+        )) as stream:
+            text, metrics, _ = stream_turn(writer, user_input, anthropic_events(stream),
+                                           model="claude-sonnet-4-20250514")
+        turn_metrics.append(metrics)
+        if text is None:
+            conversation.pop()
+            continue
+        conversation.append({"role": "assistant", "content": text})
+        save_conversation_to_log(conversation, log_path)
+        save_conversation_to_json(conversation, json_path, turn_metrics)
+        if writer.closed:
+            break
+
 def main():
+    mode = output_mode()
+    if mode != "rich":
+        if not os.getenv("ANTHROPIC_API_KEY"):
+            sys.exit("ANTHROPIC_API_KEY no encontrada en el archivo .env")
+        try:
+            run_headless(mode)
+        except KeyboardInterrupt:
+            pass
+        return
+
     # Verificar API key
     if not os.getenv("ANTHROPIC_API_KEY"):
         console.print("[red]❌ Error: ANTHROPIC_API_KEY no encontrada en el archivo .env[/red]")
@@ -225,21 +388,30 @@ def main():
 
     # Mensaje de bienvenida
     welcome_panel = Panel(
-        "[bold blue]🎬 Chatbot con Streaming (Claude)[/bold blue]\n[dim]Respuestas en tiempo real con efecto de escritura[/dim]\n[dim]Escribe 'demo' para ver ejemplos, 'stats' para estadísticas, 'exit' para salir[/dim]",
+        "[bold blue]🎬 Chatbot con Streaming (Claude)[/bold blue]\n[dim]Respuestas en tiempo real con efecto de escritura[/dim]\n[dim]Escribe 'demo' para ver ejemplos, 'stats' para estadísticas, 'reporte' para latencias, 'compartir' para emitir en directo, 'exit' para salir[/dim]",
         title="[green]Bienvenido[/green]",
         border_style="blue"
     )
     console.print(welcome_panel)
 
-    # Crear archivos de log
-    log_filename = get_log_filename()
-    json_filename = get_json_filename()
-    log_path = os.path.join("logs", log_filename)
-    json_path = os.path.join("logs", json_filename)
-    console.print(f"[dim]📝 Log TXT guardado en: {log_path}[/dim]")
-    console.print(f"[dim]📄 Log JSON guardado en: {json_path}[/dim]")
-
-    conversation = []
+    resumed = resume_interrupted_session()
+    if resumed:
+        conversation, turn_metrics, log_path, json_path = resumed
+        console.print(f"[dim]📝 Continuando en: {log_path}[/dim]")
+        console.print(f"[dim]📄 Continuando en: {json_path}[/dim]")
+    else:
+        # Crear archivos de log
+        log_filename = get_log_filename()
+        json_filename = get_json_filename()
+        log_path = os.path.join("logs", log_filename)
+        json_path = os.path.join("logs", json_filename)
+        console.print(f"[dim]📝 Log TXT guardado en: {log_path}[/dim]")
+        console.print(f"[dim]📄 Log JSON guardado en: {json_path}[/dim]")
+
+        conversation = []
+        turn_metrics = []
+    session_started = datetime.now()
+    broadcast_server = None
 
     while True:
         user_input = Prompt.ask("[bold cyan]Tú[/bold cyan]")
@@ -248,7 +420,7 @@ def main():
             # Guardar conversación final
             if conversation:
                 save_conversation_to_log(conversation, log_path)
-                save_conversation_to_json(conversation, json_path)
+                save_conversation_to_json(conversation, json_path, turn_metrics)
                 console.print(f"[green]✅ Conversación guardada en TXT: {log_path}[/green]")
                 console.print(f"[green]✅ Conversación guardada en JSON: {json_path}[/green]")
 
@@ -258,6 +430,10 @@ def main():
                 border_style="red"
             )
             console.print(goodbye_panel)
+            # Los espectadores reciben el cierre y el servidor se detiene
+            broadcaster.close()
+            if broadcast_server is not None:
+                broadcast_server.shutdown()
             break
 
         # Comando especial para demo
@@ -265,6 +441,11 @@ def main():
             show_streaming_demo()
             continue
 
+        # Comando para que otros sigan la conversación en directo
+        if user_input.lower() in {"compartir", "share"}:
+            broadcast_server = start_broadcast(broadcast_server)
+            continue
+
         # Comando para ver contexto
         if user_input.lower() == "contexto":
             show_context(conversation)
@@ -272,17 +453,23 @@ def main():
 
         # Comando para ver estadísticas
         if user_input.lower() in {"stats", "estadisticas", "estadísticas"}:
-            show_streaming_stats(conversation)
+            show_streaming_stats(conversation, turn_metrics, session_started)
+            continue
+
+        # Comando para ver el informe de latencia de todas las sesiones
+        if user_input.lower() in {"reporte", "report"}:
+            show_report("logs")
             continue
 
         # Comando para limpiar contexto
         if user_input.lower() in {"limpiar", "clear", "nuevo"}:
             conversation = []
+            turn_metrics = []
             console.print("[green]✅ Contexto limpiado. Nueva conversación iniciada.[/green]")
             continue
 
         # Procesar entrada normal con streaming
-        success = stream_response(user_input, conversation, log_path, json_path)
+        success = stream_response(user_input, conversation, log_path, json_path, turn_metrics)
 
         if not success:
             # Si hubo error o cancelación, continuar
@@ -6,15 +6,14 @@ Este script demuestra diferentes formas de usar streaming
 
 import os
 import json
-import time
 import dotenv
 from datetime import datetime
 from anthropic import Anthropic
 from rich.console import Console
 from rich.panel import Panel
-from rich.live import Live
-from rich.text import Text
 from rich.progress import Progress, SpinnerColumn, TextColumn
+from stream_renderer import StreamRenderer
+from stream_cancel import CancellableStream
 
 dotenv.load_dotenv()
 
@@ -32,17 +31,16 @@ def example_basic_streaming():
     console.print("\n[bold green]Respuesta en streaming:[/bold green]")
 
     try:
-        with client.messages.stream(
+        with CancellableStream(client.messages.stream(
             model="claude-sonnet-4-20250514",
             max_tokens=500,
             messages=[{"role": "user", "content": prompt}]
-        ) as stream:
+        )) as stream:
             response_text = ""
             for chunk in stream:
                 if chunk.type == "content_block_delta":
                     response_text += chunk.delta.text
-                    console.print(chunk.delta.text, end="", flush=True)
-                    time.sleep(0.02)  # Efecto de escritura
+                    console.print(chunk.delta.text, end="", markup=False, highlight=False)
 
         console.print(f"\n\n[dim]✅ Streaming completado. Total: {len(response_text)} caracteres[/dim]")
 
@@ -59,28 +57,17 @@ def example_streaming_with_panel():
     console.print(f"[bold]Prompt:[/bold] {prompt}")
 
     try:
-        response_text = ""
-        panel = Panel(
-            "[dim]Claude está escribiendo...[/dim]",
-            title="[green]🤖 Claude (Streaming)[/green]",
-            border_style="green"
-        )
-
-        with Live(panel, console=console, refresh_per_second=10) as live:
-            with client.messages.stream(
+        with StreamRenderer(console, "[green]🤖 Claude (Streaming)[/green]", refresh_per_second=10) as renderer:
+            with CancellableStream(client.messages.stream(
                 model="claude-sonnet-4-20250514",
                 max_tokens=400,
                 messages=[{"role": "user", "content": prompt}]
-            ) as stream:
+            )) as stream:
                 for chunk in stream:
                     if chunk.type == "content_block_delta":
-                        response_text += chunk.delta.text
-                        live.update(Panel(
-                            response_text + "[dim]▊[/dim]",
-                            title="[green]🤖 Claude (Streaming)[/green]",
-                            border_style="green"
-                        ))
-                        time.sleep(0.01)
+                        renderer.append(chunk.delta.text)
+
+        response_text = renderer.text
 
         # Panel final
         final_panel = Panel(
@@ -112,16 +99,15 @@ def example_streaming_with_progress():
         ) as progress:
             task = progress.add_task("Claude está escribiendo...", total=None)
 
-            with client.messages.stream(
+            with CancellableStream(client.messages.stream(
                 model="claude-sonnet-4-20250514",
                 max_tokens=600,
                 messages=[{"role": "user", "content": prompt}]
-            ) as stream:
+            )) as stream:
                 for chunk in stream:
                     if chunk.type == "content_block_delta":
                         response_text += chunk.delta.text
                         progress.update(task, description=f"Escribiendo... {len(response_text)} caracteres")
-                        time.sleep(0.01)
 
         # Mostrar resultado final
         result_panel = Panel(
@@ -153,31 +139,22 @@ def example_streaming_conversation():
     console.print(f"\n[bold]Nueva pregunta:[/bold] {new_prompt}")
 
     try:
-        response_text = ""
-
-        with Live(
-            Panel(
-                "[dim]Claude está respondiendo...[/dim]",
-                title="[green]🤖 Claude (Conversación)[/green]",
-                border_style="green"
-            ),
-            console=console,
-            refresh_per_second=10
-        ) as live:
-            with client.messages.stream(
+        with StreamRenderer(
+            console,
+            "[green]🤖 Claude (Conversación)[/green]",
+            refresh_per_second=10,
+            placeholder="Claude está respondiendo..."
+        ) as renderer:
+            with CancellableStream(client.messages.stream(
                 model="claude-sonnet-4-20250514",
                 max_tokens=500,
                 messages=conversation + [{"role": "user", "content": new_prompt}]
-            ) as stream:
+            )) as stream:
                 for chunk in stream:
                     if chunk.type == "content_block_delta":
-                        response_text += chunk.delta.text
-                        live.update(Panel(
-                            response_text + "[dim]▊[/dim]",
-                            title="[green]🤖 Claude (Conversación)[/green]",
-                            border_style="green"
-                        ))
-                        time.sleep(0.01)
+                        renderer.append(chunk.delta.text)
+
+        response_text = renderer.text
 
         # Mostrar respuesta final
         final_panel = Panel(
@@ -209,31 +186,22 @@ def example_streaming_with_tools():
         # Ahora streaming de la explicación
         explanation_prompt = f"El resultado de 15 * 23 es {result}. Explica el proceso de multiplicación paso a paso de manera didáctica."
 
-        response_text = ""
-
-        with Live(
-            Panel(
-                "[dim]Claude está explicando el proceso...[/dim]",
-                title="[green]🤖 Claude (Explicación)[/green]",
-                border_style="green"
-            ),
-            console=console,
-            refresh_per_second=10
-        ) as live:
-            with client.messages.stream(
+        with StreamRenderer(
+            console,
+            "[green]🤖 Claude (Explicación)[/green]",
+            refresh_per_second=10,
+            placeholder="Claude está explicando el proceso..."
+        ) as renderer:
+            with CancellableStream(client.messages.stream(
                 model="claude-sonnet-4-20250514",
                 max_tokens=400,
                 messages=[{"role": "user", "content": explanation_prompt}]
-            ) as stream:
+            )) as stream:
                 for chunk in stream:
                     if chunk.type == "content_block_delta":
-                        response_text += chunk.delta.text
-                        live.update(Panel(
-                            response_text + "[dim]▊[/dim]",
-                            title="[green]🤖 Claude (Explicación)[/green]",
-                            border_style="green"
-                        ))
-                        time.sleep(0.01)
+                        renderer.append(chunk.delta.text)
+
+        response_text = renderer.text
 
         # Mostrar explicación final
         final_panel = Panel(
@@ -291,31 +259,35 @@ def main():
 
         choice = input("\nSelecciona una opción (1-8): ").strip()
 
-        if choice == "1":
-            example_basic_streaming()
-        elif choice == "2":
-            example_streaming_with_panel()
-        elif choice == "3":
-            example_streaming_with_progress()
-        elif choice == "4":
-            example_streaming_conversation()
-        elif choice == "5":
-            example_streaming_with_tools()
-        elif choice == "6":
-            show_streaming_benefits()
-        elif choice == "7":
-            console.print("\n[bold yellow]🎬 Ejecutando todos los ejemplos...[/bold yellow]")
-            example_basic_streaming()
-            example_streaming_with_panel()
-            example_streaming_with_progress()
-            example_streaming_conversation()
-            example_streaming_with_tools()
-            show_streaming_benefits()
-        elif choice == "8":
-            console.print("\n[bold green]👋 ¡Hasta luego![/bold green]")
-            break
-        else:
-            console.print("[red]❌ Opción inválida. Intenta de nuevo.[/red]")
+        try:
+            if choice == "1":
+                example_basic_streaming()
+            elif choice == "2":
+                example_streaming_with_panel()
+            elif choice == "3":
+                example_streaming_with_progress()
+            elif choice == "4":
+                example_streaming_conversation()
+            elif choice == "5":
+                example_streaming_with_tools()
+            elif choice == "6":
+                show_streaming_benefits()
+            elif choice == "7":
+                console.print("\n[bold yellow]🎬 Ejecutando todos los ejemplos...[/bold yellow]")
+                example_basic_streaming()
+                example_streaming_with_panel()
+                example_streaming_with_progress()
+                example_streaming_conversation()
+                example_streaming_with_tools()
+                show_streaming_benefits()
+            elif choice == "8":
+                console.print("\n[bold green]👋 ¡Hasta luego![/bold green]")
+                break
+            else:
+                console.print("[red]❌ Opción inválida. Intenta de nuevo.[/red]")
+        except KeyboardInterrupt:
+            # CancellableStream ya ha cerrado la conexión con la API
+            console.print("\n[yellow]⚠️ Ejemplo cancelado[/yellow]")
 
         input("\nPresiona Enter para continuar...")
         console.print("\n" + "="*60)
@@ -0,0 +1,213 @@
+"""
+Caché con caducidad (TTL) para los resultados de las herramientas
+El modelo repite a menudo la misma consulta en una sesión (el clima de Madrid,
+la información del mismo fichero). Cada herramienta declara con @memoize su
+TTL y cómo se normalizan sus argumentos, de modo que "Madrid", " madrid " y
+"MADRID" comparten entrada. Todas las herramientas comparten un almacén con
+tamaño máximo (se expulsa la entrada usada hace más tiempo) y contadores de
+aciertos por herramienta.
+
+Una entrada puede llevar además un sello (stamp), que se recalcula en cada
+consulta: si cambia, la entrada se invalida aunque no haya caducado. Con
+file_mtime, la información de un fichero se descarta en cuanto se modifica.
+
+Con el sandbox (tool_sandbox.py) la caché vive en el proceso principal:
+cached_call la consulta antes de enviar la llamada a un trabajador, y en los
+trabajadores se desactiva con disable().
+
+Uso:
+    @registry.tool("Obtiene el clima actual de una ciudad")
+    @memoize(ttl=600, normalize={"city": casefold})
+    def get_weather(city: Annotated[str, "Ciudad"]):
+        ...
+
+    tool_cache.stats()   -> {"get_weather": {"hits": 3, "misses": 1, ...}, ...}
+"""
+
+import os
+import time
+import inspect
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+DEFAULT_TTL = 300
+MAX_ENTRIES = 512
+
+_MISSING = object()
+_enabled = True
+
+
+def casefold(value):
+    """Texto sin mayúsculas ni espacios sobrantes: ' New  York' -> 'new york'"""
+    return " ".join(str(value).split()).casefold()
+
+
+def real_path(value):
+    """Ruta absoluta canónica: './notes/../README.md' -> '/.../README.md'"""
+    return os.path.realpath(os.path.expanduser(str(value)))
+
+
+def rounded(digits):
+    """Normalizador que redondea números (coordenadas: 2 decimales son ~1 km)"""
+    def normalize(value):
+        return round(float(value), digits)
+    return normalize
+
+
+def file_mtime(file_path):
+    """Sello para invalidar por cambios: fecha de modificación y tamaño, o None si no existe"""
+    try:
+        stat = os.stat(real_path(file_path))
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ToolCache:
+    """Almacén LRU compartido por las herramientas, con TTL por entrada"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _count(self, tool, counter):
+        stats = self._stats.setdefault(tool, {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0, "evicted": 0})
+        stats[counter] += 1
+
+    def get(self, tool, key, stamp=None):
+        """Resultado guardado o _MISSING; cuenta el acierto o el fallo"""
+        with self._lock:
+            entry = self._entries.get((tool, key))
+            if entry is not None:
+                expires, entry_stamp, value = entry
+                if self.clock() >= expires:
+                    del self._entries[(tool, key)]
+                    self._count(tool, "expired")
+                elif entry_stamp != stamp:
+                    del self._entries[(tool, key)]
+                    self._count(tool, "invalidated")
+                else:
+                    self._entries.move_to_end((tool, key))
+                    self._count(tool, "hits")
+                    return value
+            self._count(tool, "misses")
+            return _MISSING
+
+    def put(self, tool, key, value, ttl, stamp=None):
+        with self._lock:
+            self._entries[(tool, key)] = (self.clock() + ttl, stamp, value)
+            self._entries.move_to_end((tool, key))
+            while len(self._entries) > self.max_entries:
+                (evicted_tool, _), _ = self._entries.popitem(last=False)
+                self._count(evicted_tool, "evicted")
+
+    def clear(self, tool=None):
+        with self._lock:
+            for entry_key in [k for k in self._entries if tool is None or k[0] == tool]:
+                del self._entries[entry_key]
+
+    def stats(self):
+        """Contadores por herramienta, con el número de entradas y la tasa de aciertos"""
+        with self._lock:
+            sizes = {}
+            for tool, _ in self._entries:
+                sizes[tool] = sizes.get(tool, 0) + 1
+            report = {}
+            for tool, counters in self._stats.items():
+                lookups = counters["hits"] + counters["misses"]
+                report[tool] = {**counters, "entries": sizes.get(tool, 0),
+                                "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0}
+            return report
+
+
+default_cache = ToolCache(max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", MAX_ENTRIES)))
+
+
+def memoize(ttl=DEFAULT_TTL, normalize=None, stamp=None, cache_if=None, cache=None):
+    """Decorador que guarda el resultado de una herramienta durante ttl segundos.
+
+    normalize: {argumento: función} aplicada a cada argumento antes de formar la clave.
+    stamp: función de los argumentos (ya normalizados) cuyo valor debe coincidir
+    para reutilizar la entrada (p. ej. lambda args: file_mtime(args["file_path"])).
+    cache_if: predicado sobre el resultado; lo que no lo cumple (errores) no se guarda.
+    """
+    normalize = normalize or {}
+
+    def decorate(function):
+        signature = inspect.signature(function)
+        name = function.__name__
+
+        def lookup(args, kwargs):
+            """(clave, sello, resultado guardado o _MISSING)"""
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {arg: normalize[arg](value) if arg in normalize and value is not None else value
+                         for arg, value in bound.arguments.items()}
+            key = repr(sorted(arguments.items()))
+            entry_stamp = stamp(arguments) if stamp else None
+            return key, entry_stamp, (cache or default_cache).get(name, key, entry_stamp)
+
+        def remember(key, entry_stamp, value):
+            if cache_if is None or cache_if(value):
+                (cache or default_cache).put(name, key, value, ttl, entry_stamp)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            key, entry_stamp, value = lookup(args, kwargs)
+            if value is not _MISSING:
+                return value
+            value = function(*args, **kwargs)
+            remember(key, entry_stamp, value)
+            return value
+
+        wrapper.cache_ttl = ttl
+        wrapper.cache_lookup = lookup
+        wrapper.cache_remember = remember
+        return wrapper
+    return decorate
+
+
+def cached_call(function, arguments, call):
+    """Resultado de function (con @memoize) para arguments desde la caché de este proceso;
+    si no está, lo obtiene con call() (ej: en un trabajador del sandbox) y lo guarda"""
+    lookup = getattr(function, "cache_lookup", None)
+    if lookup is None or not _enabled:
+        return call()
+    try:
+        key, entry_stamp, value = lookup((), arguments or {})
+    except TypeError:
+        # Argumentos que no encajan con la firma: el error lo da la propia ejecución
+        return call()
+    if value is not _MISSING:
+        return value
+    value = call()
+    if not getattr(value, "is_error", False):
+        function.cache_remember(key, entry_stamp, value)
+    return value
+
+
+def disable():
+    """Desactiva la caché en este proceso (trabajadores del sandbox: la caché está en el principal)"""
+    global _enabled
+    _enabled = False
+
+
+def stats():
+    return default_cache.stats()
+
+
+def clear(tool=None):
+    default_cache.clear(tool)
+
+
+def format_stats(report):
+    hits = sum(s["hits"] for s in report.values())
+    lookups = hits + sum(s["misses"] for s in report.values())
+    rate = f"{hits / lookups:.0%}" if lookups else "-"
+    return f"🗃️ caché de herramientas: {hits}/{lookups} aciertos ({rate})"
@@ -0,0 +1,213 @@
+"""
+Bucle de herramientas con límite de rondas y de tiempo
+Cada ronda llama al modelo con las herramientas disponibles, ejecuta en
+paralelo las que pida y le devuelve los resultados, hasta que responde sin
+pedir ninguna. El bucle se corta antes si se agotan las rondas o el tiempo
+total: en los dos casos la última ronda se hace con tool_choice "none" para
+que el modelo conteste con lo que tiene. Para esa respuesta final se reservan
+final_seconds del presupuesto (como mínimo, aunque las herramientas lo hayan
+agotado), así el turno nunca acaba con resultados de herramientas sin texto. Por ronda se guardan la latencia del modelo, los tokens y el
+tiempo de las herramientas.
+
+Los adaptadores traducen cada API al mismo formato:
+    AnthropicToolAdapter -> client.messages.create (lista de mensajes)
+    OpenAIToolAdapter    -> client.responses.create (lista de items de input)
+
+Uso:
+    loop = ToolLoop(AnthropicToolAdapter(client, model, TOOLS), runner, max_rounds=5)
+    result = loop.run([{"role": "user", "content": "..."}])
+    result.text, result.stop_reason, result.rounds
+"""
+
+import json
+import time
+
+MAX_ROUNDS = 6
+MAX_SECONDS = 90
+FINAL_SECONDS = 15
+
+
+def anthropic_tool_params(tools, allow_tools):
+    """tools y tool_choice; sin herramientas (selección vacía) no se envía ninguno de los dos"""
+    if not tools:
+        return {}
+    return {"tools": tools, "tool_choice": {"type": "auto" if allow_tools else "none"}}
+
+
+def anthropic_tool_result(call, result):
+    """Bloque tool_result; los errores estructurados (ToolError) se marcan con is_error"""
+    block = {"type": "tool_result", "tool_use_id": call["id"], "content": str(result)}
+    if getattr(result, "is_error", False):
+        block["is_error"] = True
+    return block
+
+
+class AnthropicToolAdapter:
+    """Messages API de Anthropic: tool_use en el contenido, tool_result como mensaje de usuario"""
+
+    def __init__(self, client, model, tools, max_tokens=1000, system=None):
+        self.client = client
+        self.model = model
+        self.tools = tools
+        self.max_tokens = max_tokens
+        self.system = system
+
+    def request(self, messages, allow_tools, timeout):
+        params = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "messages": messages,
+            # Las herramientas van en todas las rondas; en la última no se pueden usar
+            **anthropic_tool_params(self.tools, allow_tools),
+            "timeout": timeout,
+        }
+        if self.system:
+            params["system"] = self.system
+        return self.client.messages.create(**params)
+
+    def text(self, response):
+        return "".join(block.text for block in response.content if block.type == "text")
+
+    def tool_calls(self, response):
+        return [{"id": block.id, "name": block.name, "input": block.input}
+                for block in response.content if block.type == "tool_use"]
+
+    def usage(self, response):
+        return response.usage.input_tokens, response.usage.output_tokens
+
+    def extend(self, messages, response, calls, results):
+        messages.append({"role": "assistant", "content": response.content})
+        messages.append({"role": "user", "content": [
+            anthropic_tool_result(call, result) for call, result in zip(calls, results)
+        ]})
+
+
+class OpenAIToolAdapter:
+    """Responses API de OpenAI: items function_call y function_call_output"""
+
+    def __init__(self, client, model, tools):
+        self.client = client
+        self.model = model
+        self.tools = tools
+
+    def request(self, messages, allow_tools, timeout):
+        return self.client.responses.create(
+            model=self.model,
+            input=messages,
+            tools=self.tools,
+            tool_choice="auto" if allow_tools else "none",
+            timeout=timeout,
+        )
+
+    def text(self, response):
+        return response.output_text
+
+    def tool_calls(self, response):
+        return [{"id": item.call_id, "name": item.name, "input": json.loads(item.arguments), "item": item}
+                for item in response.output if item.type == "function_call"]
+
+    def usage(self, response):
+        usage = response.usage
+        return (usage.input_tokens, usage.output_tokens) if usage is not None else (None, None)
+
+    def extend(self, messages, response, calls, results):
+        for call, result in zip(calls, results):
+            messages.append(call["item"])
+            messages.append({"type": "function_call_output", "call_id": call["id"], "output": str(result)})
+
+
+class ToolLoopResult:
+    def __init__(self, text, messages, response, rounds, stop_reason, total_ms):
+        self.text = text
+        self.messages = messages
+        self.response = response
+        self.rounds = rounds
+        self.stop_reason = stop_reason
+        self.total_ms = total_ms
+
+    def totals(self):
+        def total(key):
+            return sum(r[key] for r in self.rounds if r[key] is not None)
+        return {
+            "rounds": len(self.rounds),
+            "tool_calls": sum(len(r["tools"]) for r in self.rounds),
+            "input_tokens": total("input_tokens"),
+            "output_tokens": total("output_tokens"),
+            "model_ms": round(total("latency_ms"), 1),
+            "tools_ms": round(total("tools_ms"), 1),
+            "total_ms": self.total_ms,
+            "stop_reason": self.stop_reason,
+        }
+
+
+class ToolLoop:
+    """Motor del bucle modelo -> herramientas -> modelo con presupuesto de rondas y tiempo"""
+
+    def __init__(self, adapter, runner, max_rounds=MAX_ROUNDS, max_seconds=MAX_SECONDS, on_round=None,
+                 final_seconds=None):
+        self.adapter = adapter
+        self.runner = runner
+        self.max_rounds = max(max_rounds, 1)
+        self.max_seconds = max_seconds
+        self.on_round = on_round
+        # Con presupuestos pequeños la reserva no puede comerse todo el tiempo de herramientas
+        self.final_seconds = min(FINAL_SECONDS, max_seconds / 4) if final_seconds is None else final_seconds
+
+    def run(self, messages):
+        """Ejecuta el bucle sobre una copia de messages y devuelve un ToolLoopResult"""
+        messages = list(messages)
+        started = time.perf_counter()
+        rounds = []
+        response = None
+        text = ""
+        stop_reason = "max_rounds"
+
+        for index in range(1, self.max_rounds + 1):
+            remaining = self.max_seconds - (time.perf_counter() - started)
+            # Al llegar a la reserva solo queda una respuesta final, sin herramientas
+            out_of_time = remaining <= self.final_seconds
+            allow_tools = index < self.max_rounds and not out_of_time
+
+            request_started = time.perf_counter()
+            response = self.adapter.request(messages, allow_tools, max(remaining, self.final_seconds))
+            latency = time.perf_counter() - request_started
+            text = self.adapter.text(response)
+            input_tokens, output_tokens = self.adapter.usage(response)
+            calls = self.adapter.tool_calls(response) if allow_tools else []
+
+            stats = {
+                "round": index,
+                "latency_ms": round(latency * 1000, 1),
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "tools": [call["name"] for call in calls],
+                "tools_ms": None,
+                "tools_saved_ms": None,
+            }
+            results = []
+            if calls:
+                # Un adaptador en streaming puede haber lanzado ya las herramientas ("pending")
+                pending = [call.get("pending") or self.runner.submit(call["name"], call["input"]) for call in calls]
+                results, report = self.runner.gather(pending)
+                stats["tools_ms"] = report["wall_ms"]
+                stats["tools_saved_ms"] = report["saved_ms"]
+                self.adapter.extend(messages, response, calls, results)
+            rounds.append(stats)
+            if self.on_round:
+                self.on_round(stats, calls, results)
+            if not calls:
+                if allow_tools:
+                    stop_reason = "end_turn"
+                else:
+                    stop_reason = "max_seconds" if out_of_time else "max_rounds"
+                break
+
+        total_ms = round((time.perf_counter() - started) * 1000, 1)
+        return ToolLoopResult(text, messages, response, rounds, stop_reason, total_ms)
+
+
+def format_totals(totals):
+    return (f"🔁 {totals['rounds']} rondas · {totals['tool_calls']} herramientas · "
+            f"{totals['input_tokens']}+{totals['output_tokens']} tokens · "
+            f"modelo {totals['model_ms']} ms · herramientas {totals['tools_ms']} ms · "
+            f"total {totals['total_ms']} ms ({totals['stop_reason']})")
@@ -0,0 +1,107 @@
+"""
+Límite de tamaño para la salida de las herramientas
+El resultado de una herramienta va entero en la siguiente petición al modelo:
+un listado grande o una nota larga dispara el contexto y la latencia de todas
+las rondas que siguen. Con OutputPolicy cada resultado que supera el
+presupuesto de tokens se recorta (por un salto de línea si lo hay), el texto
+completo se guarda en un fichero de desbordamiento y el modelo recibe un
+identificador con el que pedir el resto por páginas con read_more(handle,
+offset). Así un resultado grande cuesta siempre lo mismo por ronda.
+
+Uso:
+    policy = OutputPolicy(max_tokens=800)
+    result = policy.bound("get_tree_stats", result)   # igual si cabe; si no, recortado + handle
+    policy.read_more(result.handle, offset)
+"""
+
+import os
+import re
+import time
+import secrets
+from stream_cancel import CHARS_PER_TOKEN
+
+MAX_TOKENS = int(os.getenv("TOOL_OUTPUT_MAX_TOKENS", "800"))
+SPILL_DIR = os.path.join("logs", "tool_output")
+SPILL_MAX_AGE = 24 * 3600
+# Margen para el aviso que se añade al final del texto recortado
+FOOTER_CHARS = 200
+
+HANDLE_PATTERN = re.compile(r"^[a-z0-9_]{1,64}-[0-9a-f]{8}$")
+
+
+class SpilledOutput(str):
+    """Resultado recortado: el texto que ve el modelo, con el handle del fichero completo"""
+
+    def __new__(cls, text, handle, total_chars):
+        output = super().__new__(cls, text)
+        output.handle = handle
+        output.total_chars = total_chars
+        return output
+
+
+def _cut(text, limit):
+    """Primeros limit caracteres, terminando en un salto de línea si hay uno cerca"""
+    if len(text) <= limit:
+        return text
+    newline = text.rfind("\n", limit // 2, limit)
+    return text[:newline + 1] if newline != -1 else text[:limit]
+
+
+class OutputPolicy:
+    """Recorta resultados a max_tokens y guarda el resto en spill_dir"""
+
+    def __init__(self, max_tokens=MAX_TOKENS, spill_dir=SPILL_DIR, max_age=SPILL_MAX_AGE):
+        self.max_chars = max(max_tokens * CHARS_PER_TOKEN, FOOTER_CHARS * 2)
+        self.spill_dir = spill_dir
+        self.max_age = max_age
+        self.spilled = 0
+        self.cleanup()
+
+    def cleanup(self):
+        """Borra los ficheros de desbordamiento de sesiones anteriores"""
+        if not os.path.isdir(self.spill_dir):
+            return
+        limit = time.time() - self.max_age
+        for entry in os.scandir(self.spill_dir):
+            if entry.is_file() and entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+
+    def _footer(self, handle, shown_until, total):
+        if shown_until >= total:
+            return f"\n[fin de la salida {handle}]"
+        return (f"\n[… salida recortada: caracteres hasta {shown_until} de {total}. "
+                f"Para seguir, usa read_more(handle=\"{handle}\", offset={shown_until})]")
+
+    def bound(self, tool, result):
+        """El mismo resultado si cabe en el presupuesto; si no, un SpilledOutput"""
+        text = str(result)
+        if len(text) <= self.max_chars:
+            return result
+        os.makedirs(self.spill_dir, exist_ok=True)
+        handle = f"{re.sub(r'[^a-z0-9_]', '_', tool.lower())[:64]}-{secrets.token_hex(4)}"
+        with open(os.path.join(self.spill_dir, handle + ".txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        self.spilled += 1
+        head = _cut(text, self.max_chars - FOOTER_CHARS)
+        return SpilledOutput(head + self._footer(handle, len(head), len(text)), handle, len(text))
+
+    def read_more(self, handle, offset=0):
+        """Página de la salida guardada a partir de offset (en caracteres)"""
+        if not HANDLE_PATTERN.match(handle or ""):
+            return f"Identificador no válido: {handle}"
+        path = os.path.join(self.spill_dir, handle + ".txt")
+        if not os.path.exists(path):
+            return f"No hay ninguna salida guardada con el identificador {handle} (puede haber caducado)"
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        offset = min(max(int(offset), 0), len(text))
+        page = _cut(text[offset:], self.max_chars - FOOTER_CHARS)
+        return page + self._footer(handle, offset + len(page), len(text))
+
+
+def preview(result, limit=300):
+    """Versión corta de un resultado para mostrarlo en consola"""
+    text = str(result)
+    if len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + f"… ({len(text)} caracteres)"
@@ -0,0 +1,193 @@
+"""
+Registro de herramientas con decorador
+Cada herramienta se declara una sola vez, como una función normal. El esquema
+JSON se genera a partir de su firma y de sus anotaciones de tipo (con
+Annotated para la descripción de cada parámetro) y se guarda en caché; de la
+misma definición salen el formato de Anthropic (input_schema) y el de OpenAI
+(parameters). La ejecución es una búsqueda en un diccionario por nombre.
+
+Uso:
+    registry = ToolRegistry()
+
+    @registry.tool("Obtiene el clima actual de una ciudad")
+    def get_weather(city: Annotated[str, "Nombre de la ciudad"]):
+        ...
+
+    client.messages.create(..., tools=registry.anthropic_tools())
+    client.responses.create(..., tools=registry.openai_tools())
+    registry.execute("get_weather", {"city": "Madrid"})
+"""
+
+import inspect
+from typing import Annotated, Literal, Union, get_args, get_origin, get_type_hints
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+
+def _json_type(annotation):
+    """Esquema JSON de una anotación de tipo (sin la descripción)"""
+    origin = get_origin(annotation)
+    if origin is Union:
+        # Optional[X] -> X
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _json_type(args[0]) if len(args) == 1 else {}
+    if origin is Literal:
+        values = list(get_args(annotation))
+        return {"type": JSON_TYPES.get(type(values[0]), "string"), "enum": values}
+    if origin in (list, tuple):
+        args = get_args(annotation)
+        return {"type": "array", "items": _json_type(args[0])} if args else {"type": "array"}
+    if origin is dict:
+        return {"type": "object"}
+    if isinstance(annotation, type) and issubclass(annotation, dict) and hasattr(annotation, "__required_keys__"):
+        # TypedDict -> objeto con sus propias propiedades (ej: list[Coordinates])
+        return _object_schema(get_type_hints(annotation, include_extras=True), annotation.__required_keys__)
+    if annotation in JSON_TYPES:
+        return {"type": JSON_TYPES[annotation]}
+    return {}
+
+
+def _property(annotation):
+    """Esquema de un campo, con la descripción de Annotated si la tiene"""
+    description = None
+    if get_origin(annotation) is Annotated:
+        annotation, *metadata = get_args(annotation)
+        description = next((m for m in metadata if isinstance(m, str)), None)
+    prop = _json_type(annotation)
+    if description:
+        prop["description"] = description
+    return prop
+
+
+def _object_schema(hints, required):
+    return {
+        "type": "object",
+        "properties": {name: _property(annotation) for name, annotation in hints.items()},
+        "required": [name for name in hints if name in required],
+    }
+
+
+def _closed_schema(schema):
+    """Copia del esquema con additionalProperties: false en cada objeto, también los anidados.
+    Devuelve (esquema, strict): strict solo si todos los objetos tienen todas sus propiedades
+    en required, que es lo que exige el modo estricto de OpenAI."""
+    schema = dict(schema)
+    strict = True
+    if schema.get("type") == "object" and "properties" not in schema:
+        # dict libre: el modo estricto no admite objetos sin propiedades declaradas
+        strict = False
+    elif schema.get("type") == "object":
+        properties = {}
+        for name, prop in schema["properties"].items():
+            properties[name], prop_strict = _closed_schema(prop)
+            strict = strict and prop_strict
+        schema["properties"] = properties
+        schema["additionalProperties"] = False
+        strict = strict and set(schema.get("required", ())) == set(properties)
+    if isinstance(schema.get("items"), dict):
+        schema["items"], items_strict = _closed_schema(schema["items"])
+        strict = strict and items_strict
+    return schema, strict
+
+
+def build_schema(function):
+    """Esquema JSON de los parámetros de una función"""
+    hints = get_type_hints(function, include_extras=True)
+    parameters = inspect.signature(function).parameters
+    required = {name for name, parameter in parameters.items() if parameter.default is inspect.Parameter.empty}
+    return _object_schema({name: hints.get(name, str) for name in parameters}, required)
+
+
+class Tool:
+    __slots__ = ("name", "description", "function", "schema", "concurrency", "keywords")
+
+    def __init__(self, name, description, function, schema, concurrency, keywords=()):
+        self.name = name
+        self.description = description
+        self.function = function
+        self.schema = schema
+        self.concurrency = concurrency
+        self.keywords = tuple(keywords)
+
+
+class ToolRegistry:
+    """Herramientas indexadas por nombre, con los esquemas de cada API en caché"""
+
+    def __init__(self):
+        self._tools = {}
+        self._cache = {}
+
+    def tool(self, description=None, name=None, concurrency=None, keywords=()):
+        """Decorador que registra la función y la devuelve sin cambios.
+
+        description por defecto es el primer párrafo del docstring;
+        concurrency limita las llamadas simultáneas (ver parallel_tools.py);
+        keywords son palabras que suelen aparecer en las peticiones que la
+        necesitan (ver tool_selector.py). No se envían a la API.
+        """
+        def register(function):
+            doc = inspect.getdoc(function) or ""
+            self.add(Tool(
+                name or function.__name__,
+                description or doc.split("\n\n")[0].strip(),
+                function,
+                build_schema(function),
+                concurrency,
+                keywords.split() if isinstance(keywords, str) else keywords,
+            ))
+            return function
+        return register
+
+    def add(self, tool):
+        self._tools[tool.name] = tool
+        self._cache.clear()
+
+    def __contains__(self, name):
+        return name in self._tools
+
+    def __len__(self):
+        return len(self._tools)
+
+    def names(self):
+        return list(self._tools)
+
+    def get(self, name):
+        return self._tools.get(name)
+
+    def anthropic_tools(self):
+        """Lista de herramientas con input_schema (Messages API de Anthropic)"""
+        if "anthropic" not in self._cache:
+            self._cache["anthropic"] = [
+                {"name": tool.name, "description": tool.description, "input_schema": tool.schema}
+                for tool in self._tools.values()
+            ]
+        return self._cache["anthropic"]
+
+    def openai_tools(self):
+        """Lista de herramientas con parameters (Responses API de OpenAI)"""
+        if "openai" not in self._cache:
+            tools = []
+            for tool in self._tools.values():
+                # La Responses API trata las funciones como estrictas si no se indica lo contrario
+                parameters, strict = _closed_schema(tool.schema)
+                tools.append({"type": "function", "name": tool.name, "description": tool.description,
+                              "parameters": parameters, "strict": strict})
+            self._cache["openai"] = tools
+        return self._cache["openai"]
+
+    def limits(self):
+        """Límites de concurrencia declarados, en el formato de ParallelToolRunner"""
+        return {tool.name: tool.concurrency for tool in self._tools.values() if tool.concurrency}
+
+    def execute(self, name, arguments):
+        """Ejecuta una herramienta por nombre; los errores se devuelven como texto para el modelo"""
+        tool = self._tools.get(name)
+        if tool is None:
+            return f"Herramienta desconocida: {name}"
+        try:
+            return tool.function(**(arguments or {}))
+        except MemoryError:
+            # No es un error de la herramienta: lo gestiona quien la ejecuta (ver tool_sandbox.py)
+            raise
+        except Exception as e:
+            return f"Error al ejecutar la herramienta {name}: {e}"
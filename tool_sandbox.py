@@ -0,0 +1,229 @@
+"""
+Ejecución de herramientas en un pool de procesos aislados
+Con el sandbox activado, cada llamada se ejecuta en un proceso trabajador ya
+arrancado (se crean al inicio con fork, así que no hay coste de arranque por
+llamada) y comunicado por un Pipe. Los que sustituyen a otros más tarde, con
+el proceso principal ya lleno de hilos, se crean con forkserver (o spawn),
+porque hacer fork de un proceso con hilos puede dejar locks bloqueados. Cada llamada tiene un tiempo máximo: si se
+pasa, el trabajador se mata y se sustituye por otro, y el modelo recibe un
+ToolError en lugar de quedarse el chat bloqueado. Los trabajadores tienen un
+límite de memoria (RLIMIT_AS) y se reciclan cada cierto número de llamadas, y
+si uno muere (fallo, memoria agotada) la sesión sigue. initializer se ejecuta
+en cada trabajador al arrancar (ej: tool_cache.disable, para que la caché
+viva en el proceso principal). Los avances que una herramienta manda con
+send_progress viajan por el mismo Pipe y se entregan a on_progress en el
+proceso principal, que es el único que escribe en la salida.
+
+Solo disponible en sistemas con fork y el módulo resource (Linux, macOS); en
+el resto las herramientas se siguen ejecutando en el propio proceso. Con
+forkserver o spawn, target e initializer deben poderse serializar con pickle
+(funciones de módulo o métodos de objetos de módulo).
+
+Uso:
+    sandbox = ToolSandbox(registry.execute, workers=4, timeouts={"get_tree_stats": 30})
+    sandbox.call("calculate", {"expression": "2 + 2"})   -> "Resultado: 4"
+    sandbox.close()
+"""
+
+import os
+import time
+import queue
+import signal
+import threading
+import multiprocessing
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))
+DEFAULT_MEMORY_MB = int(os.getenv("TOOL_MEMORY_MB", "512"))
+MAX_CALLS_PER_WORKER = 200
+
+# Pipe del trabajador actual (None en el proceso principal)
+_worker_conn = None
+_worker_send_lock = threading.Lock()
+
+
+def sandbox_available():
+    return resource is not None and "fork" in multiprocessing.get_all_start_methods()
+
+
+def send_progress(tool, partial):
+    """Envía un avance parcial al proceso principal; False si no se está en un trabajador"""
+    if _worker_conn is None:
+        return False
+    with _worker_send_lock:
+        _worker_conn.send(("progress", (tool, partial)))
+    return True
+
+
+class ToolError(str):
+    """Resultado de error estructurado: se comporta como texto para el modelo y lleva los detalles"""
+
+    is_error = True
+
+    def __new__(cls, tool, kind, message, elapsed_ms=None):
+        error = super().__new__(cls, message)
+        error.tool = tool
+        error.kind = kind
+        error.elapsed_ms = elapsed_ms
+        return error
+
+    def to_dict(self):
+        return {"tool": self.tool, "kind": self.kind, "message": str(self), "elapsed_ms": self.elapsed_ms}
+
+
+def _worker_main(conn, target, memory_bytes, initializer=None):
+    """Bucle del trabajador: recibe (nombre, argumentos) y responde (estado, resultado);
+    antes del resultado puede enviar avances ("progress", (herramienta, datos))"""
+    global _worker_conn
+    _worker_conn = conn
+    # Ctrl+C lo gestiona el proceso principal; el trabajador muere con él o al cerrar el Pipe
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer:
+        initializer()
+    if memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        if request is None:
+            return
+        name, arguments = request
+        try:
+            reply = ("ok", target(name, arguments))
+        except MemoryError:
+            reply = ("memory", None)
+        except Exception as e:
+            reply = ("error", str(e))
+        with _worker_send_lock:
+            conn.send(reply)
+
+
+class _Worker:
+    def __init__(self, context, target, memory_bytes, initializer):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, target, memory_bytes, initializer),
+                                       name="tool-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.calls = 0
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class ToolSandbox:
+    """Pool de procesos pre-arrancados con tiempo máximo por llamada y reciclado de trabajadores"""
+
+    def __init__(self, target, workers=2, timeout=DEFAULT_TIMEOUT, timeouts=None,
+                 memory_mb=DEFAULT_MEMORY_MB, max_calls=MAX_CALLS_PER_WORKER, initializer=None,
+                 on_progress=None):
+        if not sandbox_available():
+            raise RuntimeError("el sandbox de herramientas necesita fork y el módulo resource")
+        self.target = target
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.memory_bytes = memory_mb * 1024 * 1024 if memory_mb else None
+        self.max_calls = max_calls
+        self.initializer = initializer
+        self.on_progress = on_progress
+        self._context = multiprocessing.get_context("fork")
+        methods = multiprocessing.get_all_start_methods()
+        self._respawn_context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "timeouts": 0, "crashes": 0, "memory_errors": 0, "recycled": 0}
+        self._closed = False
+        for _ in range(workers):
+            self._idle.put(self._spawn(self._context))
+
+    def _spawn(self, context=None):
+        """Trabajador nuevo; por defecto con el contexto de sustitución (sin fork del proceso con hilos)"""
+        return _Worker(context or self._respawn_context, self.target, self.memory_bytes, self.initializer)
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def call(self, name, arguments):
+        """Ejecuta la herramienta en un trabajador; los fallos vuelven como ToolError"""
+        timeout = self.timeouts.get(name, self.timeout)
+        worker = self._idle.get()
+        started = time.perf_counter()
+
+        def elapsed_ms():
+            return round((time.perf_counter() - started) * 1000, 1)
+
+        try:
+            worker.conn.send((name, arguments))
+            worker.calls += 1
+            deadline = started + timeout
+            while True:
+                if not worker.conn.poll(max(deadline - time.perf_counter(), 0)):
+                    worker.kill()
+                    worker = self._spawn()
+                    self._count("timeouts")
+                    return ToolError(name, "timeout", f"Error: la herramienta {name} superó el tiempo máximo de "
+                                                      f"{timeout:g} s y se canceló", elapsed_ms())
+                status, payload = worker.conn.recv()
+                if status != "progress":
+                    break
+                if self.on_progress:
+                    self.on_progress(*payload)
+        except (EOFError, OSError):
+            exitcode = worker.process.exitcode
+            worker.kill()
+            worker = self._spawn()
+            self._count("crashes")
+            return ToolError(name, "crash", f"Error: el proceso de la herramienta {name} terminó de forma "
+                                            f"inesperada (código {exitcode})", elapsed_ms())
+        finally:
+            if worker.calls >= self.max_calls:
+                # Reciclado preventivo: libera la memoria acumulada por el trabajador
+                worker.close()
+                worker = self._spawn()
+                self._count("recycled")
+            self._count("calls")
+            if self._closed:
+                worker.close()
+            else:
+                self._idle.put(worker)
+
+        if status == "memory":
+            self._count("memory_errors")
+            limit = self.memory_bytes // (1024 * 1024)
+            return ToolError(name, "memory", f"Error: la herramienta {name} superó el límite de memoria de {limit} MB",
+                             elapsed_ms())
+        if status == "error":
+            return ToolError(name, "error", f"Error al ejecutar la herramienta {name}: {payload}", elapsed_ms())
+        return payload
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
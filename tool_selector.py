@@ -0,0 +1,160 @@
+"""
+Selección de herramientas por turno
+Enviar todos los esquemas en cada petición cuesta tokens de entrada (y tiempo
+hasta el primer token) aunque el turno no necesite ninguna herramienta. El
+selector elige las herramientas relevantes para el mensaje del usuario con un
+índice local muy barato: las palabras del nombre, la descripción, los
+parámetros y las palabras clave de cada herramienta, reducidas a una raíz
+(sin tildes, primeras letras) y ponderadas por lo raras que son entre las
+herramientas (idf). Las herramientas usadas en los últimos turnos se incluyen
+siempre, para que "¿y en Barcelona?" siga teniendo get_weather.
+
+Si ninguna herramienta encaja no se envía ninguna: son los turnos de charla,
+donde está casi todo el ahorro. Si el modelo pide una herramienta que no se
+le envió, el turno continúa con el conjunto completo (fallback). Las
+funciones matemáticas se reconocen por su forma de llamada ("sin(x)"), para
+que "sin embargo" no cuente como una. Por turno se estima cuántos tokens de
+esquemas se han ahorrado.
+
+Uso:
+    selector = ToolSelector(registry)
+    selection = selector.select("¿Qué clima hace en Madrid?")
+    selection.tools, selection.saved_tokens
+    selector.observe(["get_weather"])
+"""
+
+import re
+import json
+import math
+import unicodedata
+from stream_cancel import CHARS_PER_TOKEN
+
+RECENT_TURNS = 2
+STEM_LENGTH = 4
+# Prompt de sistema que la API añade cuando hay herramientas (tool_choice auto, documentación de Anthropic)
+TOOLS_SYSTEM_TOKENS = 346
+
+WORD_PATTERN = re.compile(r"([a-z0-9]+)(\()?")
+STOPWORDS = {
+    "que", "para", "por", "con", "los", "las", "una", "uno", "unos", "del", "como", "esta", "este",
+    "esto", "hay", "sobre", "mas", "muy", "pero", "sin", "tan", "ese", "esa", "son", "tiene", "tienes", "puedes",
+    "dime", "quiero", "hola", "gracias", "the", "and", "for", "what", "with", "you", "are", "can", "please",
+    "obtiene", "devuelve", "ejemplo", "opcional", "defecto", "resume", "resumen", "resultado",
+}
+
+
+def _stems(text):
+    """Raíces de las palabras: sin tildes, en minúsculas, sin palabras vacías (STOPWORDS va sin tildes).
+    Una palabra seguida de "(" añade además su forma de función: "sin(x)" -> "sin(" """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    stems = set()
+    for word, call in WORD_PATTERN.findall(text):
+        if call and not word.isdigit():
+            stems.add(word + "(")
+        if len(word) >= 3 and word not in STOPWORDS and not word.isdigit():
+            stems.add(word[:STEM_LENGTH])
+    return stems
+
+
+def estimate_tool_tokens(tool):
+    return round(len(json.dumps(tool, ensure_ascii=False)) / CHARS_PER_TOKEN)
+
+
+class Selection:
+    def __init__(self, tools, names, scores, full_tokens, sent_tokens):
+        self.tools = tools
+        self.names = names
+        self.scores = scores
+        self.full_tokens = full_tokens
+        self.sent_tokens = sent_tokens
+        self.fallback = False
+
+    @property
+    def saved_tokens(self):
+        return self.full_tokens - self.sent_tokens
+
+    def to_dict(self):
+        return {"tools": self.names, "fallback": self.fallback, "full_tokens": self.full_tokens,
+                "sent_tokens": self.sent_tokens, "saved_tokens": self.saved_tokens}
+
+
+class ToolSelector:
+    """Índice invertido raíz -> herramientas, construido una vez a partir del registro"""
+
+    def __init__(self, registry, recent_turns=RECENT_TURNS, min_score=1.0):
+        self.registry = registry
+        self.recent_turns = recent_turns
+        self.min_score = min_score
+        self._tools = registry.anthropic_tools()
+        self._index = {}
+        for tool in registry.names():
+            spec = registry.get(tool)
+            text = " ".join([tool.replace("_", " "), spec.description, " ".join(spec.keywords)] + [
+                f"{name} {prop.get('description', '')}" for name, prop in spec.schema["properties"].items()
+            ])
+            for stem in _stems(text):
+                self._index.setdefault(stem, set()).add(tool)
+        self._tokens = {tool["name"]: estimate_tool_tokens(tool) for tool in self._tools}
+        self._full_tokens = sum(self._tokens.values()) + TOOLS_SYSTEM_TOKENS
+        self._last_used = {}
+        self._turn = 0
+        self._stats = {"turns": 0, "full_tokens": 0, "sent_tokens": 0, "fallbacks": 0}
+
+    def _idf(self, stem):
+        return math.log(1 + len(self._tools) / len(self._index[stem]))
+
+    def select(self, text):
+        """Herramientas para un turno: las que encajan con el texto más las usadas hace poco"""
+        self._turn += 1
+        scores = {}
+        for stem in _stems(text):
+            for tool in self._index.get(stem, ()):
+                scores[tool] = scores.get(tool, 0.0) + self._idf(stem)
+        chosen = {tool for tool, score in scores.items() if score >= self.min_score}
+        chosen |= {tool for tool, turn in self._last_used.items() if self._turn - turn <= self.recent_turns}
+
+        # Se conserva el orden del registro: la lista enviada es estable entre turnos
+        tools = [tool for tool in self._tools if tool["name"] in chosen]
+        sent = sum(self._tokens[tool["name"]] for tool in tools) + (TOOLS_SYSTEM_TOKENS if tools else 0)
+        selection = Selection(tools, [tool["name"] for tool in tools], scores, self._full_tokens, sent)
+        self._stats["turns"] += 1
+        self._stats["full_tokens"] += selection.full_tokens
+        self._stats["sent_tokens"] += selection.sent_tokens
+        return selection
+
+    def expand(self, selection):
+        """Fallback: el modelo pidió una herramienta que no tenía; se envían todas"""
+        if selection.fallback:
+            return
+        self._stats["sent_tokens"] += self._full_tokens - selection.sent_tokens
+        self._stats["fallbacks"] += 1
+        selection.tools = self._tools
+        selection.names = [tool["name"] for tool in self._tools]
+        selection.sent_tokens = self._full_tokens
+        selection.fallback = True
+
+    def include(self, selection, names):
+        """Añade herramientas a la selección del turno (ej: read_more tras una salida recortada)"""
+        extra = [name for name in names if name not in selection.names and name in self._tokens]
+        if not extra:
+            return
+        selection.names = selection.names + extra
+        selection.tools = [tool for tool in self._tools if tool["name"] in selection.names]
+        added = sum(self._tokens[name] for name in extra) + (0 if selection.sent_tokens else TOOLS_SYSTEM_TOKENS)
+        selection.sent_tokens += added
+        self._stats["sent_tokens"] += added
+
+    def observe(self, names):
+        """Registra las herramientas usadas en el turno actual"""
+        for name in names:
+            self._last_used[name] = self._turn
+
+    def stats(self):
+        return {**self._stats, "saved_tokens": self._stats["full_tokens"] - self._stats["sent_tokens"]}
+
+
+def format_selection(selection, total):
+    fallback = " (ampliado: el modelo pidió otra herramienta)" if selection.fallback else ""
+    return (f"🧰 {len(selection.names)}/{total} herramientas enviadas{fallback} · "
+            f"~{selection.saved_tokens} tokens de esquemas ahorrados por petición")
@@ -1,6 +1,7 @@
 import os
+import sys
 import json
-import math
+import time
 import dotenv
 from datetime import datetime
 from anthropic import Anthropic
@@ -9,77 +10,37 @@ from rich.panel import Panel
 from rich.prompt import Prompt
 from rich.table import Table
 from rich import print as rprint
+from typing import Annotated, Optional
+from tool_registry import ToolRegistry
+import safe_calc
+import tree_stats
+import notes_store
+import tool_cache
+from tool_cache import memoize, casefold, real_path, file_mtime, cached_call
+from stream_renderer import StreamRenderer
+from stream_cancel import CancellableStream
+from stream_metrics import TurnMetrics
+from parallel_tools import ParallelToolRunner
+from tool_sandbox import ToolSandbox, sandbox_available, send_progress
+from tool_loop import ToolLoop, AnthropicToolAdapter, anthropic_tool_params, anthropic_tool_result, format_totals
+from tool_selector import ToolSelector, format_selection
+from tool_output import OutputPolicy, preview
+from headless_output import output_mode, read_inputs, HeadlessWriter, PlainRenderer
 
 dotenv.load_dotenv()
 
 client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 console = Console()
 
-# Definir las herramientas disponibles
-TOOLS = [
-    {
-        "name": "get_weather",
-        "description": "Obtiene el clima actual de una ciudad específica",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "city": {
-                    "type": "string",
-                    "description": "Nombre de la ciudad para consultar el clima"
-                }
-            },
-            "required": ["city"]
-        }
-    },
-    {
-        "name": "calculate",
-        "description": "Realiza cálculos matemáticos básicos",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "expression": {
-                    "type": "string",
-                    "description": "Expresión matemática a calcular (ej: '2 + 2', 'sqrt(16)', 'sin(pi/2)')"
-                }
-            },
-            "required": ["expression"]
-        }
-    },
-    {
-        "name": "get_file_info",
-        "description": "Obtiene información sobre un archivo en el sistema",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "file_path": {
-                    "type": "string",
-                    "description": "Ruta del archivo a analizar"
-                }
-            },
-            "required": ["file_path"]
-        }
-    },
-    {
-        "name": "create_note",
-        "description": "Crea una nota y la guarda en un archivo",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "title": {
-                    "type": "string",
-                    "description": "Título de la nota"
-                },
-                "content": {
-                    "type": "string",
-                    "description": "Contenido de la nota"
-                }
-            },
-            "required": ["title", "content"]
-        }
-    }
-]
 
-def get_weather(city):
+# Las herramientas se declaran una vez con @registry.tool; los esquemas salen de las anotaciones
+registry = ToolRegistry()
+
+# Los resultados se reutilizan durante el TTL; "Madrid" y "madrid " comparten entrada
+@registry.tool("Obtiene el clima actual de una ciudad específica",
+               keywords="clima tiempo temperatura lluvia llueve calor frío grados weather")
+@memoize(ttl=600, normalize={"city": casefold}, cache_if=lambda result: not result.startswith("Error"))
+def get_weather(city: Annotated[str, "Nombre de la ciudad para consultar el clima"]):
     """Obtiene el clima actual de una ciudad (simulado)"""
     try:
         # Simulación de API del clima (en un caso real usarías una API real)
@@ -100,31 +61,32 @@ def get_weather(city):
     except Exception as e:
         return f"Error al obtener el clima: {e}"
 
-def calculate(expression):
+@registry.tool("Realiza cálculos matemáticos básicos",
+               keywords="calcula cuánto suma resta multiplica divide raíz potencia seno coseno logaritmo porcentaje "
+                        "sin( cos( tan( log( ln( exp( sqrt( tabula tabla evalúa valores pasos función")
+def calculate(expression: Annotated[str, "Expresión matemática a calcular (ej: '2 + 2', 'sqrt(16)', 'sin(pi/2)')"],
+              variables: Annotated[Optional[dict], "Opcional: valores de las variables de la expresión para evaluarla en lote; "
+                                                   "cada una es una lista de números o un rango {start, stop, steps} "
+                                                   "(ej: {'x': {'start': 0, 'stop': '2*pi', 'steps': 1000}})"] = None,
+              rows: Annotated[int, "Filas de la tabla resumen en modo lote (por defecto 11)"] = 11):
     """Realiza cálculos matemáticos básicos"""
     try:
-        # Reemplazar funciones matemáticas comunes
-        expression = expression.replace("sqrt", "math.sqrt")
-        expression = expression.replace("sin", "math.sin")
-        expression = expression.replace("cos", "math.cos")
-        expression = expression.replace("tan", "math.tan")
-        expression = expression.replace("pi", "math.pi")
-        expression = expression.replace("e", "math.e")
-        expression = expression.replace("log", "math.log")
-        expression = expression.replace("exp", "math.exp")
-
-        # Evaluar la expresión de forma segura
-        allowed_names = {
-            "math": math,
-            "__builtins__": {}
-        }
-
-        result = eval(expression, allowed_names)
+        if variables:
+            # Modo lote: una sola pasada vectorizada y un resumen en lugar de miles de valores
+            batch = safe_calc.evaluate_batch(expression, variables)
+            return safe_calc.summarize_batch(expression, batch, rows)
+        # Evaluador por AST con lista blanca: sin eval y con la compilación en caché
+        result = safe_calc.evaluate(expression)
         return f"Resultado: {result}"
-    except Exception as e:
+    except (ArithmeticError, ValueError, TypeError) as e:
+        # CalcError (expresión no permitida o fuera de límites) es un ValueError
         return f"Error en el cálculo: {e}"
 
-def get_file_info(file_path):
+# La entrada de un fichero se invalida en cuanto cambia su fecha de modificación
+@registry.tool("Obtiene información sobre un archivo en el sistema",
+               keywords="archivo fichero tamaño fecha modificado existe ruta")
+@memoize(ttl=120, normalize={"file_path": real_path}, stamp=lambda args: file_mtime(args["file_path"]))
+def get_file_info(file_path: Annotated[str, "Ruta del archivo a analizar"]):
     """Obtiene información sobre un archivo"""
     try:
         if not os.path.exists(file_path):
@@ -148,11 +110,16 @@ Información del archivo: {file_path}
     except Exception as e:
         return f"Error al obtener información del archivo: {e}"
 
-def create_note(title, content):
+# create_note escribe en disco y va de una en una para no pisar ficheros con el mismo título
+@registry.tool("Crea una nota y la guarda en un archivo", concurrency=1,
+               keywords="nota apunta anota guarda recuerda")
+def create_note(title: Annotated[str, "Título de la nota"], content: Annotated[str, "Contenido de la nota"]):
     """Crea una nota y la guarda en un archivo"""
     try:
         # Crear directorio de notas si no existe
         os.makedirs("notes", exist_ok=True)
+        # Se abre (e importa notes/) antes de escribir, para no importar dos veces la nota nueva
+        store = notes_store.default_store()
 
         # Crear nombre de archivo seguro
         safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
@@ -167,25 +134,139 @@ def create_note(title, content):
             f.write("=" * 50 + "\n")
             f.write(content)
 
-        return f"Nota creada exitosamente: {file_path}"
+        # Además del .txt, la nota se indexa para poder buscarla después
+        note_id = store.create(title, content, source=file_path)
+        return f"Nota creada exitosamente: {file_path} (id {note_id})"
     except Exception as e:
         return f"Error al crear la nota: {e}"
 
-def execute_tool(tool_name, parameters):
-    """Ejecuta una herramienta específica"""
+@registry.tool("Busca en las notas guardadas y devuelve las más relevantes con un fragmento de cada una",
+               keywords="nota anoté apunté busca recuerdas")
+def search_notes(query: Annotated[str, "Palabras a buscar en el título y el contenido de las notas"],
+                 max_tokens: Annotated[int, "Tamaño máximo aproximado de la respuesta en tokens"] = notes_store.SEARCH_MAX_TOKENS):
+    """Búsqueda de texto completo en el índice de notas"""
     try:
-        if tool_name == "get_weather":
-            return get_weather(parameters.get("city", ""))
-        elif tool_name == "calculate":
-            return calculate(parameters.get("expression", ""))
-        elif tool_name == "get_file_info":
-            return get_file_info(parameters.get("file_path", ""))
-        elif tool_name == "create_note":
-            return create_note(parameters.get("title", ""), parameters.get("content", ""))
-        else:
-            return f"Herramienta desconocida: {tool_name}"
+        hits = notes_store.default_store().search(query, max_tokens=max_tokens)
+        return notes_store.format_hits(query, hits)
     except Exception as e:
-        return f"Error al ejecutar la herramienta {tool_name}: {e}"
+        return f"Error al buscar en las notas: {e}"
+
+@registry.tool("Devuelve el contenido completo de una nota por su id",
+               keywords="nota léeme lee entera")
+def get_note(note_id: Annotated[int, "Id de la nota (aparece en search_notes y create_note)"]):
+    """Lee una nota del almacén"""
+    try:
+        note = notes_store.default_store().get(note_id)
+        if note is None:
+            return f"No existe la nota {note_id}"
+        return f"Nota {note['id']}: {note['title']} ({note['created']})\n{note['content']}"
+    except Exception as e:
+        return f"Error al leer la nota: {e}"
+
+# Recorre el disco y puede usar varios hilos para los hash: una llamada cada vez
+@registry.tool("Analiza un directorio completo: tamaño, número de ficheros, extensiones, "
+               "ficheros más grandes y, opcionalmente, ficheros duplicados", concurrency=1,
+               keywords="carpeta directorio espacio ocupa duplicados proyecto disco")
+def get_tree_stats(path: Annotated[str, "Directorio a analizar"],
+                   find_duplicates: Annotated[bool, "Buscar ficheros con el mismo contenido (más lento)"] = False,
+                   max_files: Annotated[int, "Máximo de ficheros a recorrer (por defecto 100000)"] = tree_stats.MAX_FILES):
+    """Estadísticas de un árbol de directorios con os.scandir"""
+    try:
+        if not os.path.isdir(path):
+            return f"No es un directorio: {path}"
+        last = [0.0]
+
+        def progress(partial):
+            # Como mucho un aviso cada medio segundo
+            now = time.perf_counter()
+            if now - last[0] >= 0.5:
+                last[0] = now
+                report_progress("get_tree_stats", partial)
+
+        stats = tree_stats.analyze_tree(path, find_duplicates=find_duplicates,
+                                        max_files=min(max_files, tree_stats.MAX_FILES), progress=progress)
+        return tree_stats.format_tree_stats(stats)
+    except Exception as e:
+        return f"Error al analizar el directorio: {e}"
+
+# Los resultados que superan TOOL_OUTPUT_MAX_TOKENS se recortan y el resto se lee por páginas
+TOOL_OUTPUT = OutputPolicy()
+
+@registry.tool("Lee la continuación de una salida de herramienta que se recortó por ser demasiado larga",
+               keywords="continúa sigue resto más")
+def read_more(handle: Annotated[str, "Identificador que aparece al final de la salida recortada"],
+              offset: Annotated[int, "Carácter desde el que seguir leyendo (lo indica la salida recortada)"] = 0):
+    """Siguiente página de una salida guardada en logs/tool_output/"""
+    return TOOL_OUTPUT.read_more(handle, offset)
+
+# Esquemas para la API (en caché) y ejecución por nombre
+TOOLS = registry.anthropic_tools()
+execute_tool = registry.execute
+
+# Llamadas simultáneas permitidas por herramienta (el resto usa DEFAULT_TOOL_LIMIT)
+TOOL_LIMITS = registry.limits()
+
+# Con TOOL_SANDBOX=1 cada herramienta se ejecuta en un proceso aparte del pool, con tiempo
+# máximo (TOOL_TIMEOUT, o el de TOOL_TIMEOUTS) y memoria limitada (TOOL_MEMORY_MB)
+TOOL_SANDBOX = os.getenv("TOOL_SANDBOX", "").strip().lower() in {"1", "true", "yes"}
+TOOL_TIMEOUTS = {"get_tree_stats": 30}
+sandbox = None
+
+def run_tool(name, arguments):
+    """Ejecuta una herramienta (en el sandbox si está activo) y acota el tamaño del resultado"""
+    if sandbox:
+        # La caché se consulta aquí: en los trabajadores está desactivada
+        tool = registry.get(name)
+        result = cached_call(tool and tool.function, arguments, lambda: sandbox.call(name, arguments))
+    else:
+        result = execute_tool(name, arguments)
+    return TOOL_OUTPUT.bound(name, result)
+
+def start_sandbox(writer=None):
+    """Arranca los procesos del sandbox (antes de empezar a conversar)"""
+    global sandbox
+    if not TOOL_SANDBOX or sandbox:
+        return
+    if not sandbox_available():
+        message = "TOOL_SANDBOX no está disponible en este sistema: las herramientas se ejecutan en el proceso"
+        if writer:
+            writer.emit("error", message=message)
+        else:
+            console.print(f"[yellow]⚠️ {message}[/yellow]")
+        return
+    sandbox = ToolSandbox(execute_tool, workers=4, timeouts=TOOL_TIMEOUTS, initializer=tool_cache.disable,
+                          on_progress=report_progress)
+    if not writer:
+        console.print("[dim]🧱 Herramientas en procesos aislados (sandbox)[/dim]")
+
+# Pool donde se ejecutan las herramientas de un turno en paralelo, también mientras
+# el modelo sigue en streaming
+TOOL_RUNNER = ParallelToolRunner(run_tool, limits=TOOL_LIMITS, max_workers=4)
+
+# Cada turno envía solo las herramientas relevantes para el mensaje (TOOL_SELECTION=0 las envía todas)
+TOOL_SELECTION = os.getenv("TOOL_SELECTION", "1").strip().lower() not in {"0", "false", "no"}
+TOOL_SELECTOR = ToolSelector(registry)
+
+# En modo headless el progreso de las herramientas largas sale como eventos JSON
+PROGRESS_WRITER = None
+
+def report_progress(tool, partial):
+    """Avance parcial de una herramienta larga (se llama desde los hilos del pool)"""
+    # En un trabajador del sandbox el avance va al proceso principal, que sabe cómo mostrarlo
+    if send_progress(tool, partial):
+        return
+    if PROGRESS_WRITER:
+        PROGRESS_WRITER.emit("tool_progress", name=tool, **partial)
+    elif partial.get("phase") == "hash":
+        console.print(f"[dim]⏳ {tool}: {partial['hashed']}/{partial['candidates']} ficheros comparados[/dim]")
+    else:
+        console.print(f"[dim]⏳ {tool}: {partial['files']} ficheros, {partial['dirs']} directorios...[/dim]")
+
+# Presupuesto del bucle de herramientas por turno
+TOOL_LOOP_MAX_ROUNDS = int(os.getenv("TOOL_LOOP_MAX_ROUNDS", "6"))
+TOOL_LOOP_MAX_SECONDS = float(os.getenv("TOOL_LOOP_MAX_SECONDS", "90"))
+# Nunca se guarda un mensaje de asistente vacío: la API rechazaría el resto de la conversación
+EMPTY_REPLY = "(Sin respuesta de texto del modelo)"
 
 def save_conversation_to_log(conversation, log_file_path):
     """Guarda la conversación con herramientas en un archivo de log"""
@@ -252,23 +333,296 @@ def show_tools_info():
     tools_table.add_column("Descripción", style="dim", width=40)
     tools_table.add_column("Ejemplo", style="green", width=30)
 
-    examples = [
-        "¿Qué clima hace en Madrid?",
-        "Calcula 2 + 2 * 3",
-        "¿Qué información tienes del archivo README.md?",
-        "Crea una nota llamada 'Ideas' con 'Tengo que comprar leche'"
-    ]
+    examples = {
+        "get_weather": "¿Qué clima hace en Madrid?",
+        "calculate": "Calcula 2 + 2 * 3",
+        "get_file_info": "¿Qué información tienes del archivo README.md?",
+        "create_note": "Crea una nota llamada 'Ideas' con 'Tengo que comprar leche'",
+        "search_notes": "¿Qué anoté sobre la leche?",
+        "get_note": "Léeme entera la nota 3",
+        "get_tree_stats": "¿Qué ocupa más espacio en esta carpeta? ¿Hay duplicados?",
+        "read_more": "(la usa Claude para leer el resto de una salida recortada)",
+    }
 
-    for i, tool in enumerate(TOOLS):
+    for tool in TOOLS:
         tools_table.add_row(
             tool["name"],
             tool["description"],
-            examples[i] if i < len(examples) else "N/A"
+            examples.get(tool["name"], "N/A")
         )
 
     console.print(tools_table)
 
+def show_cache_stats():
+    """Muestra los aciertos de la caché de resultados por herramienta"""
+    report = tool_cache.stats()
+    if not report:
+        console.print("[yellow]⚠️ La caché de herramientas aún no se ha usado.[/yellow]")
+        return
+
+    cache_table = Table(title="[bold blue]🗃️ Caché de Herramientas[/bold blue]")
+    for column in ("Herramienta", "Aciertos", "Fallos", "Caducadas", "Invalidadas", "Expulsadas", "Entradas", "Tasa"):
+        cache_table.add_column(column, justify="left" if column == "Herramienta" else "right")
+    for name, stats in report.items():
+        cache_table.add_row(name, str(stats["hits"]), str(stats["misses"]), str(stats["expired"]),
+                            str(stats["invalidated"]), str(stats["evicted"]), str(stats["entries"]),
+                            f"{stats['hit_rate']:.0%}")
+    console.print(cache_table)
+
+def show_tool_round(stats, calls, results, writer=None):
+    """Muestra (o emite en modo headless) los resultados y tiempos de una ronda"""
+    if writer:
+        for call, result in zip(calls, results):
+            writer.tool_result(call["name"], result, call["id"])
+        writer.emit("tool_round", **stats)
+        return
+    for call, result in zip(calls, results):
+        console.print(f"[dim]✅ {call['name']}: {preview(result)}[/dim]")
+    # Una respuesta directa, sin herramientas, no necesita desglose
+    if not calls and stats["round"] == 1:
+        return
+    tools = f" · herramientas {stats['tools_ms']} ms (ahorro {stats['tools_saved_ms']} ms)" if calls else ""
+    console.print(f"[dim]↻ Ronda {stats['round']}: modelo {stats['latency_ms']} ms · "
+                  f"{stats['input_tokens']}+{stats['output_tokens']} tokens{tools}[/dim]")
+
+def show_loop_totals(result, writer=None):
+    totals = result.totals()
+    if writer:
+        writer.emit("tool_loop", **totals)
+        return
+    if totals["rounds"] > 1:
+        console.print(f"[dim]{format_totals(totals)}[/dim]")
+    if result.stop_reason == "max_rounds":
+        console.print(f"[yellow]⚠️ Bucle de herramientas detenido: límite de {TOOL_LOOP_MAX_ROUNDS} rondas[/yellow]")
+    elif result.stop_reason == "max_seconds":
+        console.print(f"[yellow]⚠️ Bucle de herramientas detenido: límite de {TOOL_LOOP_MAX_SECONDS:g} s[/yellow]")
+
+def select_tools(conversation):
+    """Herramientas del turno según el último mensaje del usuario (None: todas)"""
+    if not TOOL_SELECTION:
+        return None
+    return TOOL_SELECTOR.select(conversation[-1]["content"])
+
+def track_selection(adapter, selection, calls, results):
+    """Tras cada ronda: anota las herramientas usadas y, si el modelo pidió una que no
+    se le había enviado, sigue el turno con todas"""
+    if selection is None:
+        return
+    TOOL_SELECTOR.observe(call["name"] for call in calls)
+    if any(call["name"] not in selection.names for call in calls):
+        TOOL_SELECTOR.expand(selection)
+    elif any(getattr(result, "handle", None) for result in results):
+        # Una salida recortada solo se puede seguir leyendo con read_more
+        TOOL_SELECTOR.include(selection, ["read_more"])
+    adapter.tools = selection.tools
+
+def show_selection(selection, writer=None):
+    if selection is None:
+        return
+    if writer:
+        writer.emit("tool_selection", **selection.to_dict())
+    elif selection.saved_tokens > 0:
+        console.print(f"[dim]{format_selection(selection, len(TOOLS))}[/dim]")
+
+def run_tools_turn(conversation):
+    """Turno bloqueante: respuestas completas y herramientas en bucle hasta que Claude termina"""
+    selection = select_tools(conversation)
+    adapter = AnthropicToolAdapter(client, "claude-sonnet-4-20250514", selection.tools if selection else TOOLS)
+
+    def on_round(stats, calls, results):
+        for call in calls:
+            console.print(f"[dim]🔧 Ejecutando herramienta: {call['name']}[/dim]")
+        show_tool_round(stats, calls, results)
+        track_selection(adapter, selection, calls, results)
+
+    loop = ToolLoop(
+        adapter,
+        TOOL_RUNNER,
+        max_rounds=TOOL_LOOP_MAX_ROUNDS,
+        max_seconds=TOOL_LOOP_MAX_SECONDS,
+        on_round=on_round
+    )
+    with console.status("[bold green]Claude está pensando y usando herramientas...", spinner="dots"):
+        result = loop.run(conversation)
+    show_loop_totals(result)
+    show_selection(selection)
+    return result.text or EMPTY_REPLY
+
+def stream_tool_round(messages, title, run_tools=True, writer=None, metrics=None, timeout=None, tools=None):
+    """Una llamada en streaming con herramientas.
+
+    Muestra el texto en vivo, va juntando los fragmentos input_json_delta de cada
+    bloque tool_use y lanza la herramienta en el pool en cuanto su bloque se
+    cierra, mientras el modelo sigue emitiendo los bloques siguientes. Con
+    run_tools=False se pide tool_choice "none" y no se ejecuta nada. Con
+    writer (modo headless) el texto y las llamadas salen por el HeadlessWriter.
+    tools es la selección del turno (por defecto, todas).
+
+    Devuelve (contenido del asistente, texto, herramientas lanzadas, stats del stream).
+    """
+    blocks = {}
+    launched = []
+
+    renderer = PlainRenderer(writer) if writer else StreamRenderer(console, title, refresh_per_second=10)
+    with renderer:
+        with CancellableStream(client.messages.stream(
+            model="claude-sonnet-4-20250514",
+            max_tokens=1000,
+            messages=messages,
+            **anthropic_tool_params(TOOLS if tools is None else tools, run_tools),
+            timeout=timeout
+        )) as stream:
+            for event in stream:
+                if event.type == "content_block_start":
+                    block = event.content_block
+                    if block.type == "tool_use":
+                        blocks[event.index] = {"type": "tool_use", "id": block.id, "name": block.name, "json": []}
+                    elif block.type == "text":
+                        blocks[event.index] = {"type": "text", "text": []}
+                elif event.type == "content_block_delta":
+                    block = blocks.get(event.index)
+                    if block is None:
+                        continue
+                    if event.delta.type == "text_delta":
+                        block["text"].append(event.delta.text)
+                        renderer.append(event.delta.text)
+                        if metrics:
+                            metrics.on_delta(event.delta.text)
+                    elif event.delta.type == "input_json_delta":
+                        block["json"].append(event.delta.partial_json)
+                elif event.type == "content_block_stop":
+                    block = blocks.get(event.index)
+                    if block and block["type"] == "tool_use":
+                        raw_input = "".join(block["json"])
+                        block["input"] = json.loads(raw_input) if raw_input else {}
+                        if not run_tools:
+                            continue
+                        if writer:
+                            writer.tool_call(block["name"], block["input"], block["id"])
+                        else:
+                            console.print(f"[dim]🔧 Ejecutando herramienta: {block['name']}[/dim]")
+                        block["call"] = TOOL_RUNNER.submit(block["name"], block["input"])
+                        launched.append(block)
+        usage = stream.stats()
+        if writer:
+            writer.usage(usage["input_tokens_billed"], usage["output_tokens_billed"])
+
+    content = []
+    text = ""
+    for index in sorted(blocks):
+        block = blocks[index]
+        if block["type"] == "text":
+            block_text = "".join(block["text"])
+            text += block_text
+            if block_text:
+                content.append({"type": "text", "text": block_text})
+        else:
+            content.append({"type": "tool_use", "id": block["id"], "name": block["name"], "input": block["input"]})
+    return content, text, launched, usage
+
+class StreamingToolAdapter(AnthropicToolAdapter):
+    """Adaptador de ToolLoop en streaming: cada herramienta ya está en marcha al acabar la ronda"""
+
+    def __init__(self, writer=None, metrics=None, tools=None):
+        super().__init__(client, "claude-sonnet-4-20250514", TOOLS if tools is None else tools)
+        self.writer = writer
+        self.metrics = metrics
+        self.rounds = 0
+
+    def request(self, messages, allow_tools, timeout):
+        self.rounds += 1
+        title = "[green]🤖 Claude (Streaming + Herramientas)[/green]" if self.rounds == 1 \
+            else "[green]🤖 Claude (procesando resultados)[/green]"
+        content, text, launched, usage = stream_tool_round(
+            messages, title, run_tools=allow_tools, writer=self.writer, metrics=self.metrics, timeout=timeout,
+            tools=self.tools
+        )
+        return {"content": content, "text": text, "launched": launched, "usage": usage}
+
+    def text(self, response):
+        return response["text"]
+
+    def tool_calls(self, response):
+        return [{"id": block["id"], "name": block["name"], "input": block["input"], "pending": block["call"]}
+                for block in response["launched"]]
+
+    def usage(self, response):
+        return response["usage"]["input_tokens_billed"], response["usage"]["output_tokens_billed"]
+
+    def extend(self, messages, response, calls, results):
+        messages.append({"role": "assistant", "content": response["content"]})
+        messages.append({"role": "user", "content": [
+            anthropic_tool_result(call, result) for call, result in zip(calls, results)
+        ]})
+
+def stream_tools_turn(conversation, writer=None, metrics=None):
+    """Turno en streaming: las herramientas se ejecutan mientras el modelo sigue escribiendo"""
+    selection = select_tools(conversation)
+    adapter = StreamingToolAdapter(writer, metrics, selection.tools if selection else None)
+
+    def on_round(stats, calls, results):
+        show_tool_round(stats, calls, results, writer)
+        track_selection(adapter, selection, calls, results)
+
+    loop = ToolLoop(
+        adapter,
+        TOOL_RUNNER,
+        max_rounds=TOOL_LOOP_MAX_ROUNDS,
+        max_seconds=TOOL_LOOP_MAX_SECONDS,
+        on_round=on_round
+    )
+    result = loop.run(conversation)
+    show_loop_totals(result, writer)
+    show_selection(selection, writer)
+    return result.text or EMPTY_REPLY
+
+def run_headless(mode):
+    """Modo sin interfaz: una pregunta por línea de stdin, respuesta en bruto en stdout"""
+    global PROGRESS_WRITER
+    writer = HeadlessWriter(mode)
+    PROGRESS_WRITER = writer
+    start_sandbox(writer)
+    os.makedirs("logs", exist_ok=True)
+    log_path = os.path.join("logs", get_log_filename())
+    json_path = os.path.join("logs", get_json_filename())
+    conversation = []
+
+    for user_input in read_inputs():
+        conversation.append({"role": "user", "content": user_input})
+        metrics = TurnMetrics(model="claude-sonnet-4-20250514")
+        writer.turn_start(user_input, metrics.model)
+        try:
+            assistant_message = stream_tools_turn(conversation, writer, metrics)
+        except KeyboardInterrupt:
+            writer.end_text()
+            writer.turn_end(metrics.finish("cancelled").to_dict())
+            raise
+        except Exception as e:
+            conversation.pop()
+            writer.end_text()
+            writer.emit("error", message=str(e))
+            writer.turn_end(metrics.finish("error").to_dict())
+            continue
+        writer.end_text()
+        writer.turn_end(metrics.finish().to_dict())
+
+        conversation.append({"role": "assistant", "content": assistant_message})
+        save_conversation_to_log(conversation, log_path)
+        save_conversation_to_json(conversation, json_path)
+        if writer.closed:
+            break
+
 def main():
+    mode = output_mode()
+    if mode != "rich":
+        if not os.getenv("ANTHROPIC_API_KEY"):
+            sys.exit("ANTHROPIC_API_KEY no encontrada en el archivo .env")
+        try:
+            run_headless(mode)
+        except KeyboardInterrupt:
+            pass
+        return
+
     # Verificar API key
     if not os.getenv("ANTHROPIC_API_KEY"):
         console.print("[red]❌ Error: ANTHROPIC_API_KEY no encontrada en el archivo .env[/red]")
@@ -280,11 +634,12 @@ def main():
 
     # Mensaje de bienvenida
     welcome_panel = Panel(
-        "[bold blue]🤖 Chatbot con Herramientas (Claude + Tools)[/bold blue]\n[dim]Claude puede usar herramientas para realizar tareas específicas[/dim]\n[dim]Escribe 'herramientas' para ver las disponibles, 'exit' para salir[/dim]",
+        "[bold blue]🤖 Chatbot con Herramientas (Claude + Tools)[/bold blue]\n[dim]Claude puede usar herramientas para realizar tareas específicas[/dim]\n[dim]Escribe 'herramientas' para ver las disponibles, 'streaming' para alternar el modo, 'cache' para ver la caché, 'exit' para salir[/dim]",
         title="[green]Bienvenido[/green]",
         border_style="blue"
     )
     console.print(welcome_panel)
+    start_sandbox()
 
     # Crear archivos de log
     log_filename = get_log_filename()
@@ -295,6 +650,7 @@ def main():
     console.print(f"[dim]📄 Log JSON guardado en: {json_path}[/dim]")
 
     conversation = []
+    streaming_mode = True
 
     while True:
         user_input = Prompt.ask("[bold cyan]Tú[/bold cyan]")
@@ -320,6 +676,18 @@ def main():
             show_tools_info()
             continue
 
+        # Alternar entre respuestas en streaming y respuestas completas
+        if user_input.lower() == "streaming":
+            streaming_mode = not streaming_mode
+            estado = "activado" if streaming_mode else "desactivado"
+            console.print(f"[green]✅ Modo streaming {estado}[/green]")
+            continue
+
+        # Aciertos de la caché de resultados de las herramientas
+        if user_input.lower() in {"cache", "caché"}:
+            show_cache_stats()
+            continue
+
         # Comando para ver contexto
         if user_input.lower() == "contexto":
             if not conversation:
@@ -353,64 +721,10 @@ def main():
         console.print(user_panel)
 
         try:
-            # Llamar a Claude con herramientas
-            with console.status("[bold green]Claude está pensando y usando herramientas...", spinner="dots"):
-                response = client.messages.create(
-                    model="claude-sonnet-4-20250514",
-                    max_tokens=1000,
-                    messages=conversation,
-                    tools=TOOLS
-                )
-
-            # Procesar la respuesta
-            assistant_message = ""
-            tool_results = []
-
-            for content in response.content:
-                if content.type == "text":
-                    assistant_message += content.text
-                elif content.type == "tool_use":
-                    # Ejecutar la herramienta
-                    tool_name = content.name
-                    tool_input = content.input
-
-                    console.print(f"[dim]🔧 Ejecutando herramienta: {tool_name}[/dim]")
-
-                    result = execute_tool(tool_name, tool_input)
-                    tool_results.append({
-                        "tool_use_id": content.id,
-                        "name": tool_name,
-                        "input": tool_input,
-                        "result": result
-                    })
-
-                    console.print(f"[dim]✅ Resultado: {result}[/dim]")
-
-            # Si hay resultados de herramientas, enviarlos de vuelta a Claude
-            if tool_results:
-                tool_messages = []
-                for tool_result in tool_results:
-                    tool_messages.append({
-                        "type": "tool_result",
-                        "tool_use_id": tool_result["tool_use_id"],
-                        "content": tool_result["result"]
-                    })
-
-                # Llamar a Claude nuevamente con los resultados
-                with console.status("[bold green]Claude procesando resultados de herramientas...", spinner="dots"):
-                    final_response = client.messages.create(
-                        model="claude-sonnet-4-20250514",
-                        max_tokens=1000,
-                        messages=conversation + [{"role": "assistant", "content": response.content}] + [{"role": "user", "content": tool_messages}]
-                    )
-
-                # Obtener la respuesta final
-                final_message = ""
-                for content in final_response.content:
-                    if content.type == "text":
-                        final_message += content.text
-
-                assistant_message = final_message
+            if streaming_mode:
+                assistant_message = stream_tools_turn(conversation)
+            else:
+                assistant_message = run_tools_turn(conversation)
 
             # Añadir respuesta del asistente
             conversation.append({"role": "assistant", "content": assistant_message})
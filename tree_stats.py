@@ -0,0 +1,235 @@
+"""
+Estadísticas de un árbol de directorios
+Recorre el árbol con os.scandir (el tipo de cada entrada viene del propio
+listado y el stat se hace una sola vez por fichero) y acumula tamaño total,
+número de ficheros y directorios, tamaño por extensión y los ficheros más
+grandes. Opcionalmente busca ficheros duplicados: solo se calcula el hash de
+los ficheros cuyo tamaño coincide con el de otro (los demás no pueden estar
+repetidos), en un pool de hilos y leyendo con mmap los ficheros grandes.
+
+El recorrido respeta un presupuesto de ficheros y de tiempo: si se agota,
+devuelve lo acumulado hasta entonces marcado como parcial. Cada
+progress_every ficheros se llama a progress con un resumen parcial.
+
+Uso:
+    stats = analyze_tree(".", find_duplicates=True, progress=print)
+    print(format_tree_stats(stats))
+"""
+
+import os
+import time
+import mmap
+import heapq
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+MAX_FILES = 100_000
+MAX_SECONDS = 10.0
+PROGRESS_EVERY = 5000
+HASH_WORKERS = 4
+MMAP_THRESHOLD = 1024 * 1024
+READ_CHUNK = 1024 * 1024
+HASH_BATCH = 256
+TOP_FILES = 10
+
+# Directorios que casi nunca interesan y que en un repositorio son la mayoría de ficheros
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", "venv", ".mypy_cache", ".pytest_cache"}
+
+
+def hash_file(path, size, deadline=None):
+    """blake2b del contenido; los ficheros grandes se leen con mmap sin copiarlos a memoria.
+    Devuelve None si se pasa deadline (perf_counter) antes de terminar."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                # hashlib libera el GIL con bloques grandes: los hilos trabajan en paralelo
+                for offset in range(0, len(view), READ_CHUNK):
+                    if deadline is not None and time.perf_counter() > deadline:
+                        return None
+                    digest.update(view[offset:offset + READ_CHUNK])
+        else:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _walk(root, skip_dirs, stats, sizes, deadline, max_files, progress, progress_every):
+    """Recorrido iterativo con os.scandir; rellena stats y sizes (tamaño -> rutas)"""
+    extensions = stats["extensions"]
+    largest = stats["largest"]
+    pending = [root]
+    while pending:
+        # El tiempo se comprueba también por directorio: hay árboles con muchos directorios y pocos ficheros
+        if time.perf_counter() > deadline:
+            stats["truncated"] = "max_seconds"
+            return
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name in skip_dirs:
+                                stats["skipped_dirs"] += 1
+                            else:
+                                stats["dirs"] += 1
+                                pending.append(entry.path)
+                            continue
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        size = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        stats["errors"] += 1
+                        continue
+
+                    stats["files"] += 1
+                    stats["bytes"] += size
+                    ext = os.path.splitext(entry.name)[1].lower() or "(sin extensión)"
+                    count_bytes = extensions.get(ext)
+                    if count_bytes is None:
+                        extensions[ext] = [1, size]
+                    else:
+                        count_bytes[0] += 1
+                        count_bytes[1] += size
+                    if len(largest) < TOP_FILES:
+                        heapq.heappush(largest, (size, entry.path))
+                    elif size > largest[0][0]:
+                        heapq.heapreplace(largest, (size, entry.path))
+                    if sizes is not None and size > 0:
+                        sizes.setdefault(size, []).append(entry.path)
+
+                    if stats["files"] % progress_every == 0:
+                        if progress:
+                            progress({"phase": "walk", "files": stats["files"], "dirs": stats["dirs"],
+                                      "bytes": stats["bytes"]})
+                        if time.perf_counter() > deadline:
+                            stats["truncated"] = "max_seconds"
+                            return
+                    if stats["files"] >= max_files:
+                        stats["truncated"] = "max_files"
+                        return
+        except OSError:
+            stats["errors"] += 1
+
+
+def _hash_batch(batch, deadline):
+    """Hash de un lote de (ruta, tamaño); los errores de lectura se devuelven como None.
+    Si se agota el tiempo, el lote se corta y devuelve solo lo ya calculado."""
+    results = []
+    for path, size in batch:
+        if time.perf_counter() > deadline:
+            break
+        try:
+            digest = hash_file(path, size, deadline)
+        except (OSError, ValueError):
+            # ValueError: mmap de un fichero que se ha vaciado desde el recorrido
+            results.append((path, size, None))
+            continue
+        if digest is None:
+            break
+        results.append((path, size, digest))
+    return results
+
+
+def _batches(candidates):
+    """Los ficheros pequeños van en lotes para no crear una tarea por fichero"""
+    batch, batch_bytes = [], 0
+    for path, size in candidates:
+        if size >= MMAP_THRESHOLD:
+            yield [(path, size)]
+            continue
+        batch.append((path, size))
+        batch_bytes += size
+        if len(batch) >= HASH_BATCH or batch_bytes >= MMAP_THRESHOLD:
+            yield batch
+            batch, batch_bytes = [], 0
+    if batch:
+        yield batch
+
+
+def _find_duplicates(sizes, stats, deadline, workers, progress):
+    """Hash en paralelo de los ficheros con tamaño repetido; devuelve los grupos duplicados"""
+    candidates = [(path, size) for size, paths in sizes.items() if len(paths) > 1 for path in paths]
+    stats["hashed"] = 0
+    checked = 0
+    groups = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash") as executor:
+        pending = {executor.submit(_hash_batch, batch, deadline) for batch in _batches(candidates)}
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                stats["truncated"] = stats["truncated"] or "max_seconds"
+                for future in pending:
+                    future.cancel()
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                for path, size, digest in future.result():
+                    checked += 1
+                    if digest is None:
+                        stats["errors"] += 1
+                        continue
+                    groups.setdefault((size, digest), []).append(path)
+                    stats["hashed"] += 1
+            if progress and done:
+                progress({"phase": "hash", "hashed": stats["hashed"], "candidates": len(candidates)})
+    if checked < len(candidates):
+        stats["truncated"] = stats["truncated"] or "max_seconds"
+
+    duplicates = [(size, sorted(paths)) for (size, _), paths in groups.items() if len(paths) > 1]
+    duplicates.sort(key=lambda group: group[0] * (len(group[1]) - 1), reverse=True)
+    return duplicates
+
+
+def analyze_tree(root, find_duplicates=False, max_files=MAX_FILES, max_seconds=MAX_SECONDS,
+                 progress=None, progress_every=PROGRESS_EVERY, skip_dirs=SKIP_DIRS, workers=HASH_WORKERS):
+    """Recorre root y devuelve un dict con los totales (ver format_tree_stats)"""
+    started = time.perf_counter()
+    deadline = started + max_seconds
+    stats = {
+        "root": os.path.abspath(root), "files": 0, "dirs": 0, "bytes": 0, "skipped_dirs": 0, "errors": 0,
+        "extensions": {}, "largest": [], "duplicates": None, "truncated": None,
+    }
+    sizes = {} if find_duplicates else None
+    _walk(root, set(skip_dirs), stats, sizes, deadline, max_files, progress, max(progress_every, 1))
+    if find_duplicates:
+        stats["duplicates"] = _find_duplicates(sizes, stats, deadline, workers, progress)
+    stats["largest"] = sorted(stats["largest"], reverse=True)
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return stats
+
+
+def _human(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_tree_stats(stats, top=TOP_FILES):
+    """Resumen en texto para devolver al modelo"""
+    lines = [f"Directorio: {stats['root']}",
+             f"- Ficheros: {stats['files']} · directorios: {stats['dirs']} · tamaño total: {_human(stats['bytes'])}"]
+    if stats["skipped_dirs"]:
+        lines.append(f"- Directorios omitidos (.git, node_modules, entornos virtuales, cachés): {stats['skipped_dirs']}")
+    if stats["truncated"]:
+        limit = "ficheros" if stats["truncated"] == "max_files" else "tiempo"
+        lines.append(f"- Resultado PARCIAL: se agotó el presupuesto de {limit}")
+
+    extensions = sorted(stats["extensions"].items(), key=lambda item: item[1][1], reverse=True)[:top]
+    if extensions:
+        lines.append("- Extensiones por tamaño: " + ", ".join(
+            f"{ext} {count} ({_human(size)})" for ext, (count, size) in extensions))
+    if stats["largest"]:
+        lines.append("- Ficheros más grandes:")
+        lines.extend(f"    {_human(size)}  {os.path.relpath(path, stats['root'])}" for size, path in stats["largest"][:top])
+    if stats["duplicates"] is not None:
+        wasted = sum(size * (len(paths) - 1) for size, paths in stats["duplicates"])
+        lines.append(f"- Duplicados: {len(stats['duplicates'])} grupos, {_human(wasted)} repetidos "
+                     f"({stats.get('hashed', 0)} ficheros comparados por hash)")
+        for size, paths in stats["duplicates"][:top]:
+            lines.append(f"    {_human(size)} × {len(paths)}: " + ", ".join(os.path.relpath(p, stats["root"]) for p in paths[:4]))
+    if stats["errors"]:
+        lines.append(f"- Entradas sin permiso o ilegibles: {stats['errors']}")
+    lines.append(f"- Tiempo: {stats['elapsed_ms']} ms")
+    return "\n".join(lines)
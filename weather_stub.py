@@ -0,0 +1,104 @@
+"""
+Servidor local que imita el endpoint de previsión de Open-Meteo
+Sirve para probar las herramientas de clima sin red: responde a
+/v1/forecast?latitude=..&longitude=.. (una o varias coordenadas separadas por
+comas) con temperaturas deterministas calculadas a partir de las coordenadas.
+Con --delay o --fail-every se pueden simular un servicio lento o errores 503
+para comprobar los tiempos máximos y los reintentos de http_pool.
+
+Uso:
+    python weather_stub.py --port 8766
+    OPEN_METEO_URL=http://127.0.0.1:8766/v1/forecast python basic-function-calling-multiple.py
+
+    server = serve_stub(port=0)   # en un test: puerto libre, server.requests cuenta peticiones
+"""
+
+import json
+import math
+import time
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_current(latitude, longitude):
+    """Datos actuales inventados pero estables para unas coordenadas"""
+    temperature = round(30 - abs(latitude) * 0.4 + 3 * math.sin(math.radians(longitude)), 1)
+    wind_speed = round(5 + abs(longitude) % 20, 1)
+    return {"time": "2025-01-06T12:00", "interval": 900, "temperature_2m": temperature, "wind_speed_10m": wind_speed}
+
+
+def _make_handler(server_state):
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/v1/forecast":
+                self.send_error(404)
+                return
+            with server_state.lock:
+                server_state.requests += 1
+                count = server_state.requests
+            if server_state.delay:
+                time.sleep(server_state.delay)
+            if server_state.fail_every and count % server_state.fail_every == 0:
+                self._send_json(503, {"error": True, "reason": "stub: fallo simulado"})
+                return
+
+            query = parse_qs(url.query)
+            try:
+                latitudes = [float(value) for value in query["latitude"][0].split(",")]
+                longitudes = [float(value) for value in query["longitude"][0].split(",")]
+            except (KeyError, ValueError):
+                self._send_json(400, {"error": True, "reason": "latitude y longitude son obligatorias"})
+                return
+            if len(latitudes) != len(longitudes):
+                self._send_json(400, {"error": True, "reason": "latitude y longitude deben tener la misma longitud"})
+                return
+
+            points = [{"latitude": latitude, "longitude": longitude, "current": fake_current(latitude, longitude)}
+                      for latitude, longitude in zip(latitudes, longitudes)]
+            self._send_json(200, points[0] if len(points) == 1 else points)
+
+    return StubHandler
+
+
+def serve_stub(host="127.0.0.1", port=8766, delay=0.0, fail_every=0):
+    """Arranca el stub en un hilo y lo devuelve (server.shutdown() para pararlo)"""
+    server = ThreadingHTTPServer((host, port), None)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.delay = delay
+    server.fail_every = fail_every
+    server.RequestHandlerClass = _make_handler(server)
+    server.daemon_threads = True
+    server.url = f"http://{host}:{server.server_address[1]}/v1/forecast"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local de la API de Open-Meteo")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--delay", type=float, default=0.0, help="segundos de espera por petición")
+    parser.add_argument("--fail-every", type=int, default=0, help="responde 503 cada N peticiones")
+    args = parser.parse_args()
+
+    server = serve_stub(args.host, args.port, args.delay, args.fail_every)
+    print(f"Stub de Open-Meteo en {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()